@@ -1,69 +1,290 @@
 import os
-from datetime import date
+import time
 import logging
-import boto3
-import json
+import threading
 import pandas as pd
-import numpy as np
-from valid_inputs import valid_clubs
-from sqlalchemy import create_engine, inspect
+from valid_inputs import CLUBS
+from metrics import DB_CHECKED_OUT, DB_CHECKOUT_WAIT, DB_CONNECTIONS, SQL_UPLOAD
+from storage import download_records
+from schema import COLUMNS, MATCH_SCHEMA, clean_frame
+from sqlalchemy import (Column, Date, Float, Index, Integer, MetaData, String, Table, case,
+    create_engine, event, func, inspect, select, text)
 
 logging.basicConfig(level = logging.INFO)
 
 
-def rds_connect():
+_engine = None
+_engine_lock = threading.Lock()
+_pool_stats = {
+    'connections': 0, 'checkouts': 0, 'checked_out': 0, 'held_seconds': 0.0, 'max_held_seconds': 0.0,
+    'wait_seconds': 0.0, 'max_wait_seconds': 0.0
+    }
+_pool_stats_lock = threading.Lock()  # The pool events fire on the pipeline, worker and sink threads
+
+
+def database_url():
+    '''
+    Returns the DSN of the database, taken from the database_url environment variable if set (e.g. a local
+    PostgreSQL or sqlite:///test.db), otherwise the RDS instance with the host from rds_host.
+    '''
+    if 'database_url' in os.environ:
+        return os.environ['database_url']
     DATABASE_TYPE = 'postgresql'
     DBAPI = 'psycopg2'
-    HOST = 'aicore-db.ckoq1wsuhqob.us-east-1.rds.amazonaws.com'
-    USER = 'postgres'
+    HOST = os.environ.get('rds_host', 'aicore-db.ckoq1wsuhqob.us-east-1.rds.amazonaws.com')
+    USER = os.environ.get('rds_user', 'postgres')
     PASSWORD = os.environ['rds_password']
-    DATABASE = 'data-pipeline-project'
-    PORT = 5432
-    return create_engine(f"{DATABASE_TYPE}+{DBAPI}://{USER}:{PASSWORD}@{HOST}:{PORT}/{DATABASE}")
+    DATABASE = os.environ.get('rds_database', 'data-pipeline-project')
+    PORT = int(os.environ.get('rds_port', 5432))
+    return f"{DATABASE_TYPE}+{DBAPI}://{USER}:{PASSWORD}@{HOST}:{PORT}/{DATABASE}"
 
 
-def upload_to_sql(club, year):
-    engine = rds_connect()
-    s3_resource = boto3.resource(
-            's3',
-            region_name = 'eu-west-2',
-            aws_access_key_id = os.environ['aws_access_key_id'],
-            aws_secret_access_key = os.environ['aws_secret_access_key']   
-            )
-    my_bucket = s3_resource.Bucket('premier-league-bucket')
-    
-    logging.info('Creating data fram using pandas...')
-    stats_dict_list = []
-    name_short = valid_clubs()[club]
-    for obj in my_bucket.objects.all():
-        if obj.key[-3:] == name_short:
-            stats_dict_list.append(json.loads(obj.get()['Body'].read()))
-    df = pd.DataFrame(stats_dict_list).fillna(0)  # Create panda
-
-    stats2int =[
-        'Shots on target', 'Shots', 'Touches', 'Passes', 'Tackles', 'Clearances',
-        'Corners', 'Offsides', 'Fouls conceded', 'Yellow cards', 'Red cards'
-        ]
-    for stat in stats2int:
-        df[stat] = df[stat].astype('int64')
-    
-    df['Date'] = df['Date'].astype('datetime64').dt.date  # Converts to datetime without time
-    if int(year[5:]) > 90:
-        end_year = int('19' + str(year[5:]))
+def _track_pool(engine):
+    '''
+    Listens to the engine's pool events to count connections and time how long each checkout is held,
+    and times each call to the pool for how long it waited for a connection, including opening a new one.
+    '''
+    pool_connect = engine.pool.connect
+
+    def timed_connect():
+        start = time.perf_counter()
+        try:
+            return pool_connect()
+        finally:
+            waited = time.perf_counter() - start
+            DB_CHECKOUT_WAIT.observe(waited)
+            with _pool_stats_lock:
+                _pool_stats['wait_seconds'] += waited
+                _pool_stats['max_wait_seconds'] = max(_pool_stats['max_wait_seconds'], waited)
+
+    engine.pool.connect = timed_connect
+
+    @event.listens_for(engine, 'connect')
+    def connect(dbapi_connection, connection_record):
+        DB_CONNECTIONS.inc()
+        with _pool_stats_lock:
+            _pool_stats['connections'] += 1
+
+    @event.listens_for(engine, 'checkout')
+    def checkout(dbapi_connection, connection_record, connection_proxy):
+        connection_record.info['checked_out_at'] = time.perf_counter()
+        DB_CHECKED_OUT.inc()
+        with _pool_stats_lock:
+            _pool_stats['checkouts'] += 1
+            _pool_stats['checked_out'] += 1
+
+    @event.listens_for(engine, 'checkin')
+    def checkin(dbapi_connection, connection_record):
+        if 'checked_out_at' in connection_record.info:
+            held = time.perf_counter() - connection_record.info.pop('checked_out_at')
+            DB_CHECKED_OUT.dec()
+            with _pool_stats_lock:
+                _pool_stats['checked_out'] -= 1
+                _pool_stats['held_seconds'] += held
+                _pool_stats['max_held_seconds'] = max(_pool_stats['max_held_seconds'], held)
+
+
+def rds_connect():
+    '''
+    Returns the engine shared by the whole process, creating it on the first call.
+    The pool size is set with db_pool_size, and connections are pinged before use so dropped ones are replaced.
+
+    Returns:
+        sqlalchemy.engine.Engine
+    '''
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            url = database_url()
+            options = {'pool_pre_ping': True}
+            if not url.startswith('sqlite'):
+                options.update(pool_size=int(os.environ.get('db_pool_size', 5)), max_overflow=int(os.environ.get('db_max_overflow', 5)))
+            _engine = create_engine(url, **options)
+            _track_pool(_engine)
+        return _engine
+
+
+def dispose_engine(close=True):
+    '''
+    Forgets the shared engine, so the next rds_connect creates a new one.
+
+    Args:
+        close (bool): Closes the pooled connections if True. Use False in a forked child process,
+            whose inherited connections still belong to the parent.
+    '''
+    global _engine
+    with _engine_lock:
+        if _engine is not None:
+            _engine.dispose(close=close)
+            _engine = None
+
+
+def pool_stats():
+    '''
+    Returns metrics on the shared engine's connection pool. They are also exported to Prometheus by the metrics module.
+
+    Returns:
+        dict: The number of connections opened, checkouts made and currently checked out, the mean and longest
+            time a checkout waited for a connection, and the mean and longest time a checkout was held for, in seconds.
+    '''
+    with _pool_stats_lock:
+        stats = dict(_pool_stats)
+    checkins = stats['checkouts'] - stats['checked_out']
+    return {
+        'connections': stats['connections'],
+        'checkouts': stats['checkouts'],
+        'checked_out': stats['checked_out'],
+        'mean_wait_seconds': stats['wait_seconds'] / stats['checkouts'] if stats['checkouts'] else 0.0,
+        'max_wait_seconds': stats['max_wait_seconds'],
+        'mean_held_seconds': stats['held_seconds'] / checkins if checkins else 0.0,
+        'max_held_seconds': stats['max_held_seconds']
+    }
+
+
+# The SQL type of each type in the match stats schema
+SQL_TYPES = {'string': String(64), 'category': String(128), 'date': Date, 'int16': Integer, 'float64': Float}
+
+metadata = MetaData()
+match_stats = Table(
+    'match_stats', metadata,
+    Column('Season', String(7), primary_key=True),
+    Column('Club', String(32), primary_key=True),
+    *[Column(column, SQL_TYPES[dtype], primary_key=(column == 'Match id')) for column, dtype in MATCH_SCHEMA.items()],
+    Index('match_stats_club_season', 'Club', 'Season'),
+    Index('match_stats_date', 'Date')
+    )
+
+
+def table_name(club, year):
+    '''Returns the name of the view holding a club's season, e.g. 'Chelsea-2122'.'''
+    return f'{club}-{year[-5:-3]}{year[-2:]}'
+
+
+_fact_table_engines = set()
+
+
+def _is_legacy_table(name, engine):
+    '''Checks whether a club-season is still a table from before match_stats. Views of the same name are not counted.'''
+    return name in inspect(engine).get_table_names()
+
+
+def _ensure_fact_table(engine):
+    '''Creates the match_stats table and its indexes the first time each engine is used.'''
+    if engine not in _fact_table_engines:
+        metadata.create_all(engine)
+        _fact_table_engines.add(engine)
+
+
+def create_season_view(club, year, engine):
+    '''
+    Creates the view of a club's season on the match_stats table, named and laid out like the old
+    per club-season tables so existing queries keep working. A legacy table of the same name is
+    moved into match_stats first.
+
+    Args:
+        club (str): The club.
+        year (str): The season, e.g. '2021/22'.
+        engine (sqlalchemy.engine.Engine): The database.
+    '''
+    _ensure_fact_table(engine)
+    name = table_name(club, year)
+    if _is_legacy_table(name, engine):
+        logging.info(f'Moving legacy table {name} into match_stats...')
+        upsert_matches(pd.read_sql_table(name, engine), club, year, engine)
+        with engine.begin() as conn:
+            conn.execute(text(f'DROP TABLE "{name}"'))
+    columns = ', '.join(f'"{column}"' for column in COLUMNS)
+    club_literal = club.replace("'", "''")
+    with engine.begin() as conn:
+        conn.execute(text(f'DROP VIEW IF EXISTS "{name}"'))
+        conn.execute(text(
+            f'CREATE VIEW "{name}" AS SELECT {columns} FROM match_stats '
+            f"WHERE \"Season\" = '{year}' AND \"Club\" = '{club_literal}'"
+            ))
+
+
+def upsert_matches(df, club, year, engine):
+    '''
+    Inserts a club's matches into match_stats, replacing any already there with the same season, club and Match id.
+
+    Args:
+        df (pd.DataFrame): The club-season's rows, as made by schema.clean_frame.
+        club (str): The club.
+        year (str): The season, e.g. '2021/22'.
+        engine (sqlalchemy.engine.Engine): The database to write to.
+    '''
+    _ensure_fact_table(engine)
+    if engine.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
     else:
-        end_year = int('20' + str(year[5:]))
-    df = df[(df['Date'] > date(int(year[:4]), 8, 1)) & (df['Date'] < date(end_year, 7, 31))]  # Only show dates within selected season
+        from sqlalchemy.dialects.sqlite import insert
+    df = df.drop_duplicates('Match id', keep='last')  # An upsert cannot touch the same row twice
+    df = df.reindex(columns=COLUMNS)
+    df['Date'] = pd.to_datetime(df['Date']).dt.date
+    df = df.astype(object).where(df.notna(), None)  # Plain Python values, with None for anything missing
+    rows = [dict(row, **{'Season': year, 'Club': club}) for row in df.to_dict('records')]
+    keys = ['Season', 'Club', 'Match id']
+    with SQL_UPLOAD.time(), engine.begin() as conn:
+        for start in range(0, len(rows), 500):
+            statement = insert(match_stats).values(rows[start:start + 500])
+            statement = statement.on_conflict_do_update(
+                index_elements=keys,
+                set_={column: statement.excluded[column] for column in COLUMNS if column not in keys}
+                )
+            conn.execute(statement)
 
-    df['Location'] = df['Location'].astype('category')
-    df['Possession %']=df['Possession %'].astype('float64')
+
+def upload_to_sql(club, year, club_short=None):
+    engine = rds_connect()
+    logging.info('Creating data fram using pandas...')
+    df = clean_frame(download_records(year, club_short or CLUBS[club]), year)
 
     logging.info('Uploading to RDS...')
-    df_name = f'{club}-{year[-5:-3]}{year[-2:]}'
-    df.to_sql(df_name, engine, if_exists='replace', index=False)
+    create_season_view(club, year, engine)
+    upsert_matches(df, club, year, engine)
     return df
 
 
-def _prevent_rescraping():
+def season_exists(club, year):
+    '''
+    Checks whether the database already holds any of a club's matches from a season, in match_stats or a legacy table.
+
+    Returns:
+        bool
+    '''
     engine = rds_connect()
-    inspector = inspect(engine)
-    return inspector.get_table_names()
+    _ensure_fact_table(engine)
+    query = select(match_stats.c['Match id']).where(match_stats.c.Season == year, match_stats.c.Club == club).limit(1)
+    with engine.connect() as conn:
+        if conn.execute(query).first() is not None:
+            return True
+    return _is_legacy_table(table_name(club, year), engine)
+
+
+def season_trends(stats, clubs=None, seasons=None, engine=None):
+    '''
+    Averages statistics per game for each club and season across match_stats, in one indexed query.
+
+    Args:
+        stats (list): The names of the statistics to average, e.g. ['Shots', 'Possession %'].
+        clubs (list): Only include these clubs. Includes every club if None.
+        seasons (list): Only include these seasons, e.g. ['2020/21', '2021/22']. Includes every season if None.
+        engine (sqlalchemy.engine.Engine): The database to query. Defaults to the shared RDS engine.
+
+    Returns:
+        pd.DataFrame: One row per club and season, with the games played, wins and the average of each statistic.
+    '''
+    engine = engine if engine is not None else rds_connect()
+    _ensure_fact_table(engine)
+    query = select(
+        match_stats.c.Season,
+        match_stats.c.Club,
+        func.count().label('Games'),
+        func.sum(case((match_stats.c.Result == 'Win', 1), else_=0)).label('Wins'),
+        *[func.avg(match_stats.c[stat]).label(stat) for stat in stats]
+        ).group_by(match_stats.c.Season, match_stats.c.Club).order_by(match_stats.c.Season, match_stats.c.Club)
+    if clubs is not None:
+        query = query.where(match_stats.c.Club.in_(clubs))
+    if seasons is not None:
+        query = query.where(match_stats.c.Season.in_(seasons))
+    return pd.read_sql(query, engine)
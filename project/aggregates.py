@@ -0,0 +1,147 @@
+from typing import NamedTuple
+import pandas as pd
+from sqlalchemy import text
+from RDS import rds_connect
+
+# The statistics averaged per game at home and away
+AVERAGED_STATS = ['Goals scored', 'Goals against', 'Shots', 'Shots on target', 'Passes', 'Fouls conceded', 'Offsides']
+
+# The columns plotted match by match over the season
+SERIES_COLUMNS = ['Date', 'Goals scored', 'Shots', 'Shots on target', 'Fouls conceded', 'Yellow cards', 'Red cards']
+
+# 1 for a match played at the home stadium and 0 otherwise
+IS_HOME = 'CASE WHEN "Location" = (SELECT "Location" FROM home_stadium) THEN 1 ELSE 0 END'
+
+# Put before the name of each aggregate column in season_data, as some share their names with SERIES_COLUMNS
+SUMMARY_PREFIX = 'summary '
+
+
+class SeasonSummary(NamedTuple):
+    '''
+    The aggregated numbers behind the dashboard for one club's season.
+
+    Attributes
+    ----------
+    home_stadium (str): The most common location, taken to be the club's home stadium.
+    results (list): [wins, draws, losses] over the season.
+    possession_results (list): [wins, draws, losses] in games with more than 50% possession.
+    home (dict): The number of games and wins at home, and the average of each of AVERAGED_STATS per game.
+    away (dict): The same for away games.
+    '''
+    home_stadium: str
+    results: list
+    possession_results: list
+    home: dict
+    away: dict
+
+
+def _home_stadium(table):
+    '''Builds the common table expression that picks the most common location of a season table.'''
+    return f'''home_stadium AS (
+            SELECT "Location" FROM "{table}" GROUP BY "Location" ORDER BY COUNT(*) DESC, "Location" LIMIT 1
+        )'''
+
+
+def _grouped(table, prefix=''):
+    '''Builds the select grouped by home and away that computes every aggregate of a season table, each named after prefix.'''
+    averages = ',\n'.join(f'AVG("{stat}") AS "{prefix}{stat}"' for stat in AVERAGED_STATS)
+    return f'''
+        SELECT
+            (SELECT "Location" FROM home_stadium) AS "{prefix}home_stadium",
+            {IS_HOME} AS "{prefix}is_home",
+            COUNT(*) AS "{prefix}games",
+            SUM(CASE WHEN "Result" = 'Win' THEN 1 ELSE 0 END) AS "{prefix}wins",
+            SUM(CASE WHEN "Result" = 'Draw' THEN 1 ELSE 0 END) AS "{prefix}draws",
+            SUM(CASE WHEN "Possession %" > 50 THEN 1 ELSE 0 END) AS "{prefix}possession_games",
+            SUM(CASE WHEN "Possession %" > 50 AND "Result" = 'Win' THEN 1 ELSE 0 END) AS "{prefix}possession_wins",
+            SUM(CASE WHEN "Possession %" > 50 AND "Result" = 'Draw' THEN 1 ELSE 0 END) AS "{prefix}possession_draws",
+            {averages}
+        FROM "{table}"
+        GROUP BY "{prefix}is_home"'''
+
+
+def _summary_query(table):
+    '''Builds the grouped query that computes every aggregate of a season table in the database.'''
+    return text(f'WITH {_home_stadium(table)}{_grouped(table)}')
+
+
+def _season_query(table):
+    '''
+    Builds the query that returns the SERIES_COLUMNS of each match in date order, each joined to the aggregates
+    of its side, home or away, so the figure is drawn from one round-trip to the database.
+    '''
+    series = ', '.join(f'"{column}"' for column in SERIES_COLUMNS)
+    return text(f'''
+        WITH {_home_stadium(table)},
+        summary AS ({_grouped(table, SUMMARY_PREFIX)}
+        )
+        SELECT matches.*, summary.*
+        FROM (SELECT {series}, {IS_HOME} AS is_home FROM "{table}") AS matches
+        JOIN summary ON summary."{SUMMARY_PREFIX}is_home" = matches.is_home
+        ORDER BY matches."Date"
+        ''')
+
+
+def _summarise(rows):
+    '''Builds the SeasonSummary from the grouped rows, at most one for home and one for away.'''
+    sides = {True: {'games': 0, 'wins': 0, **{stat: 0.0 for stat in AVERAGED_STATS}}, False: None}
+    sides[False] = dict(sides[True])
+    totals = {'games': 0, 'wins': 0, 'draws': 0, 'possession_games': 0, 'possession_wins': 0, 'possession_draws': 0}
+    home_stadium = None
+    for row in rows:
+        home_stadium = row['home_stadium']
+        sides[bool(row['is_home'])] = {
+            'games': int(row['games']),
+            'wins': int(row['wins']),
+            **{stat: float(row[stat] or 0) for stat in AVERAGED_STATS}
+        }
+        for key in totals:
+            totals[key] += int(row[key] or 0)
+    return SeasonSummary(
+        home_stadium=home_stadium,
+        results=[totals['wins'], totals['draws'], totals['games'] - totals['wins'] - totals['draws']],
+        possession_results=[
+            totals['possession_wins'], totals['possession_draws'],
+            totals['possession_games'] - totals['possession_wins'] - totals['possession_draws']
+            ],
+        home=sides[True],
+        away=sides[False]
+        )
+
+
+def season_summary(table, engine=None):
+    '''
+    Computes the home/away averages, result counts and possession-split results of a season table
+    in one grouped query, so no row data leaves the database.
+
+    Args:
+        table (str): The name of the season table, e.g. 'Chelsea-2122'.
+        engine (sqlalchemy.engine.Engine): The database to query. Defaults to the shared RDS engine.
+
+    Returns:
+        SeasonSummary
+    '''
+    engine = engine if engine is not None else rds_connect()
+    with engine.connect() as connection:
+        rows = connection.execute(_summary_query(table)).mappings().all()
+    return _summarise(rows)
+
+
+def season_data(table, engine=None):
+    '''
+    Reads everything the figure of a season is drawn from in a single query: the aggregates of season_summary,
+    still computed in the database, and the SERIES_COLUMNS of each match.
+
+    Args:
+        table (str): The name of the season table, e.g. 'Chelsea-2122'.
+        engine (sqlalchemy.engine.Engine): The database to query. Defaults to the shared RDS engine.
+
+    Returns:
+        tuple: (SeasonSummary, pd.DataFrame of the SERIES_COLUMNS in date order)
+    '''
+    engine = engine if engine is not None else rds_connect()
+    df = pd.read_sql(_season_query(table), engine)
+    summary = df.filter(like=SUMMARY_PREFIX).drop_duplicates(f'{SUMMARY_PREFIX}is_home')
+    summary.columns = [column[len(SUMMARY_PREFIX):] for column in summary.columns]
+    rows = summary.astype(object).where(summary.notna(), None).to_dict('records')
+    return _summarise(rows), df[SERIES_COLUMNS].reset_index(drop=True)
@@ -0,0 +1,350 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+import aiohttp
+from backends import BackendError, parse_match, parse_page
+from ledger import ScrapeLedger
+from metrics import EXTRACTION, RETRIES
+from page_cache import CacheMiss, PageCache, cache_url, is_final
+from pipeline import StreamingPipeline
+from scraper import PremierLeagueScraper
+from storage import S3Writer
+from valid_inputs import CLUBS, LEAGUE, validate
+
+logging.basicConfig(level = logging.INFO)
+
+
+class TokenBucket:
+    '''
+    This class is used to limit the rate of requests shared by every coroutine of an engine.
+    Tokens are added at a steady rate up to a set capacity, and each request takes one, waiting if there are none left.
+
+    Attributes
+    ----------
+    rate (float): Tokens added per second, i.e. the long-run requests per second.
+    capacity (float): The most tokens held at once, i.e. the largest burst of requests.
+    '''
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = None  # Created in the event loop the bucket is first used in
+
+    async def acquire(self):
+        '''Takes a token, waiting until one is available. Waiting coroutines are served in turn.'''
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class AsyncHttpBackend:
+    '''
+    This class is used to fetch the fixture list and match stats from the JSON API behind the Premier League website
+    with asyncio, so many requests can be in flight at once. Every request takes a token from the shared limiter,
+    and at most per_host requests are open to any one host. Used as an async context manager.
+
+    Attributes
+    ----------
+    api_url (str): The base URL of the football API.
+    limiter (TokenBucket): The rate limit shared by every request.
+    per_host (int): The most requests open to one host at a time.
+    timeout (float): Seconds to wait for each response.
+    max_retries (int): The number of times a request is tried again after a timeout, a 429 or a server error.
+    backoff (float): Seconds to wait before the first retry, doubled for each retry after.
+    cache (PageCache): Serves the pages already fetched if not None.
+    '''
+
+    def __init__(self, api_url='https://footballapi.pulselive.com/football', requests_per_second=5, per_host=4,
+            timeout=10, max_retries=2, backoff=0.5, limiter=None, cache=None):
+        self.api_url = api_url.rstrip('/')
+        self.limiter = limiter if limiter is not None else TokenBucket(requests_per_second)
+        self.per_host = per_host
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.cache = cache
+        self.session = None
+        self._semaphores = {}
+
+    async def __aenter__(self):
+        self.session = aiohttp.ClientSession(
+            headers={
+                'Origin': 'https://www.premierleague.com',  # The API refuses requests from other origins
+                'Accept': 'application/json'
+                },
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+            connector=aiohttp.TCPConnector(limit_per_host=self.per_host)
+            )
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.session.close()
+
+    def _host_semaphore(self, url):
+        '''Returns the semaphore capping the requests open to the host of the URL.'''
+        host = urlsplit(url).netloc
+        if host not in self._semaphores:
+            self._semaphores[host] = asyncio.Semaphore(self.per_host)
+        return self._semaphores[host]
+
+    async def _get(self, path, season=None, **params):
+        '''
+        Sends a GET request to the API and decodes the JSON response, retrying timeouts, 429s and server errors.
+        The page cache is read first, and no token is taken for a page served from it.
+
+        Args:
+            path (str): The endpoint, relative to the base URL.
+            season (str): The season the page belongs to, e.g. '2021/22', which the page cache keys it by.
+
+        Returns:
+            dict
+        '''
+        url = f'{self.api_url}/{path}'
+        params = {key: str(value) for key, value in params.items()}
+        if self.cache is not None:
+            content = self.cache.get(cache_url(url, params), season)
+            if content is not None:
+                return json.loads(content)
+            if self.cache.offline:
+                raise CacheMiss(f'{path} is not in the page cache.')
+        error = None
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                RETRIES.labels('http').inc()
+                await asyncio.sleep(self.backoff * 2 ** (attempt - 1))
+            await self.limiter.acquire()
+            try:
+                async with self._host_semaphore(url), self.session.get(url, params=params) as response:
+                    if response.status == 429 or response.status >= 500:
+                        error = f'HTTP {response.status}'
+                        continue
+                    if response.status >= 400:
+                        raise BackendError(f'Could not fetch {path}: HTTP {response.status}')
+                    content = await response.read()
+                    payload = json.loads(content)
+                if self.cache is not None:
+                    self.cache.put(cache_url(url, params), season, content, is_final(path, season, payload))
+                return payload
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                error = repr(e)
+        raise BackendError(f'Could not fetch {path}: {error}')
+
+    async def _get_all(self, path, season=None, **params):
+        '''Follows the pagination of a list endpoint and returns the content of every page.'''
+        content = []
+        page = 0
+        while True:
+            items, pages = parse_page(path, await self._get(path, season, page=page, pageSize=100, **params))
+            content += items
+            page += 1
+            if page >= pages:
+                return content
+
+    async def _season_id(self, year):
+        '''Finds the API's ID for a season, e.g. 418 for 2021/22.'''
+        for season in await self._get_all('competitions/1/compseasons'):
+            if season['label'] == year:
+                return int(season['id'])
+        raise BackendError(f'No {year} season in the API.')
+
+    async def _team_id(self, club, season_id, year=None):
+        '''Finds the API's ID for a club in a season, or None if the club was not in the league.'''
+        for team in await self._get_all('teams', year, comps=1, compSeasons=season_id):
+            if team['club']['abbr'] == CLUBS[club]:
+                return int(team['id'])
+        return None
+
+    async def fixture_links(self, club, year):
+        '''
+        Retrieves the links to each completed match the club played over the course of the season.
+        If club is LEAGUE, retrieves every match of the season.
+
+        Returns:
+            list: Links in the same format as the data-href attribute on the results page.
+        '''
+        season_id = await self._season_id(year)
+        if club == LEAGUE:
+            fixtures = await self._get_all('fixtures', year, comps=1, compSeasons=season_id, statuses='C', sort='asc')
+        else:
+            team_id = await self._team_id(club, season_id, year)
+            if team_id is None:
+                return []
+            fixtures = await self._get_all('fixtures', year, comps=1, compSeasons=season_id, teams=team_id, statuses='C', sort='asc')
+        return [f"//www.premierleague.com/match/{int(fixture['id'])}" for fixture in fixtures]
+
+    async def match_record(self, link, year=None):
+        '''
+        Fetches the stats of a single match.
+
+        Args:
+            link (str): The URL of the fixture to be inspected.
+            year (str): The season the match was played in, which the page cache keys it by.
+
+        Returns:
+            MatchRecord: The raw match information.
+        '''
+        return parse_match(await self._get(f'stats/match/{link.rstrip("/").split("/")[-1]}', year))
+
+
+class AsyncEngine:
+    '''
+    This class is used to scrape many club-seasons at once, overlapping the requests for every match of every season.
+    The blocking sinks (S3, the ledger, the streaming pipeline and the SQL load) run in a thread pool so they never hold up the event loop.
+
+    Attributes
+    ----------
+    backend (AsyncHttpBackend): Fetches the fixtures and match stats.
+    storage (S3Writer): Buffers the match records and writes them to the S3 bucket.
+    ledger (ScrapeLedger): Records which matches have been scraped, so they are skipped on the next run.
+    load (bool): Whether each season is loaded into RDS once it has been scraped.
+    stream (bool): Whether the records of each season are streamed into the database through a StreamingPipeline,
+        as with pipeline=stream for the scraper, rather than saved to S3 and loaded once the season is done.
+    archive (bool): Whether streamed records are also saved to S3.
+    '''
+
+    def __init__(self, backend, storage=None, ledger=None, sink_threads=4, load=True, stream=False, archive=True):
+        self.backend = backend
+        self.storage = storage if storage is not None else S3Writer()
+        self.ledger = ledger if ledger is not None else ScrapeLedger(os.environ.get('ledger_path', 'scrape_ledger.db'))
+        self.load = load
+        self.stream = stream
+        self.archive = archive
+        self._executor = ThreadPoolExecutor(sink_threads)
+
+    async def _sink(self, function, *args):
+        '''Runs a blocking call in the sink thread pool.'''
+        return await asyncio.get_running_loop().run_in_executor(self._executor, function, *args)
+
+    async def _scrape_match(self, scraper, link):
+        '''Fetches and stores one match, returning False if it could not be fetched or, offline, is not in the page cache.'''
+        start = time.perf_counter()
+        try:
+            record = await self.backend.match_record(link, scraper.year)
+        except (BackendError, CacheMiss) as e:
+            logging.error(f'Could not scrape {link}: {e}')
+            return False
+        EXTRACTION.labels('async').observe(time.perf_counter() - start)
+        await self._sink(scraper._store_match, record)
+        return True
+
+    async def scrape_season(self, club, year):
+        '''
+        Scrapes the matches of a club's season not already in the ledger, all at once, then loads the season.
+        The scraper's helpers store, ledger and load the records, sharing the engine's storage, ledger and page cache.
+
+        Args:
+            club (str): The club, or LEAGUE for every club in the season.
+            year (str): The season, e.g. '2021/22'.
+
+        Returns:
+            int: The number of matches scraped, or None if the club was not in the league that season.
+        '''
+        scraper = PremierLeagueScraper(driver=None, storage=self.storage, ledger=self.ledger, cache=self.backend.cache)
+        scraper.club, scraper.year = club, year
+        try:
+            return await self._scrape_season(scraper, club, year)
+        finally:
+            scraper.close()
+
+    async def _scrape_season(self, scraper, club, year):
+        '''Scrapes and loads a season with a scraper set up by scrape_season.'''
+        links = await self.backend.fixture_links(club, year)
+        if not links:
+            logging.error(f'{club} were not in the premier league during the {year} season.')
+            return None
+        links = await self._sink(scraper._unscraped, [f'https:{link}' for link in links])
+        if self.stream:
+            scraper.pipeline = StreamingPipeline(year, archive=self.storage if self.archive else None)
+        logging.info(f'Scraping {len(links)} matches of {club} {year}...')
+        scraped = sum(await asyncio.gather(*(self._scrape_match(scraper, link) for link in links)))
+        if scraped < len(links):
+            logging.error(f'{len(links) - scraped} matches of {club} {year} could not be scraped.')
+        if scraped and self.load:
+            # Also waits for the pipeline's last batch, raising PipelineError if any records could not be written
+            await self._sink(scraper._load_season, sorted(scraper.clubs_scraped) if club == LEAGUE else [club])
+        elif scraper.pipeline is not None:
+            await self._sink(scraper.pipeline.close)
+        elif scraped:
+            # Nothing is loaded, so a record is done once it is in S3
+            await self._sink(self.storage.flush)
+            for stored_club in list(scraper.unloaded):
+                await self._sink(scraper._mark_loaded, stored_club)
+        return scraped
+
+    async def run(self, jobs):
+        '''
+        Scrapes every club-season at once and waits for the records to be saved.
+
+        Args:
+            jobs (list): (club, year) pairs.
+
+        Returns:
+            dict: For each (club, year), the number of matches scraped, None if the club was not in the league,
+                or the exception that stopped it.
+        '''
+        results = await asyncio.gather(*(self.scrape_season(club, year) for club, year in jobs), return_exceptions=True)
+        for (club, year), result in zip(jobs, results):
+            if isinstance(result, Exception):
+                logging.error(f'Could not scrape {club} {year}: {result!r}')
+        if not await self._sink(self.storage.flush):
+            logging.error(f'{len(self.storage.failed)} matches could not be saved to S3: {self.storage.failed}')
+        return dict(zip(jobs, results))
+
+    def close(self):
+        '''Stops the sink threads and saves anything still buffered.'''
+        self._executor.shutdown(wait=True)
+        self.storage.close()
+        self.ledger.close()
+
+
+async def scrape_async(jobs, requests_per_second=5, per_host=4, stream=False):
+    '''
+    Scrapes and loads club-seasons with the asyncio engine.
+
+    Args:
+        jobs (list): (club, year) pairs, e.g. [('Chelsea', '2021/22')].
+        requests_per_second (float): The most requests per second across every job.
+        per_host (int): The most requests open to one host at a time.
+        stream (bool): Whether records are streamed into the database as they are scraped.
+
+    Returns:
+        dict: The result of each job, as returned by AsyncEngine.run.
+
+    Raises:
+        ValueError: If any club or season is unknown, before anything is scraped.
+    '''
+    for club, year in jobs:
+        validate(club, year)
+    async with AsyncHttpBackend(requests_per_second=requests_per_second, per_host=per_host, cache=PageCache.from_env()) as backend:
+        engine = AsyncEngine(backend, stream=stream, archive=os.environ.get('archive', 'true') == 'true')
+        try:
+            return await engine.run(jobs)
+        finally:
+            engine.close()
+
+
+if __name__ == '__main__':
+    # e.g. python async_engine.py "Chelsea:2021/22" "Arsenal:2021/22"
+    results = asyncio.run(scrape_async(
+        [tuple(arg.split(':')) for arg in sys.argv[1:]],
+        float(os.environ.get('requests_per_second', 5)),
+        int(os.environ.get('per_host', 4)),
+        os.environ.get('pipeline') == 'stream'
+        ))
+    for (club, year), result in results.items():
+        logging.info(f'{club} {year}: {result}')
@@ -0,0 +1,230 @@
+import json
+import logging
+from datetime import datetime
+from typing import NamedTuple
+import requests
+from requests.adapters import HTTPAdapter
+from page_cache import CacheMiss, cache_url, is_final
+from valid_inputs import CLUBS, LEAGUE
+
+logging.basicConfig(level = logging.INFO)
+
+# The statistics shown in the match centre stats table, in the order they appear on the page
+STAT_NAMES = {
+    'possession_percentage': 'Possession %',
+    'ontarget_scoring_att': 'Shots on target',
+    'total_scoring_att': 'Shots',
+    'touches': 'Touches',
+    'total_pass': 'Passes',
+    'total_tackle': 'Tackles',
+    'total_clearance': 'Clearances',
+    'corner_taken': 'Corners',
+    'total_offside': 'Offsides',
+    'fk_foul_lost': 'Fouls conceded',
+    'total_yel_card': 'Yellow cards',
+    'total_red_card': 'Red cards'
+}
+
+
+class MatchRecord(NamedTuple):
+    '''
+    The raw information on a single match, as shown on its stats page.
+
+    Attributes
+    ----------
+    match_no (str): The unique match number taken from the end of the URL.
+    date (str): Date in datetime format (%a %d %b %Y).
+    stadium (str): The name and location of the stadium played at.
+    home (str): The shortened name of the home club.
+    away (str): The shortened name of the away club.
+    home_score (int): Goals scored by the home club.
+    away_score (int): Goals scored by the away club.
+    stats (list): The text of each row of the stats table, in format 'home_stat stat name away_stat'.
+    home_name (str): The name of the home club as shown on the page, if it was read.
+    away_name (str): The name of the away club as shown on the page, if it was read.
+    '''
+    match_no: str
+    date: str
+    stadium: str
+    home: str
+    away: str
+    home_score: int
+    away_score: int
+    stats: list
+    home_name: str = None
+    away_name: str = None
+
+
+class BackendError(Exception):
+    '''Raised when a backend cannot fetch or make sense of a page, so the caller can fall back to Chrome.'''
+
+
+def parse_match(payload):
+    '''
+    Turns the JSON payload of the match stats endpoint into a match record.
+
+    Args:
+        payload (dict): The decoded response of /stats/match/{match_no}.
+
+    Returns:
+        MatchRecord: The raw match information.
+    '''
+    try:
+        fixture = payload['entity']
+        home, away = fixture['teams']
+        kickoff = datetime.utcfromtimestamp(fixture['kickoff']['millis'] / 1000)
+        team_stats = []
+        for team in (home, away):
+            stats = payload['data'].get(str(int(team['team']['id'])), {}).get('M', [])
+            team_stats.append({stat['name']: stat['value'] for stat in stats})
+        rows = []
+        for key, name in STAT_NAMES.items():
+            if key in team_stats[0] or key in team_stats[1]:
+                home_stat, away_stat = (f'{stats.get(key, 0):g}' for stats in team_stats)
+                rows.append(f'{home_stat} {name} {away_stat}')
+        return MatchRecord(
+            match_no=str(int(fixture['id'])),
+            date=kickoff.strftime('%a %d %b %Y'),
+            stadium=f"{fixture['ground']['name']}, {fixture['ground']['city']}",
+            home=home['team']['club']['abbr'],
+            away=away['team']['club']['abbr'],
+            home_score=int(home['score']),
+            away_score=int(away['score']),
+            stats=rows,
+            home_name=home['team'].get('shortName'),
+            away_name=away['team'].get('shortName')
+            )
+    except (KeyError, TypeError, ValueError) as e:
+        raise BackendError(f'Unexpected match payload: {e!r}')
+
+
+def parse_page(path, payload):
+    '''
+    Reads one page of a paginated list endpoint.
+
+    Args:
+        path (str): The endpoint the page came from, for the error message.
+        payload (dict): The decoded response.
+
+    Returns:
+        tuple: (list of the items on the page, the number of pages)
+
+    Raises:
+        BackendError: If the page has no content or page count.
+    '''
+    try:
+        return list(payload['content']), int(payload['pageInfo']['numPages'])
+    except (KeyError, TypeError, ValueError) as e:
+        raise BackendError(f'Unexpected {path} payload: {e!r}')
+
+
+class HttpBackend:
+    '''
+    This class is used to fetch the fixture list and match stats over plain HTTP from the JSON API
+    behind the Premier League website, without rendering any pages in a browser.
+
+    Attributes
+    ----------
+    api_url (str): The base URL of the football API.
+    session (requests.Session): Session keeping a pool of keep-alive connections to the API.
+    timeout (float): Seconds to wait for each response.
+    cache (PageCache): Serves the pages already fetched if not None.
+    '''
+
+    def __init__(self, api_url='https://footballapi.pulselive.com/football', pool_size=10, timeout=10, cache=None):
+        self.api_url = api_url.rstrip('/')
+        self.timeout = timeout
+        self.cache = cache
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=2)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers.update({
+            'Origin': 'https://www.premierleague.com',  # The API refuses requests from other origins
+            'Accept': 'application/json'
+            })
+
+    def _get(self, path, season=None, **params):
+        '''
+        Sends a GET request to the API and decodes the JSON response, or reads it from the page cache if it is there.
+
+        Args:
+            path (str): The endpoint, relative to the base URL.
+            season (str): The season the page belongs to, e.g. '2021/22', which the page cache keys it by.
+
+        Returns:
+            dict
+        '''
+        url = f'{self.api_url}/{path}'
+        if self.cache is not None:
+            content = self.cache.get(cache_url(url, params), season)
+            if content is not None:
+                return json.loads(content)
+            if self.cache.offline:
+                raise CacheMiss(f'{path} is not in the page cache.')
+        try:
+            response = self.session.get(url, params=params, timeout=self.timeout)
+            response.raise_for_status()
+            payload = response.json()
+        except (requests.RequestException, ValueError) as e:
+            raise BackendError(f'Could not fetch {path}: {e!r}')
+        if self.cache is not None:
+            self.cache.put(cache_url(url, params), season, response.content, is_final(path, season, payload))
+        return payload
+
+    def _get_all(self, path, season=None, **params):
+        '''Follows the pagination of a list endpoint and returns the content of every page.'''
+        content = []
+        page = 0
+        while True:
+            items, pages = parse_page(path, self._get(path, season, page=page, pageSize=100, **params))
+            content += items
+            page += 1
+            if page >= pages:
+                return content
+
+    def _season_id(self, year):
+        '''Finds the API's ID for a season, e.g. 418 for 2021/22.'''
+        for season in self._get_all('competitions/1/compseasons'):
+            if season['label'] == year:
+                return int(season['id'])
+        raise BackendError(f'No {year} season in the API.')
+
+    def _team_id(self, club, season_id, year=None):
+        '''Finds the API's ID for a club in a season, or None if the club was not in the league.'''
+        for team in self._get_all('teams', year, comps=1, compSeasons=season_id):
+            if team['club']['abbr'] == CLUBS[club]:
+                return int(team['id'])
+        return None
+
+    def fixture_links(self, club, year):
+        '''
+        Retrieves the links to each completed match the club played over the course of the season.
+        If club is LEAGUE, retrieves every match of the season.
+
+        Returns:
+            list: Links in the same format as the data-href attribute on the results page.
+        '''
+        logging.info('Getting fixture links over HTTP...')
+        season_id = self._season_id(year)
+        if club == LEAGUE:
+            fixtures = self._get_all('fixtures', year, comps=1, compSeasons=season_id, statuses='C', sort='asc')
+        else:
+            team_id = self._team_id(club, season_id, year)
+            if team_id is None:
+                return []
+            fixtures = self._get_all('fixtures', year, comps=1, compSeasons=season_id, teams=team_id, statuses='C', sort='asc')
+        return [f"//www.premierleague.com/match/{int(fixture['id'])}" for fixture in fixtures]
+
+    def match_record(self, link, year=None):
+        '''
+        Fetches the stats of a single match.
+
+        Args:
+            link (str): The URL of the fixture to be inspected.
+            year (str): The season the match was played in, which the page cache keys it by.
+
+        Returns:
+            MatchRecord: The raw match information.
+        '''
+        return parse_match(self._get(f'stats/match/{link.rstrip("/").split("/")[-1]}', year))
@@ -0,0 +1,346 @@
+import os
+import sys
+import json
+import random
+import socket
+import logging
+import argparse
+import tempfile
+import threading
+from datetime import date, datetime, timedelta, timezone
+from contextlib import contextmanager
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from time import perf_counter
+import matplotlib
+matplotlib.use('Agg')  # Renders to files only, so no display is needed
+
+logging.basicConfig(level = logging.INFO)
+
+# The recorded pages and baseline are committed next to this file, so every checkout compares against them
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+BROWSER_STAGES = ['season_select', 'scroll_load', 'link_harvest', 'match_extraction', 'per_match_extraction']
+STAGES = BROWSER_STAGES + ['match_parse', 's3_write', 'sql_load', 'graph_render']
+
+# How much slower than the baseline each stage may be. Stages driving Chrome or a local server vary more from run to run
+TOLERANCES = {
+    'season_select': 0.5, 'scroll_load': 0.5, 'link_harvest': 0.5, 'match_extraction': 0.4, 'per_match_extraction': 0.4,
+    'match_parse': 0.5, 's3_write': 0.5, 'sql_load': 0.3, 'graph_render': 0.3
+}
+
+
+class ReplayHandler(SimpleHTTPRequestHandler):
+    '''Serves the recorded pages: /results from results.html and /match/<match_no> from match/<match_no>.html.'''
+
+    def translate_path(self, path):
+        return super().translate_path(path.split('?')[0].rstrip('/') + '.html')
+
+    def log_message(self, format, *args):
+        pass
+
+
+@contextmanager
+def _serve(directory):
+    '''Serves a directory on a free local port for the length of the with block, yielding its base URL.'''
+    server = ThreadingHTTPServer(('127.0.0.1', 0), partial(ReplayHandler, directory=directory))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        yield f'http://127.0.0.1:{server.server_port}'
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def _free_port():
+    '''Returns a local port nothing is listening on.'''
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _fixture_html(match_no, kickoff, home, away):
+    millis = int(datetime(kickoff.year, kickoff.month, kickoff.day, 15, tzinfo=timezone.utc).timestamp() * 1000)
+    return (f'<li class="matchFixtureContainer" data-home="{home}" data-away="{away}">'
+            f'<div class="fixture postMatch" data-href="//www.premierleague.com/match/{match_no}" data-comp-match-item="{match_no}" '
+            f'data-comp-match-item-ko="{millis}">'
+            f'{home} v {away}</div></li>')
+
+
+def _match_html(match_no, kickoff, home, away, rng):
+    stats = [
+        ('Possession %', lambda: round(rng.uniform(30, 70), 1)), ('Shots on target', lambda: rng.randint(0, 12)),
+        ('Shots', lambda: rng.randint(4, 25)), ('Touches', lambda: rng.randint(400, 900)), ('Passes', lambda: rng.randint(250, 750)),
+        ('Tackles', lambda: rng.randint(5, 25)), ('Clearances', lambda: rng.randint(5, 40)), ('Corners', lambda: rng.randint(0, 12)),
+        ('Offsides', lambda: rng.randint(0, 5)), ('Fouls conceded', lambda: rng.randint(4, 18)), ('Yellow cards', lambda: rng.randint(0, 5))
+    ]
+    rows = ''.join(f'<tr><td><p>{value()}</p></td><td><p>{name}</p></td><td><p>{value()}</p></td></tr>' for name, value in stats)
+    return f'''<html><body>
+<div class="matchDate renderMatchDateContainer">{kickoff.strftime('%a %d %b %Y')}</div>
+<div class="stadium">{home} Stadium, {home}</div>
+<div class="scoreboxContainer">
+  <div class="team home"><span class="short">{home}</span></div>
+  <div class="score fullTime">{rng.randint(0, 4)}-{rng.randint(0, 4)}</div>
+  <div class="team away"><span class="short">{away}</span></div>
+</div>
+<ul><li data-tab-index="0">Line-ups</li><li data-tab-index="2">Stats</li></ul>
+<table><tbody class="matchCentreStatsContainer">{rows}</tbody></table>
+</body></html>'''
+
+
+def synthesise_pages(directory, club='Chelsea', year='2021/22', seed=0):
+    '''
+    Writes a results page and the club's match pages with the same structure as premierleague.com, for when no
+    recorded pages are available. The results page holds a full 20-team season; match pages are only written for the club.
+
+    Args:
+        directory (str): Where to write results.html and match/<match_no>.html.
+        club (str): The club whose match pages are written.
+        year (str): The season shown in the season dropdown.
+    '''
+    from valid_inputs import CLUBS
+    rng = random.Random(seed)
+    clubs = [club] + [name for name in CLUBS if name != club][:19]
+    os.makedirs(os.path.join(directory, 'match'), exist_ok=True)
+    fixtures = []
+    kickoff = date(int(year[:4]), 8, 14)
+    for i, (home, away) in enumerate((home, away) for home in clubs for away in clubs if home != away):
+        match_no = 66000 + i
+        played = kickoff + timedelta(days=i // 10 * 7)
+        fixtures.append(_fixture_html(match_no, played, home, away))
+        if club in (home, away):
+            with open(os.path.join(directory, 'match', f'{match_no}.html'), 'w') as f:
+                f.write(_match_html(match_no, played, CLUBS[home], CLUBS[away], rng))
+    with open(os.path.join(directory, 'results.html'), 'w') as f:
+        f.write(f'''<html><body><div id="mainContent"><div></div><div></div>
+<div><div>
+  <section>
+    <div>Filter by season</div>
+    <div role="button" aria-labelledby="dd-compSeasons">2022/23</div>
+    <div><ul>
+      <li onclick="document.querySelector('[aria-labelledby=dd-compSeasons]').textContent = this.textContent">2022/23</li>
+      <li onclick="document.querySelector('[aria-labelledby=dd-compSeasons]').textContent = this.textContent">{year}</li>
+    </ul></div>
+  </section>
+  <div></div>
+  <div><section class="fixtures"><div class="fixtures__matches-list"><ul>{''.join(fixtures)}</ul></div></section></div>
+</div></div>
+</div></body></html>''')
+
+
+def record_pages(directory, club='Chelsea', year='2021/22'):
+    '''
+    Records the live results page and the club's match pages, with the stats tab open, for later replay.
+
+    Args:
+        directory (str): Where to write results.html and match/<match_no>.html.
+    '''
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.webdriver.support.ui import WebDriverWait
+    from scraper import PremierLeagueScraper
+    scraper = PremierLeagueScraper(driver=None)
+    scraper.club, scraper.year = club, year
+    os.makedirs(os.path.join(directory, 'match'), exist_ok=True)
+    try:
+        links = scraper._scrape_links()
+        with open(os.path.join(directory, 'results.html'), 'w') as f:
+            f.write(scraper.driver.page_source)
+        for link in links:
+            scraper.driver.get(f'https:{link}')
+            WebDriverWait(scraper.driver, 10).until(EC.element_to_be_clickable((By.XPATH, '//li[@data-tab-index="2"]'))).click()
+            scraper._extract_match(link)  # Waits for the stats to be shown
+            with open(os.path.join(directory, 'match', f'{link[-5:]}.html'), 'w') as f:
+                f.write(scraper.driver.page_source)
+    finally:
+        scraper._quit_driver()
+    logging.info(f'{len(links)} match pages recorded in {directory}.')
+
+
+def calibrate(rounds=3):
+    '''
+    Times a fixed CPU-bound workload that none of the code being benchmarked runs, so the stages can be compared
+    as multiples of it rather than in seconds, and a baseline stored on one machine holds on another.
+
+    Returns:
+        float: The fastest of the rounds, in seconds.
+    '''
+    best = None
+    for _ in range(rounds):
+        rng = random.Random(0)
+        start = perf_counter()
+        values = sorted(rng.random() for _ in range(200000))
+        json.loads(json.dumps({str(i): value for i, value in enumerate(values)}))
+        elapsed = perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def run_benchmark(directory, club='Chelsea', year='2021/22', browser=True):
+    '''
+    Replays the recorded pages from a local server and times each stage of the pipeline,
+    using a local S3 stand-in and a SQLite database in place of AWS.
+
+    Args:
+        directory (str): The recorded pages.
+        browser (bool): Whether the stages that drive Chrome are timed. If False, only the stages from
+            match_parse on are, with the records read straight from the recorded pages.
+
+    Returns:
+        dict: The seconds taken by each stage, and by the calibration workload.
+    '''
+    from moto.server import ThreadedMotoServer
+    timings = {'calibration': calibrate()}
+
+    @contextmanager
+    def stage(name):
+        start = perf_counter()
+        yield
+        timings[name] = perf_counter() - start
+        logging.info(f'{name}: {timings[name]:.3f}s')
+
+    with _serve(directory) as base, tempfile.TemporaryDirectory() as workdir:
+        s3_port = _free_port()
+        moto = ThreadedMotoServer(ip_address='127.0.0.1', port=s3_port, verbose=False)
+        moto.start()
+        os.environ.update({
+            's3_endpoint_url': f'http://127.0.0.1:{s3_port}',
+            'aws_access_key_id': 'benchmark',
+            'aws_secret_access_key': 'benchmark',
+            'database_url': f"sqlite:///{os.path.join(workdir, 'benchmark.db')}"
+            })
+        import RDS
+        import valid_inputs
+        from graphs import CreateGraph
+        from ledger import ScrapeLedger
+        from match_page import parse_match_page
+        from scraper import PremierLeagueScraper
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support import expected_conditions as EC
+        from selenium.webdriver.support.ui import WebDriverWait
+        from storage import S3Writer, s3_client, s3_key
+        RDS.dispose_engine()
+        client = s3_client()
+        try:
+            client.create_bucket(Bucket='premier-league-bucket', CreateBucketConfiguration={'LocationConstraint': 'eu-west-2'})
+        except client.exceptions.BucketAlreadyOwnedByYou:
+            pass  # The stand-in keeps its buckets between runs in one process
+        storage = S3Writer()
+        scraper = PremierLeagueScraper(driver=None, storage=storage, ledger=ScrapeLedger(':memory:'))
+        scraper.URL = f'{base}/results'
+        scraper.club, scraper.year = club, year
+        club_short = valid_inputs.CLUBS[club]
+        try:
+            if browser:
+                scraper.driver.get(scraper.URL)
+                with stage('season_select'):
+                    scraper._select_season()
+                with stage('scroll_load'):
+                    scraper._scroll_to_bottom(38)
+                with stage('link_harvest'):
+                    links = scraper._get_fixture_link_list(38)
+                with stage('match_extraction'):
+                    for link in links:
+                        local_link = f'{base}/match/{link[-5:]}'
+                        scraper.driver.get(local_link)
+                        WebDriverWait(scraper.driver, 10).until(EC.element_to_be_clickable((By.XPATH, '//li[@data-tab-index="2"]'))).click()
+                        scraper._extract_match(local_link)
+                timings['per_match_extraction'] = timings['match_extraction'] / len(links)
+            pages = sorted(os.listdir(os.path.join(directory, 'match')))
+            sources = []
+            for page in pages:
+                with open(os.path.join(directory, 'match', page)) as f:
+                    sources.append(f.read())
+            records = []
+            with stage('match_parse'):
+                for page, source in zip(pages, sources):
+                    record = scraper._match_record(f'{base}/match/{page[:5]}', parse_match_page(source))
+                    info = scraper._club_view(record, club_short)
+                    records.append(scraper._create_dictionary(info, scraper._split_stats_list(info[2])))
+            with stage('s3_write'):
+                for record in records:
+                    storage.put(s3_key(year, club_short, record['Match id']), record)
+                storage.flush()
+            with stage('sql_load'):
+                RDS.upload_to_sql(club, year)
+            with stage('graph_render'):
+                graph = CreateGraph(club, year)
+                graph.draw()
+                graph.fig.savefig(os.path.join(workdir, 'benchmark.png'))
+        finally:
+            scraper._quit_driver()
+            storage.close()
+            RDS.dispose_engine()
+            moto.stop()
+    return timings
+
+
+def compare(timings, baseline, tolerance=None):
+    '''
+    Compares the timings with a stored baseline. If both hold a calibration time, the baseline is first scaled by
+    how much faster or slower this machine ran the calibration workload, so only the code itself is compared.
+
+    Args:
+        timings (dict): The seconds taken by each stage in this run.
+        baseline (dict): The seconds taken by each stage in the baseline run.
+        tolerance (float): How much slower than the baseline every stage may be, e.g. 0.2 for 20%. Each stage's
+            own tolerance from TOLERANCES is used if None.
+
+    Returns:
+        list: (stage, scaled baseline seconds, seconds) of each stage slower than its tolerance allows.
+    '''
+    scale = timings['calibration'] / baseline['calibration'] if 'calibration' in timings and 'calibration' in baseline else 1
+    regressions = []
+    for name in STAGES:
+        if name in baseline and name in timings:
+            allowed = TOLERANCES.get(name, 0.2) if tolerance is None else tolerance
+            if timings[name] > baseline[name] * scale * (1 + allowed):
+                regressions.append((name, baseline[name] * scale, timings[name]))
+    return regressions
+
+
+def missing_stages(timings, baseline):
+    '''Returns the stages timed in this run that the baseline has no entry for, including the calibration.'''
+    return [name for name in ['calibration'] + STAGES if name in timings and name not in baseline]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Times each stage of the scraper against recorded pages.')
+    parser.add_argument('--pages', default=os.path.join(HERE, 'benchmark_pages'), help='directory of recorded pages, synthesised if empty')
+    parser.add_argument('--record', action='store_true', help='record the live pages into --pages and exit')
+    parser.add_argument('--baseline', default=os.path.join(HERE, 'benchmark_baseline.json'), help='stored timings to compare against')
+    parser.add_argument('--save-baseline', action='store_true', help='store this run as the new baseline')
+    parser.add_argument('--tolerance', type=float, help='allowed slowdown of every stage, e.g. 0.2 for 20%%, in place of TOLERANCES')
+    parser.add_argument('--no-browser', action='store_true', help='only time the stages that do not need Chrome')
+    parser.add_argument('--output', help='write the timings as JSON to this file as well as stdout')
+    args = parser.parse_args()
+
+    if args.record:
+        record_pages(args.pages)
+        sys.exit()
+    if not os.path.exists(os.path.join(args.pages, 'results.html')):
+        logging.info(f'No recorded pages in {args.pages}, synthesising them...')
+        synthesise_pages(args.pages)
+    timings = run_benchmark(args.pages, browser=not args.no_browser)
+    print(json.dumps(timings, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(timings, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(timings, f, indent=2)
+        logging.info(f'Baseline saved to {args.baseline}.')
+    elif not os.path.exists(args.baseline):
+        logging.error(f'No baseline at {args.baseline} to compare against. Store one with --save-baseline.')
+        sys.exit(2)
+    else:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        missing = missing_stages(timings, baseline)
+        if missing:
+            logging.error(f'No baseline for {missing}, so they cannot be checked. Store them with --save-baseline.')
+            sys.exit(2)
+        regressions = compare(timings, baseline, args.tolerance)
+        for name, before, after in regressions:
+            logging.error(f'{name} regressed: {before:.3f}s -> {after:.3f}s')
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,129 @@
+import os
+import fcntl
+import logging
+import itertools
+from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.chrome.options import Options
+
+logging.basicConfig(level = logging.INFO)
+
+# Requests Chrome is told not to make: media, fonts and third-party ads and trackers. Images are turned off in the profile
+BLOCKED_URLS = [
+    '*.mp4', '*.webm', '*.m3u8', '*.mp3',
+    '*.woff', '*.woff2', '*.ttf', '*.otf',
+    '*doubleclick.net*', '*googlesyndication.com*', '*googleadservices.com*', '*googletagservices.com*',
+    '*googletagmanager.com*', '*google-analytics.com*', '*adservice.google.*', '*amazon-adsystem.com*',
+    '*facebook.net*', '*connect.facebook.com*', '*scorecardresearch.com*', '*hotjar.com*',
+    '*taboola.com*', '*outbrain.com*', '*optimizely.com*', '*chartbeat.com*', '*quantserve.com*'
+]
+
+
+class BrowserFactory:
+    '''
+    This class is used to open the headless Chrome browsers used by the scraper and each of its workers, all from one lean profile:
+    images, media, fonts, ads and trackers are not loaded, and pages count as loaded once the DOM is ready.
+
+    Attributes
+    ----------
+    block_resources (bool): Whether images and the requests in blocked_urls are blocked.
+    blocked_urls (list): URL patterns, with * as a wildcard, that Chrome does not request.
+    page_load_strategy (str): 'eager' to stop waiting for a page once its DOM is ready, or 'normal' to also wait for every subresource.
+    profile_dir (str): If not None, each worker keeps its own profile in a subdirectory, so its cache is warm the next time it is opened.
+        A subdirectory is locked by the first process to use it, so processes sharing profile_dir never open the same one.
+    '''
+
+    def __init__(self, block_resources=True, blocked_urls=BLOCKED_URLS, page_load_strategy='eager', profile_dir=None):
+        self.block_resources = block_resources
+        self.blocked_urls = list(blocked_urls)
+        self.page_load_strategy = page_load_strategy
+        self.profile_dir = profile_dir
+        self._profiles = {}  # The path and open lock file of the profile held for each worker
+
+    @classmethod
+    def from_env(cls):
+        '''
+        Creates the factory from the environment: block_resources ('false' to load everything),
+        page_load_strategy and chrome_profile_dir.
+        '''
+        return cls(
+            block_resources=os.environ.get('block_resources', 'true') == 'true',
+            page_load_strategy=os.environ.get('page_load_strategy', 'eager'),
+            profile_dir=os.environ.get('chrome_profile_dir')
+            )
+
+    def options(self, worker=0):
+        '''
+        Builds the Chrome options.
+
+        Args:
+            worker (int): The number of the worker the browser is for. Chrome cannot share a profile between running browsers,
+                so each worker gets its own profile directory, and another process's workers get others.
+
+        Returns:
+            Options: The Chrome options.
+        '''
+        options = Options()
+        options.add_argument("--disable-gpu")
+        options.add_argument("--disable-extensions")
+        options.add_argument("--disable-infobars")
+        options.add_argument('--window-size=1920,1080')
+        options.add_argument("--disable-notifications")
+        options.add_argument('--headless')
+        options.add_argument('--no-sandbox')
+        options.add_argument('--disable-dev-shm-usage')
+        options.add_argument('--mute-audio')
+        options.set_capability('pageLoadStrategy', self.page_load_strategy)
+        if self.block_resources:
+            options.add_argument('--blink-settings=imagesEnabled=false')
+            options.add_experimental_option('prefs', {
+                'profile.managed_default_content_settings.images': 2,
+                'profile.default_content_setting_values.notifications': 2
+                })
+        if self.profile_dir is not None:
+            options.add_argument(f'--user-data-dir={self._profile(worker)}')
+        return options
+
+    def _profile(self, worker):
+        '''
+        Returns the profile directory of a worker, taking the first of worker-{worker}, worker-{worker}-1, ... that
+        no other process holds the lock of. The lock is kept until close() or until the process exits.
+        '''
+        if worker not in self._profiles:
+            for slot in itertools.count():
+                path = os.path.abspath(os.path.join(self.profile_dir, f'worker-{worker}' + (f'-{slot}' if slot else '')))
+                os.makedirs(path, exist_ok=True)
+                lock = open(f'{path}.lock', 'w')
+                try:
+                    fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    lock.close()
+                    continue
+                self._profiles[worker] = (path, lock)
+                break
+        return self._profiles[worker][0]
+
+    def create(self, worker=0):
+        '''
+        Opens a browser and tells it not to request any of the blocked URLs.
+
+        Args:
+            worker (int): The number of the worker the browser is for.
+
+        Returns:
+            webdriver.Chrome: The browser.
+        '''
+        driver = webdriver.Chrome(options=self.options(worker))
+        if self.block_resources:
+            try:
+                driver.execute_cdp_cmd('Network.enable', {})
+                driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': self.blocked_urls})
+            except WebDriverException as e:
+                logging.warning(f'Could not block requests, so the pages will load in full: {e.__class__.__name__}')
+        return driver
+
+    def close(self):
+        '''Releases the profile directories held by this factory, so another process can use them.'''
+        for _, lock in self._profiles.values():
+            lock.close()
+        self._profiles = {}
@@ -0,0 +1,91 @@
+import os
+import sys
+import logging
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import RDS
+from schema import MATCH_SCHEMA, NUMERIC
+from sqlalchemy import select
+
+logging.basicConfig(level = logging.INFO)
+
+
+def _partition(year):
+    '''Returns the season as used in a partition directory name, e.g. '2021-22' for '2021/22'.'''
+    return year.replace('/', '-')
+
+
+def export_parquet(root='parquet-data', clubs=None, seasons=None, engine=None):
+    '''
+    Writes the scraped seasons from match_stats, typed by the match stats schema, to a Parquet dataset partitioned by season and club,
+    e.g. parquet-data/Season=2021-22/Club=Chelsea/. Club-seasons already in the dataset are replaced.
+
+    Args:
+        root (str): The directory of the dataset.
+        clubs (list): Only export these clubs. Exports every club if None.
+        seasons (list): Only export these seasons, e.g. ['2021/22']. Exports every season if None.
+        engine (sqlalchemy.engine.Engine): The database to export from. Defaults to the shared RDS engine.
+
+    Returns:
+        int: The number of rows written.
+    '''
+    engine = engine if engine is not None else RDS.rds_connect()
+    query = select(RDS.match_stats)
+    if clubs is not None:
+        query = query.where(RDS.match_stats.c.Club.in_(clubs))
+    if seasons is not None:
+        query = query.where(RDS.match_stats.c.Season.in_(seasons))
+    df = pd.read_sql(query, engine)
+    df = df.astype({column: MATCH_SCHEMA[column] for column in NUMERIC})
+    df['Date'] = pd.to_datetime(df['Date'])
+    df['Season'] = df['Season'].map(_partition)
+    if df.empty:
+        logging.warning('Nothing to export.')
+        return 0
+    pq.write_to_dataset(
+        pa.Table.from_pandas(df, preserve_index=False),
+        root,
+        partition_cols=['Season', 'Club'],
+        existing_data_behavior='delete_matching'
+        )
+    logging.info(f'{len(df)} rows exported to {root}.')
+    return len(df)
+
+
+def load_arrow(root='parquet-data', clubs=None, seasons=None):
+    '''
+    Loads the Parquet dataset as an Arrow table, memory-mapping the files rather than reading them into memory.
+    Only the partitions of the requested clubs and seasons are opened.
+
+    Args:
+        root (str): The directory of the dataset.
+        clubs (list): Only load these clubs. Loads every club if None.
+        seasons (list): Only load these seasons, e.g. ['2021/22']. Loads every season if None.
+
+    Returns:
+        pa.Table
+    '''
+    filters = []
+    if clubs is not None:
+        filters.append(('Club', 'in', list(clubs)))
+    if seasons is not None:
+        filters.append(('Season', 'in', [_partition(year) for year in seasons]))
+    return pq.read_table(root, memory_map=True, filters=filters or None)
+
+
+def load_parquet(root='parquet-data', clubs=None, seasons=None):
+    '''
+    Loads the Parquet dataset into a data frame, with seasons back in the '2021/22' format.
+
+    Returns:
+        pd.DataFrame
+    '''
+    df = load_arrow(root, clubs, seasons).to_pandas()
+    df['Season'] = df['Season'].astype(str).str.replace('-', '/')
+    return df
+
+
+if __name__ == '__main__':
+    # e.g. python export.py parquet-data
+    export_parquet(sys.argv[1] if len(sys.argv) > 1 else os.environ.get('parquet_dir', 'parquet-data'))
@@ -0,0 +1,99 @@
+from datetime import date, datetime
+from typing import NamedTuple
+from valid_inputs import LEAGUE
+
+
+class Fixture(NamedTuple):
+    '''
+    A single match on the results page.
+
+    Attributes
+    ----------
+    home (str): The name of the home club, as in valid_inputs.CLUBS.
+    away (str): The name of the away club.
+    link (str): The data-href of the fixture, e.g. '//www.premierleague.com/match/66716'.
+    match_no (str): The unique match number.
+    kickoff (date): The day the match was played, or None if the page does not show it.
+    '''
+    home: str
+    away: str
+    link: str
+    match_no: str
+    kickoff: date
+
+
+def _kickoff(millis, day):
+    '''Reads the kickoff from its timestamp in milliseconds, or else from the heading of its day, e.g. 'Sunday 22 May 2022'.'''
+    if millis:
+        return datetime.utcfromtimestamp(int(float(millis)) / 1000).date()
+    if day:
+        try:
+            return datetime.strptime(day.strip(), '%A %d %B %Y').date()
+        except ValueError:
+            return None
+    return None
+
+
+def parse_fixtures(rows):
+    '''
+    Turns the rows returned by the fixture script into fixtures, skipping any without a link.
+
+    Args:
+        rows (list): [home, away, data-href, match number, kickoff in milliseconds, day heading] for each fixture.
+
+    Returns:
+        list: Fixture for each row, in the order shown on the page.
+    '''
+    fixtures = []
+    for home, away, link, match_no, millis, day in rows:
+        if link:
+            fixtures.append(Fixture(home, away, link, match_no or link.rstrip('/').split('/')[-1], _kickoff(millis, day)))
+    return fixtures
+
+
+class FixtureIndex:
+    '''
+    This class is used to look up the fixtures of a season by club, date or match number without going back to the browser.
+
+    Attributes
+    ----------
+    fixtures (list): Every fixture of the season, in the order shown on the page.
+    '''
+
+    def __init__(self, fixtures):
+        self.fixtures = list(fixtures)
+        self._by_club = {}
+        self._by_date = {}
+        self._by_match = {}
+        for fixture in self.fixtures:
+            self._by_club.setdefault(fixture.home, []).append(fixture)
+            self._by_club.setdefault(fixture.away, []).append(fixture)
+            self._by_date.setdefault(fixture.kickoff, []).append(fixture)
+            self._by_match[fixture.match_no] = fixture
+
+    def __len__(self):
+        return len(self.fixtures)
+
+    def for_club(self, club):
+        '''Returns the club's fixtures, or every fixture if club is LEAGUE.'''
+        return self.fixtures if club == LEAGUE else self._by_club.get(club, [])
+
+    def links(self, club):
+        '''Returns the links to the club's fixtures, or to every fixture if club is LEAGUE.'''
+        return [fixture.link for fixture in self.for_club(club)]
+
+    def on(self, day):
+        '''Returns the fixtures played on a day.'''
+        return self._by_date.get(day, [])
+
+    def between(self, first_day, last_day):
+        '''Returns the fixtures played from first_day to last_day inclusive.'''
+        return [fixture for day, fixtures in self._by_date.items() if day is not None and first_day <= day <= last_day for fixture in fixtures]
+
+    def get(self, match_no):
+        '''Returns the fixture with the match number, or None.'''
+        return self._by_match.get(str(match_no))
+
+    def clubs(self):
+        '''Returns the names of every club with a fixture.'''
+        return sorted(self._by_club)
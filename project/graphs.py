@@ -1,11 +1,49 @@
-from valid_inputs import valid_clubs
-from RDS import rds_connect
+import json
+import hashlib
+from valid_inputs import CLUBS
+from aggregates import season_data
 import matplotlib.pyplot as plt
 import numpy as np
+import pandas as pd
 from dateutil.relativedelta import relativedelta
 from matplotlib.gridspec import GridSpec
 
 
+class FigureTemplate:
+    '''
+    This class is used to build the figure and its 10 GridSpec subplots once, so that many charts can be drawn
+    on the same figure one after another instead of laying a new one out for each.
+
+    Attributes
+    ----------
+    fig (Figure): The figure.
+    axes (list): The 10 subplots, in the order ax1 to ax10.
+    '''
+    def __init__(self):
+        self.fig = plt.figure(constrained_layout=True, figsize=(15,8))
+        self.gs = GridSpec(4, 6, figure=self.fig)
+        self.axes = [
+            self.fig.add_subplot(self.gs[0, :3]),
+            self.fig.add_subplot(self.gs[0, 3:]),
+            self.fig.add_subplot(self.gs[1, 0]),
+            self.fig.add_subplot(self.gs[1, 1]),
+            self.fig.add_subplot(self.gs[1, 2]),
+            self.fig.add_subplot(self.gs[1, 3]),
+            self.fig.add_subplot(self.gs[1, 4]),
+            self.fig.add_subplot(self.gs[1, 5]),
+            self.fig.add_subplot(self.gs[2, :]),
+            self.fig.add_subplot(self.gs[3, :])
+        ]
+
+    def reset(self):
+        '''Clears every subplot and removes the twin axes added by the previous chart.'''
+        for ax in list(self.fig.axes):
+            if ax in self.axes:
+                ax.clear()
+            else:
+                ax.remove()
+
+
 class CreateGraph:
     '''
     This class is used to create a figure of 10 subplots used to graphically show a teams statistics over the course of the season.
@@ -18,64 +56,55 @@ class CreateGraph:
     def __init__(self, club, year):
         self.club = club
         self.year = year
-        self.connection = rds_connect().connect()
-        self.query = f'SELECT * FROM public."{self.club}-{self.year[-5:-3]}{self.year[-2:]}" ORDER BY "Date"'
-        self.query_result = self.connection.execute(self.query)
-        self.values = self.query_result.fetchall()
-        self.home_stadium = max(set(self._get_stats_list()[1]), key = self._get_stats_list()[1].count)  # Finds home stadium from the most common element in list
+        self.table = f'{self.club}-{self.year[-5:-3]}{self.year[-2:]}'
+        # The aggregates for the pies and bars, computed in the database, and only the columns plotted over time, in one query
+        self.summary, self.df = season_data(self.table)
+        self.df['Date'] = pd.to_datetime(self.df['Date'])
+        self.home_stadium = self.summary.home_stadium
+
+    def _home_away_means(self, stat):
+        '''
+        Returns the average of a statistic per game at home and away.
 
-    def _get_stats_list(self):
+        Args:
+            stat (str): One of aggregates.AVERAGED_STATS.
+        Returns:
+            list: [home_average, away_average]
+        '''
+        return [self.summary.home[stat], self.summary.away[stat]]
+        
+    def data_hash(self):
         '''
-        Return [dates, locations, homes_or_away, results, goals_scored, goals_against,
-            possession, shots_on_target, shots, touches, passes, tackles, clearances,
-            corners, offsides, fouls_conceeded, yellow_cards, red_cards]
+        Hashes the data the figure is drawn from, so an unchanged season does not need to be drawn again.
+
+        Returns:
+            str: The SHA-256 hex digest.
         '''
-        stats_list = []
-        for i in range(2, 20):
-            stats_list.append([j[i] for j in self.values])
-        return stats_list
+        content = json.dumps(self.summary._asdict(), sort_keys=True) + self.df.to_csv(index=False)
+        return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+    def figure_path(self):
+        '''Returns the path the figure is saved to.'''
+        return f'graphical-data/{CLUBS[self.club]}-{self.year[-2:]}.png'
 
-    def _home_vs_away(self, location):
+    def _figure_setup(self, template=None):
         '''
-        Splits the match list into home and away games.
+        Splits the figure into 10 subplots using GridSpec, and adds a title.
 
         Args:
-            location (str): 'Home' or 'Away'
-        Returns:
-            list: A list of either the home games or away games, of length 19.
+            template (FigureTemplate): A figure already laid out, cleared and drawn on again if given.
         '''
-        query = f'SELECT * FROM public."{self.club}-{self.year[-5:-3]}{self.year[-2:]}" WHERE "Location" = \'{self.home_stadium}\' ORDER BY "Date"'
-        query_result = self.connection.execute(query)
-        home_games = query_result.fetchall()
-        query = f'SELECT * FROM public."{self.club}-{self.year[-5:-3]}{self.year[-2:]}" WHERE "Location" != \'{self.home_stadium}\' ORDER BY "Date"'
-        query_result = self.connection.execute(query)
-        away_games = query_result.fetchall()
-        if location == 'home':
-            return home_games
+        if template is None:
+            template = FigureTemplate()
         else:
-            return away_games
-        
-    def _figure_setup(self):
-        '''Splits the figure into 10 subplots using GridSpec, and adds a title.'''
-        self.fig = plt.figure(constrained_layout=True, figsize=(15,8))
-        self.gs = GridSpec(4, 6, figure=self.fig)
-        self.ax1 = self.fig.add_subplot(self.gs[0, :3])
-        self.ax2 = self.fig.add_subplot(self.gs[0, 3:])
-        self.ax3 = self.fig.add_subplot(self.gs[1, 0])
-        self.ax4 = self.fig.add_subplot(self.gs[1, 1])
-        self.ax5 = self.fig.add_subplot(self.gs[1, 2])
-        self.ax6 = self.fig.add_subplot(self.gs[1, 3])
-        self.ax7 = self.fig.add_subplot(self.gs[1, 4])
-        self.ax8 = self.fig.add_subplot(self.gs[1, 5])
-        self.ax9 = self.fig.add_subplot(self.gs[2, :])
-        self.ax10 = self.fig.add_subplot(self.gs[3, :])
+            template.reset()
+        self.fig = template.fig
+        self.ax1, self.ax2, self.ax3, self.ax4, self.ax5, self.ax6, self.ax7, self.ax8, self.ax9, self.ax10 = template.axes
         self.fig.suptitle(f'{self.club} {self.year} season statistics', fontsize=24, fontweight='bold')
 
     def _results_pie(self):
         '''Creates a pie chart showing the percentage of each win, loss and draw.'''
-        wins = self._get_stats_list()[3].count('Win')
-        draws = self._get_stats_list()[3].count('Draw')
-        sizes = [wins, draws, len(self._get_stats_list()[3]) - wins - draws]
+        sizes = self.summary.results
         mylabels = ['Wins', 'Draws', 'Losses']
         mycolors = ['g', 'y', 'r']
         myexplode = [0.2, 0, 0]
@@ -84,12 +113,7 @@ class CreateGraph:
     
     def _wins_possession_pie(self):
         '''Creates a pie chart showing the percentage of each win, loss and draw, when possession > 50%.'''
-        query = f'SELECT * FROM public."{self.club}-{self.year[-5:-3]}{self.year[-2:]}" WHERE "Possession %%" > 50 ORDER BY "Date"'
-        query_result = self.connection.execute(query)
-        possession = query_result.fetchall()
-        possession_wins = [i[5] for i in possession].count('Win')
-        possession_draws = [i[5] for i in possession].count('Draw')
-        sizes = [possession_wins, possession_draws, len(possession) - possession_wins - possession_draws]
+        sizes = self.summary.possession_results
         mylabels = ['Wins', 'Draws', 'Losses']
         mycolors = ['g', 'y', 'r']
         myexplode = [0.2, 0, 0]
@@ -98,9 +122,7 @@ class CreateGraph:
 
     def _results_bar(self):
         '''Creates a bar chart showing the number of home vs. away wins.'''
-        home_results = [i[5] for i in self._home_vs_away('home')].count('Win')
-        away_results = [i[5] for i in self._home_vs_away('away')].count('Win')
-        results = [home_results, away_results]
+        results = [self.summary.home['wins'], self.summary.away['wins']]
         xlabels = ['(H)', '(A)']
         xpos = [-0.2, 0.2]
         mywidth = 0.4
@@ -112,10 +134,8 @@ class CreateGraph:
 
     def _goals_bar(self):
         '''Creates a bar chart showing the average number of home vs. away goals scored and goals conceeded per game.'''
-        home_gs = sum([i[6] for i in self._home_vs_away('home')]) / len(self._home_vs_away('home'))
-        away_gs = sum([i[6] for i in self._home_vs_away('away')]) / len(self._home_vs_away('away'))
-        home_ga = sum([i[7] for i in self._home_vs_away('home')]) / len(self._home_vs_away('home'))
-        away_ga = sum([i[7] for i in self._home_vs_away('away')]) / len(self._home_vs_away('away'))
+        home_gs, away_gs = self._home_away_means('Goals scored')
+        home_ga, away_ga = self._home_away_means('Goals against')
         home = [home_gs, home_ga]
         away = [away_gs, away_ga]
         xlabels = ['GS', 'GA']
@@ -129,10 +149,8 @@ class CreateGraph:
 
     def _shots_bar(self):
         '''Creates a bar chart showing the average number of home vs. away shots and shots on target per game.'''
-        home_shots = sum([i[10] for i in self._home_vs_away('home')]) / len(self._home_vs_away('home'))
-        away_shots = sum([i[10] for i in self._home_vs_away('away')]) / len(self._home_vs_away('away'))
-        home_shots_ot = sum([i[9] for i in self._home_vs_away('home')]) / len(self._home_vs_away('home'))
-        away_shots_ot = sum([i[9] for i in self._home_vs_away('away')]) / len(self._home_vs_away('away'))
+        home_shots, away_shots = self._home_away_means('Shots')
+        home_shots_ot, away_shots_ot = self._home_away_means('Shots on target')
         home = [home_shots, home_shots_ot]
         away = [away_shots, away_shots_ot]
         xlabels = ['Shots', 'On target']
@@ -146,9 +164,7 @@ class CreateGraph:
 
     def _passes_bar(self):
         '''Creates a bar chart showing the average number of home vs. away passes per game.'''
-        home_passes = sum([i[11] for i in self._home_vs_away('home')]) / len(self._home_vs_away('home'))
-        away_passes = sum([i[11] for i in self._home_vs_away('away')]) / len(self._home_vs_away('away'))
-        passes = [home_passes, away_passes]
+        passes = self._home_away_means('Passes')
         xlabels = ['(H)', '(A)']
         xpos = [-0.2, 0.2]
         mywidth = 0.4
@@ -160,9 +176,7 @@ class CreateGraph:
 
     def _fouls_bar(self):
         '''Creates a bar chart showing the average number of home vs. away fouls per game.'''
-        home_fouls = sum([i[17] for i in self._home_vs_away('home')]) / len(self._home_vs_away('home'))
-        away_fouls = sum([i[17] for i in self._home_vs_away('away')]) / len(self._home_vs_away('away'))
-        fouls = [home_fouls, away_fouls]
+        fouls = self._home_away_means('Fouls conceded')
         xlabels = ['(H)', '(A)']
         xpos = [-0.2, 0.2]
         mywidth = 0.4
@@ -174,9 +188,7 @@ class CreateGraph:
 
     def _offsides_bar(self):
         '''Creates a bar chart showing the average number of home vs. away offsides per game.'''
-        home_offsides = sum([i[14] for i in self._home_vs_away('home')]) / len(self._home_vs_away('home'))
-        away_offsides = sum([i[14] for i in self._home_vs_away('away')]) / len(self._home_vs_away('away'))
-        offsides = [home_offsides, away_offsides]
+        offsides = self._home_away_means('Offsides')
         xlabels = ['(H)', '(A)']
         xpos = [-0.2, 0.2]
         mywidth = 0.4
@@ -188,32 +200,39 @@ class CreateGraph:
 
     def _shots_line(self):
         '''Creates a line graph showing the shots and shots on target in comparison with a bar chart of goals scored, combines using the twinx() method.'''
-        self.ax9.bar(self._get_stats_list()[0], self._get_stats_list()[4], width=3, color='green')
+        dates = self.df['Date']
+        self.ax9.bar(dates, self.df['Goals scored'], width=3, color='green')
         ax11 = self.ax9.twinx()  # Shares x axis
-        ax11.plot(self._get_stats_list()[0], self._get_stats_list()[8])
-        ax11.plot(self._get_stats_list()[0], self._get_stats_list()[7])
+        ax11.plot(dates, self.df['Shots'])
+        ax11.plot(dates, self.df['Shots on target'])
         self.ax9.set_title('Shots, shots on target and goals scored')
-        self.ax9.set_xlim([self._get_stats_list()[0][0], self._get_stats_list()[0][-1] + relativedelta(days=+50)])  # Leaves space for legend
+        self.ax9.set_xlim([dates.iloc[0], dates.iloc[-1] + relativedelta(days=+50)])  # Leaves space for legend
         self.ax9.legend(['Goals scored'])
         ax11.legend(['Shots', 'Shots on target'], loc='lower right')
 
     def _fouls_cards_twin(self):
         '''Creates a line graph showing the fouls conceeded in comparison with a bar chart of yellow and red cards, combines using the twinx() method.'''
-        self.ax10.bar(self._get_stats_list()[0], self._get_stats_list()[-2], width=3, color='gold')
-        self.ax10.bar(self._get_stats_list()[0], self._get_stats_list()[-1], width=3, color='red')
+        dates = self.df['Date']
+        self.ax10.bar(dates, self.df['Yellow cards'], width=3, color='gold')
+        self.ax10.bar(dates, self.df['Red cards'], width=3, color='red')
         ax12 = self.ax10.twinx()  # Shares x axis
-        ax12.plot(self._get_stats_list()[0], self._get_stats_list()[-3])
+        ax12.plot(dates, self.df['Fouls conceded'])
         ax12.set_title('Fouls and carded offences')
         self.ax10.set_ylabel('No. cards')
         ax12.set_ylabel('No. fouls')
-        ax12.set_xlim([self._get_stats_list()[0][0], self._get_stats_list()[0][-1] + relativedelta(days=+50)])  # Leaves space for legend
+        ax12.set_xlim([dates.iloc[0], dates.iloc[-1] + relativedelta(days=+50)])  # Leaves space for legend
         self.ax10.legend(['Yellow cards', 'Red cards'])
         ax12.legend(['Fouls conceeded'], loc='lower right')
 
 
-    def show_graphs(self):
-        '''Displays all the graphs on the same figure.'''
-        self._figure_setup()
+    def draw(self, template=None):
+        '''
+        Draws all the graphs on the same figure.
+
+        Args:
+            template (FigureTemplate): A figure to reuse rather than laying out a new one.
+        '''
+        self._figure_setup(template)
         self._results_pie()
         self._wins_possession_pie()
         self._results_bar()
@@ -224,5 +243,13 @@ class CreateGraph:
         self._offsides_bar()
         self._shots_line()
         self._fouls_cards_twin()
+
+    def save_figure(self):
+        '''Saves the figure to graphical-data.'''
+        self.fig.savefig(self.figure_path())
+
+    def show_graphs(self):
+        '''Displays all the graphs on the same figure.'''
+        self.draw()
         plt.show()
-        self.fig.savefig(f'graphical-data/{valid_clubs()[self.club]}-{self.year[-2:]}.png')
+        self.save_figure()
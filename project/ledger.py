@@ -0,0 +1,98 @@
+import json
+import sqlite3
+import hashlib
+import logging
+import threading
+from datetime import datetime
+
+logging.basicConfig(level = logging.INFO)
+
+
+class ScrapeLedger:
+    '''
+    This class is used to keep a persistent record of which matches have already been scraped, in a local SQLite file,
+    so that an interrupted run can resume and a season in progress can be topped up with only its new fixtures.
+
+    Attributes
+    ----------
+    path (str): The path to the SQLite file.
+    '''
+
+    def __init__(self, path='scrape_ledger.db'):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute('''
+                CREATE TABLE IF NOT EXISTS scraped (
+                    season TEXT NOT NULL,
+                    match_no TEXT NOT NULL,
+                    club TEXT NOT NULL,
+                    content_hash TEXT NOT NULL,
+                    scraped_at TEXT NOT NULL,
+                    PRIMARY KEY (season, match_no, club)
+                )''')
+
+    @staticmethod
+    def content_hash(record):
+        '''
+        Hashes a match record, leaving out the V4 uuid as it is different every time a match is scraped.
+
+        Args:
+            record (dict): The match record created by the scraper.
+
+        Returns:
+            str: The SHA-256 hex digest.
+        '''
+        content = {key: value for key, value in record.items() if key != 'V4 uuid'}
+        return hashlib.sha256(json.dumps(content, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def record(self, year, match_no, club_short, record):
+        '''
+        Marks a club's record of a match as scraped.
+
+        Args:
+            year (str): The season, e.g. '2021/22'.
+            match_no (str): The unique match number.
+            club_short (str): The shortened name of the club.
+            record (dict): The match record created by the scraper.
+
+        Returns:
+            bool: True if the match is new or its content has changed since it was last scraped.
+        '''
+        content_hash = self.content_hash(record)
+        with self._lock, self._connection:
+            previous = self._connection.execute(
+                'SELECT content_hash FROM scraped WHERE season = ? AND match_no = ? AND club = ?',
+                (year, match_no, club_short)).fetchone()
+            self._connection.execute(
+                'INSERT OR REPLACE INTO scraped VALUES (?, ?, ?, ?, ?)',
+                (year, match_no, club_short, content_hash, datetime.utcnow().isoformat()))
+        return previous is None or previous[0] != content_hash
+
+    def scraped(self, year):
+        '''
+        Returns the clubs each match of the season has been scraped for.
+
+        Args:
+            year (str): The season, e.g. '2021/22'.
+
+        Returns:
+            dict: Match number as the key and a set of shortened club names as the value.
+        '''
+        with self._lock:
+            rows = self._connection.execute('SELECT match_no, club FROM scraped WHERE season = ?', (year,)).fetchall()
+        scraped = {}
+        for match_no, club in rows:
+            scraped.setdefault(match_no, set()).add(club)
+        return scraped
+
+    def has_season(self, year, club_short):
+        '''Returns True if any of the club's matches from the season are in the ledger.'''
+        with self._lock:
+            return self._connection.execute(
+                'SELECT 1 FROM scraped WHERE season = ? AND club = ? LIMIT 1', (year, club_short)).fetchone() is not None
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
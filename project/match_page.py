@@ -0,0 +1,130 @@
+import re
+from html.parser import HTMLParser
+
+# Tags that never have an end tag, so are not kept on the stack of open elements
+VOID_TAGS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'source', 'track', 'wbr'}
+
+# Tags whose text is separated from the text around them, as in the rendered page
+BLOCK_TAGS = {'br', 'div', 'li', 'p', 'td', 'th', 'tr'}
+
+
+class IncompletePage(Exception):
+    '''Raised when a stats page is missing part of the match information, as when it is read before it has fully rendered.'''
+
+
+class MatchPageParser(HTMLParser):
+    '''
+    This class is used to read the match information from the HTML of a stats page, so the raw page can be kept
+    in the page cache and read again whenever the extraction changes.
+
+    Attributes
+    ----------
+    page (dict): The date, stadium, home, away, score, the long names of both clubs and the text of each stats row.
+    '''
+
+    def __init__(self):
+        super().__init__()
+        self.page = {'date': None, 'stadium': None, 'home': None, 'away': None, 'score': None, 'home_name': None, 'away_name': None, 'stats': []}
+        self._stack = []  # [tag, class, field, text] of each open element
+        self._hidden = 0  # The depth of script and style elements, whose text is not shown
+
+    def _field(self, tag, classes):
+        '''Returns the field of self.page an element holds, or None.'''
+        open_classes = [entry[1] for entry in self._stack]
+        if tag == 'div' and classes.startswith('matchDate renderMatchDateContainer'):
+            return 'date'
+        if tag == 'div' and classes in ('stadium', 'score fullTime'):
+            return 'stadium' if classes == 'stadium' else 'score'
+        if tag == 'span' and classes in ('short', 'long') and 'scoreboxContainer' in open_classes:
+            suffix = '' if classes == 'short' else '_name'
+            if 'team home' in open_classes:
+                return f'home{suffix}'
+            if 'team away' in open_classes:
+                return f'away{suffix}'
+        if tag == 'tr' and 'matchCentreStatsContainer' in open_classes:
+            return 'stats'
+        return None
+
+    def _text(self, data):
+        for entry in self._stack:
+            if entry[2] is not None:
+                entry[3].append(data)
+
+    def handle_starttag(self, tag, attrs):
+        if tag in BLOCK_TAGS:
+            self._text(' ')
+        if tag in ('script', 'style'):
+            self._hidden += 1
+        if tag not in VOID_TAGS:
+            classes = dict(attrs).get('class') or ''
+            self._stack.append([tag, classes, self._field(tag, classes), []])
+
+    def handle_endtag(self, tag):
+        if tag in ('script', 'style'):
+            self._hidden = max(0, self._hidden - 1)
+        for i in range(len(self._stack) - 1, -1, -1):
+            if self._stack[i][0] == tag:
+                for _, _, field, text in reversed(self._stack[i:]):
+                    self._close(field, text)
+                del self._stack[i:]
+                break
+        if tag in BLOCK_TAGS:
+            self._text(' ')
+
+    def handle_data(self, data):
+        if not self._hidden:
+            self._text(data)
+
+    def close(self):
+        '''Finishes the page, keeping the text of any elements it left open.'''
+        super().close()
+        for _, _, field, text in reversed(self._stack):
+            self._close(field, text)
+        self._stack = []
+
+    def _close(self, field, text):
+        '''Keeps the text of a finished element, with its whitespace collapsed. Only the first element of each single field is kept.'''
+        if field is None:
+            return
+        text = ' '.join(''.join(text).split())
+        if field == 'stats':
+            self.page['stats'].append(text)
+        elif self.page[field] is None:
+            self.page[field] = text
+
+
+def parse_match_page(html):
+    '''
+    Reads the match information from the HTML of a stats page.
+
+    Args:
+        html (str): The page source, once the stats tab has been opened.
+
+    Returns:
+        dict: The date, stadium, home, away, score, home_name, away_name and the text of each stats row,
+            or None for anything not on the page.
+    '''
+    parser = MatchPageParser()
+    parser.feed(html)
+    parser.close()
+    return parser.page
+
+
+def check_complete(page):
+    '''
+    Checks parse_match_page read every part of the match information the scraper needs.
+
+    Args:
+        page (dict): The information returned by parse_match_page.
+
+    Raises:
+        IncompletePage: If a field is missing, the score is not a full-time score, or a stats row is not 'home name away'.
+    '''
+    missing = [field for field in ('date', 'stadium', 'home', 'away', 'score') if not page[field]]
+    if missing:
+        raise IncompletePage(f'The stats page has no {missing}.')
+    if not re.fullmatch(r'\d+-\d+', page['score']):
+        raise IncompletePage(f'The score {page["score"]!r} is not a full-time score.')
+    # An empty stats table is kept, as matches before 2006/07 have none
+    if not all(re.fullmatch(r'[\d.]+ .+ [\d.]+', row) for row in page['stats']):
+        raise IncompletePage(f'The stats table is part-rendered: {page["stats"]}')
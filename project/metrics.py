@@ -0,0 +1,34 @@
+import os
+import logging
+from prometheus_client import Counter, Gauge, Histogram, start_http_server
+
+logging.basicConfig(level = logging.INFO)
+
+# Buckets in seconds, from a quick element lookup to a fixture list that takes a minute to load
+BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+PAGE_LOAD = Histogram('scraper_page_load_seconds', 'Time taken by driver.get to load a page.', ['page'], buckets=BUCKETS)
+WAIT_TIME = Histogram('scraper_webdriver_wait_seconds', 'Time spent in WebDriverWait, whether or not the wait succeeded.', ['step'], buckets=BUCKETS)
+EXTRACTION = Histogram('scraper_match_extraction_seconds', 'Time taken to get the raw match information of one match.', ['source'], buckets=BUCKETS)
+S3_PUT = Histogram('scraper_s3_put_seconds', 'Time taken by one S3 put_object call.', buckets=BUCKETS)
+SQL_UPLOAD = Histogram('scraper_sql_upload_seconds', 'Time taken to upsert a batch of rows into match_stats.', buckets=BUCKETS)
+DB_CHECKOUT_WAIT = Histogram('scraper_db_checkout_wait_seconds', 'Time waited for a connection from the database pool, including opening a new one.',
+    buckets=(0.001, 0.005, 0.01, 0.025) + BUCKETS)
+
+RETRIES = Counter('scraper_retries_total', 'Attempts made again after a failure.', ['operation'])
+REFRESHES = Counter('scraper_fixture_list_refreshes_total', 'Results page refreshes because the fixture list was incomplete.')
+TIMEOUTS = Counter('scraper_timeouts_total', 'WebDriverWait calls that timed out.', ['step'])
+DB_CONNECTIONS = Counter('scraper_db_connections_opened_total', 'Connections opened by the database pool.')
+
+DB_CHECKED_OUT = Gauge('scraper_db_connections_checked_out', 'Connections checked out of the database pool right now.')
+
+
+def start_metrics_server():
+    '''
+    Serves /metrics on the port in the metrics_port environment variable, 8000 by default.
+    Set metrics_port to 0 to turn the endpoint off.
+    '''
+    port = int(os.environ.get('metrics_port', 8000))
+    if port:
+        start_http_server(port)
+        logging.info(f'Serving metrics on port {port}.')
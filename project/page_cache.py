@@ -0,0 +1,184 @@
+import os
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from urllib.parse import urlencode
+import pandas as pd
+from schema import season_bounds
+
+logging.basicConfig(level = logging.INFO)
+
+
+class CacheMiss(Exception):
+    '''Raised in offline mode when a page is not in the cache, as nothing may be fetched live.'''
+
+
+def cache_url(url, params):
+    '''Returns the URL with its query parameters in a fixed order, so the same request always has the same key.'''
+    return f'{url}?{urlencode(sorted(params.items()))}' if params else url
+
+
+def is_final(path, season, payload):
+    '''
+    Decides whether a payload can never change: the stats of a finished match, or a fixture or team list of a season that is over.
+
+    Args:
+        path (str): The API endpoint the payload came from, e.g. 'stats/match/66716'.
+        season (str): The season the payload belongs to, e.g. '2021/22', or None.
+        payload (dict): The decoded payload.
+
+    Returns:
+        bool
+    '''
+    if path.startswith('stats/match/'):
+        return payload.get('entity', {}).get('status') == 'C'
+    if season is not None and path in ('fixtures', 'teams'):
+        return season_bounds(season)[1] < pd.Timestamp.now()
+    return False
+
+
+class PageCache:
+    '''
+    This class is used to keep the raw pages fetched by the scraper on disk, so reruns, retries and tests do not fetch them again.
+    Each page is stored once under the SHA-256 of its content, with a SQLite index from the season and URL to the content.
+    Pages that can never change are pinned: they are never expired or evicted. Other pages expire after ttl seconds,
+    and the least recently used are evicted once the cache is bigger than max_bytes.
+
+    Attributes
+    ----------
+    root (str): The directory of the cache.
+    max_bytes (int): The size the unpinned pages are evicted down to.
+    ttl (float): Seconds an unpinned page is served for after it was fetched.
+    offline (bool): If True, every page in the cache is served however old it is, and nothing should be fetched.
+    '''
+
+    def __init__(self, root='page-cache', max_bytes=512 * 2 ** 20, ttl=3600, offline=False):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.offline = offline
+        os.makedirs(os.path.join(root, 'objects'), exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(os.path.join(root, 'index.db'), check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute('''
+                CREATE TABLE IF NOT EXISTS pages (
+                    key TEXT PRIMARY KEY,
+                    season TEXT,
+                    digest TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    pinned INTEGER NOT NULL,
+                    stored_at REAL NOT NULL,
+                    used_at REAL NOT NULL
+                )''')
+            self._connection.execute('CREATE INDEX IF NOT EXISTS pages_digest ON pages (digest)')
+
+    @classmethod
+    def from_env(cls):
+        '''
+        Creates the cache in the page_cache_dir environment variable, or returns None if it is not set.
+        page_cache_mb sets the size bound and page_cache_offline=true turns on offline replay.
+        '''
+        if 'page_cache_dir' not in os.environ:
+            return None
+        return cls(
+            os.environ['page_cache_dir'],
+            max_bytes=int(float(os.environ.get('page_cache_mb', 512)) * 2 ** 20),
+            offline=os.environ.get('page_cache_offline') == 'true'
+            )
+
+    @staticmethod
+    def _key(url, season):
+        return f"{season or ''} {url}"
+
+    def _path(self, digest):
+        return os.path.join(self.root, 'objects', digest[:2], digest)
+
+    def get(self, url, season=None):
+        '''
+        Returns the cached content of a page, or None if it is not cached or has expired.
+
+        Args:
+            url (str): The full URL of the page, including any query string.
+            season (str): The season the page belongs to, e.g. '2021/22'.
+
+        Returns:
+            bytes
+        '''
+        key = self._key(url, season)
+        with self._lock:
+            row = self._connection.execute('SELECT digest, pinned, stored_at FROM pages WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+            digest, pinned, stored_at = row
+            if not (pinned or self.offline) and time.time() - stored_at > self.ttl:
+                return None
+            try:
+                with open(self._path(digest), 'rb') as f:
+                    content = f.read()
+            except FileNotFoundError:
+                with self._connection:
+                    self._connection.execute('DELETE FROM pages WHERE key = ?', (key,))
+                return None
+            with self._connection:
+                self._connection.execute('UPDATE pages SET used_at = ? WHERE key = ?', (time.time(), key))
+        return content
+
+    def put(self, url, season, content, pinned=False):
+        '''
+        Caches the content of a page, then evicts the least recently used unpinned pages while the cache is too big.
+
+        Args:
+            url (str): The full URL of the page, including any query string.
+            season (str): The season the page belongs to, e.g. '2021/22', or None.
+            content (bytes): The raw content of the page.
+            pinned (bool): True if the page can never change, so is never expired or evicted.
+        '''
+        digest = hashlib.sha256(content).hexdigest()
+        path = self._path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temporary = f'{path}.{threading.get_ident()}.tmp'
+            with open(temporary, 'wb') as f:
+                f.write(content)
+            os.replace(temporary, path)  # Readers never see a half-written page
+        now = time.time()
+        with self._lock, self._connection:
+            self._connection.execute(
+                'INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (self._key(url, season), season, digest, len(content), int(pinned), now, now))
+            self._evict()
+
+    def _size(self):
+        '''Returns the bytes taken by the unpinned content, counting content shared by several pages once.'''
+        return self._connection.execute('''
+            SELECT COALESCE(SUM(size), 0) FROM (
+                SELECT MAX(size) AS size FROM pages GROUP BY digest HAVING MAX(pinned) = 0
+            )''').fetchone()[0]
+
+    def _evict(self):
+        '''Drops the least recently used unpinned pages until the unpinned content fits in max_bytes.'''
+        size = self._size()
+        while size > self.max_bytes:
+            row = self._connection.execute('SELECT key, digest, size FROM pages WHERE pinned = 0 ORDER BY used_at LIMIT 1').fetchone()
+            if row is None:
+                return
+            key, digest, page_size = row
+            self._connection.execute('DELETE FROM pages WHERE key = ?', (key,))
+            if self._connection.execute('SELECT 1 FROM pages WHERE digest = ? LIMIT 1', (digest,)).fetchone() is None:
+                try:
+                    os.remove(self._path(digest))
+                except FileNotFoundError:
+                    pass
+                size -= page_size
+
+    def size(self):
+        '''Returns the bytes taken by the unpinned content.'''
+        with self._lock:
+            return self._size()
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,139 @@
+import queue
+import logging
+import threading
+from sqlalchemy.exc import SQLAlchemyError
+import RDS
+from storage import s3_key
+from schema import clean_frame
+
+logging.basicConfig(level = logging.INFO)
+
+_STOP = object()  # Put on the queue to tell the writer thread to finish
+
+
+class PipelineError(Exception):
+    '''Raised when the pipeline is closed if any records could not be written to the database.'''
+
+    def __init__(self, failed):
+        self.failed = failed
+        super().__init__(f'{len(failed)} records could not be written to the database: {failed}')
+
+
+class StreamingPipeline:
+    '''
+    This class is used to stream match records from the scraper straight into the database.
+    Records go through a bounded queue to a writer thread, which upserts them into match_stats in batches,
+    so rows appear as they are scraped rather than after the whole season is rewritten.
+
+    Attributes
+    ----------
+    year (str): The season being scraped.
+    engine (sqlalchemy.engine.Engine): The database the records are written to.
+    batch_size (int): The number of records written to the database at a time.
+    flush_interval (float): The most seconds a record waits in a part-filled batch.
+    archive (S3Writer): Also saves each record to S3 if not None.
+    failed (list): (club, Match id) of each record that could not be written.
+    '''
+
+    def __init__(self, year, engine=None, batch_size=10, flush_interval=5, maxsize=100, archive=None):
+        self.year = year
+        self.engine = engine if engine is not None else RDS.rds_connect()
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.archive = archive
+        self.failed = []
+        self._error = None
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._views = set()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def put(self, club, record, on_written=None):
+        '''
+        Queues a record to be written, blocking while the queue is full so the scraper cannot run ahead of the database.
+
+        Args:
+            club (str): The club the record belongs to.
+            record (dict): The match record created by the scraper.
+            on_written (callable): Called with no arguments by the writer thread once the record's upsert has committed,
+                and never if it could not be written.
+        '''
+        if self.archive is not None:
+            self.archive.put(s3_key(self.year, record['Match id'].split('-')[-1], record['Match id']), record)
+        self._queue.put((club, record, on_written))
+
+    def _write(self, batch):
+        '''
+        Upserts a batch of records into match_stats, grouped by club, and creates each club's view the first time.
+        A club whose rows cannot be written, because of the database or a malformed record, has them kept in self.failed,
+        as are any records clean_frame drops for being outside the season or having no date.
+        '''
+        clubs = {}
+        for club, record, on_written in batch:
+            clubs.setdefault(club, []).append((record, on_written))
+        for club, items in clubs.items():
+            records = [record for record, _ in items]
+            try:
+                if club not in self._views:
+                    RDS.create_season_view(club, self.year, self.engine)
+                    self._views.add(club)
+                df = clean_frame(records, self.year)
+                RDS.upsert_matches(df, club, self.year, self.engine)
+                logging.info(f'{len(df)} rows upserted into {RDS.table_name(club, self.year)}.')
+            except (SQLAlchemyError, ValueError, KeyError, TypeError) as e:
+                match_ids = [record.get('Match id') for record in records]
+                logging.error(f'Could not write {club} matches {match_ids} to {RDS.table_name(club, self.year)}: {e!r}')
+                self.failed += [(club, match_id) for match_id in match_ids]
+                continue
+            written = set(df['Match id'])
+            for record, on_written in items:
+                if record.get('Match id') not in written:
+                    self.failed.append((club, record.get('Match id')))
+                elif on_written is not None:
+                    on_written()
+
+    def _run(self):
+        '''Takes records off the queue and writes them whenever a batch is full or has waited flush_interval seconds.'''
+        batch = []
+        while True:
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                item = None
+            if item is _STOP:
+                break
+            if item is not None:
+                batch.append(item)
+            if batch and (item is None or len(batch) >= self.batch_size):
+                self._write_or_keep(batch)
+                batch = []
+        if batch:
+            self._write_or_keep(batch)
+
+    def _write_or_keep(self, batch):
+        '''
+        Writes a batch. After an unexpected error, the error is kept for close() to raise, and every later batch is
+        kept as failed without being written, so the scraper never blocks on a queue that is no longer read.
+        '''
+        if self._error is None:
+            try:
+                self._write(batch)
+                return
+            except Exception as e:
+                logging.exception(f'The database writer stopped on {e!r}.')
+                self._error = e
+        self.failed += [(club, record.get('Match id')) for club, record, _ in batch]
+
+    def close(self):
+        '''
+        Writes everything still queued and waits for the writer thread to finish.
+
+        Raises:
+            PipelineError: If any records could not be written, listing their clubs and Match ids.
+        '''
+        self._queue.put(_STOP)
+        self._thread.join()
+        if self.archive is not None:
+            self.archive.flush()
+        if self.failed:
+            raise PipelineError(self.failed) from self._error
@@ -0,0 +1,75 @@
+import os
+import sys
+import logging
+import matplotlib
+matplotlib.use('Agg')  # Renders to files only, so no display is needed
+import RDS
+from multiprocessing import Pool
+from graphs import CreateGraph, FigureTemplate
+
+logging.basicConfig(level = logging.INFO)
+
+_template = None  # Each worker process lays out one figure and reuses it for every chart it draws
+
+
+def _init_worker():
+    '''Stops a forked worker from reusing the parent's database connections.'''
+    RDS.dispose_engine(close=False)
+
+
+def _render(job):
+    '''
+    Draws and saves the figure of one club's season, unless the data it was last drawn from has not changed.
+    The hash of that data is kept next to the figure in a .sha256 file.
+
+    Args:
+        job (tuple): (club, year)
+
+    Returns:
+        str: 'rendered', 'unchanged' or 'failed'.
+    '''
+    global _template
+    club, year = job
+    try:
+        graph = CreateGraph(club, year)
+        path = graph.figure_path()
+        digest = graph.data_hash()
+        if os.path.exists(path) and os.path.exists(f'{path}.sha256'):
+            with open(f'{path}.sha256') as f:
+                if f.read() == digest:
+                    logging.info(f'{path} is up to date.')
+                    return 'unchanged'
+        if _template is None:
+            _template = FigureTemplate()
+        graph.draw(_template)
+        graph.save_figure()
+        with open(f'{path}.sha256', 'w') as f:
+            f.write(digest)
+        logging.info(f'{path} rendered.')
+        return 'rendered'
+    except Exception:
+        logging.exception(f'Could not render {club} {year}.')
+        return 'failed'
+
+
+def render_batch(jobs, processes=None):
+    '''
+    Renders the figures of many club-seasons across a pool of processes without a display.
+
+    Args:
+        jobs (list): (club, year) pairs, e.g. [('Chelsea', '2021/22')].
+        processes (int): The number of worker processes. Defaults to the number of CPUs.
+
+    Returns:
+        dict: The status of each (club, year) pair.
+    '''
+    os.makedirs('graphical-data', exist_ok=True)
+    jobs = list(dict.fromkeys(jobs))
+    with Pool(processes, initializer=_init_worker) as pool:
+        return dict(zip(jobs, pool.map(_render, jobs)))
+
+
+if __name__ == '__main__':
+    # e.g. python render.py "Chelsea:2021/22" "Arsenal:2021/22"
+    statuses = render_batch([tuple(arg.split(':')) for arg in sys.argv[1:]], int(os.environ.get('render_processes', os.cpu_count())))
+    logging.info(f"{list(statuses.values()).count('rendered')} rendered, {list(statuses.values()).count('unchanged')} unchanged, {list(statuses.values()).count('failed')} failed.")
@@ -0,0 +1,295 @@
+import os
+import time
+import sqlite3
+import logging
+import argparse
+import multiprocessing
+from contextlib import contextmanager
+from datetime import datetime
+import RDS
+import valid_inputs
+from backends import HttpBackend
+from page_cache import PageCache
+from scraper import PremierLeagueScraper
+
+logging.basicConfig(level = logging.INFO)
+
+
+def season_range(first, last):
+    '''
+    Lists every season from first to last inclusive.
+
+    Args:
+        first (str): The first season, e.g. '1998/99'.
+        last (str): The last season, e.g. '2000/01'.
+
+    Returns:
+        list: e.g. ['1998/99', '1999/00', '2000/01']
+    '''
+    return [f'{year}/{str(year + 1)[-2:]}' for year in range(int(first[:4]), int(last[:4]) + 1)]
+
+
+def expand(seasons, clubs=None):
+    '''
+    Expands a spec into the list of (club, year) jobs, season by season and without duplicates.
+
+    Args:
+        seasons (list): The seasons to scrape.
+        clubs (list): The clubs to scrape. Every club in valid_inputs.CLUBS if None.
+
+    Returns:
+        list: (club, year) pairs.
+    '''
+    clubs = list(valid_inputs.CLUBS) if clubs is None else clubs
+    return list(dict.fromkeys((club, year) for year in seasons for club in clubs))
+
+
+class JobQueue:
+    '''
+    This class is used to keep the queue of club-seasons to scrape in a local SQLite file shared by the worker processes,
+    so a backfill can be stopped, crash and be started again without losing or repeating work.
+    A job is 'pending', 'running', 'done', 'skipped' if the club was not in the league that season, or 'failed'.
+
+    Attributes
+    ----------
+    path (str): The path to the SQLite file.
+    min_interval (float): The fewest seconds between any two jobs starting, across every process using the queue.
+    max_attempts (int): The number of times a job is started before it is left as failed.
+    '''
+
+    def __init__(self, path='scheduler.db', min_interval=0, max_attempts=3):
+        self.path = path
+        self.min_interval = min_interval
+        self.max_attempts = max_attempts
+        self._connection = sqlite3.connect(path, timeout=60, isolation_level=None)
+        with self._transaction() as connection:
+            connection.execute('''
+                CREATE TABLE IF NOT EXISTS jobs (
+                    club TEXT NOT NULL,
+                    season TEXT NOT NULL,
+                    state TEXT NOT NULL DEFAULT 'pending',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    pid INTEGER,
+                    started_at TEXT,
+                    finished_at TEXT,
+                    error TEXT,
+                    PRIMARY KEY (club, season)
+                )''')
+            connection.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)')
+
+    @contextmanager
+    def _transaction(self):
+        '''Holds the write lock on the file for the length of the with block, so no other process can claim the same job.'''
+        self._connection.execute('BEGIN IMMEDIATE')
+        try:
+            yield self._connection
+        except BaseException:
+            self._connection.execute('ROLLBACK')
+            raise
+        self._connection.execute('COMMIT')
+
+    def add(self, jobs):
+        '''
+        Queues jobs, ignoring any already in the queue whatever their state.
+
+        Args:
+            jobs (list): (club, year) pairs.
+
+        Returns:
+            int: The number of jobs added.
+        '''
+        with self._transaction() as connection:
+            before = connection.total_changes
+            connection.executemany('INSERT OR IGNORE INTO jobs (club, season) VALUES (?, ?)', jobs)
+            return connection.total_changes - before
+
+    def claim(self, pid):
+        '''
+        Marks the next pending job as running, first waiting until min_interval has passed since the last job started.
+
+        Args:
+            pid (int): The process the job is claimed for.
+
+        Returns:
+            tuple: (club, year), or None if there are no pending jobs.
+        '''
+        while True:
+            with self._transaction() as connection:
+                job = connection.execute("SELECT club, season FROM jobs WHERE state = 'pending' ORDER BY rowid LIMIT 1").fetchone()
+                if job is None:
+                    return None
+                last_claim = connection.execute("SELECT value FROM meta WHERE key = 'last_claim'").fetchone()
+                wait = float(last_claim[0]) + self.min_interval - time.time() if last_claim else 0
+                if wait <= 0:
+                    connection.execute(
+                        "UPDATE jobs SET state = 'running', attempts = attempts + 1, pid = ?, started_at = ?, finished_at = NULL, error = NULL "
+                        'WHERE club = ? AND season = ?',
+                        (pid, datetime.utcnow().isoformat(), *job))
+                    connection.execute("INSERT OR REPLACE INTO meta VALUES ('last_claim', ?)", (str(time.time()),))
+                    return job
+            time.sleep(wait)
+
+    def finish(self, job, state, error=None):
+        '''
+        Records how a job ended. A failed job goes back in the queue until it has been attempted max_attempts times.
+
+        Args:
+            job (tuple): (club, year)
+            state (str): 'done', 'skipped' or 'failed'.
+            error (str): What went wrong, if anything.
+        '''
+        with self._transaction() as connection:
+            if state == 'failed':
+                attempts = connection.execute('SELECT attempts FROM jobs WHERE club = ? AND season = ?', job).fetchone()[0]
+                state = 'pending' if attempts < self.max_attempts else 'failed'
+            connection.execute(
+                'UPDATE jobs SET state = ?, pid = NULL, finished_at = ?, error = ? WHERE club = ? AND season = ?',
+                (state, datetime.utcnow().isoformat(), error, *job))
+
+    def recover(self):
+        '''
+        Puts the running jobs of processes that have died back in the queue, or leaves them as failed once out of attempts.
+
+        Returns:
+            int: The number of jobs recovered.
+        '''
+        with self._transaction() as connection:
+            running = connection.execute("SELECT club, season, attempts, pid FROM jobs WHERE state = 'running'").fetchall()
+            crashed = [(club, season, attempts) for club, season, attempts, pid in running if not _alive(pid)]
+            connection.executemany(
+                "UPDATE jobs SET state = ?, pid = NULL, error = 'The worker process died.' WHERE club = ? AND season = ?",
+                [('pending' if attempts < self.max_attempts else 'failed', club, season) for club, season, attempts in crashed])
+        return len(crashed)
+
+    def retry_failed(self):
+        '''Puts every failed job back in the queue with its attempts reset.'''
+        with self._transaction() as connection:
+            connection.execute("UPDATE jobs SET state = 'pending', attempts = 0 WHERE state = 'failed'")
+
+    def counts(self):
+        '''Returns the number of jobs in each state.'''
+        return dict(self._connection.execute('SELECT state, COUNT(*) FROM jobs GROUP BY state').fetchall())
+
+    def close(self):
+        self._connection.close()
+
+
+def _alive(pid):
+    '''Returns True if a process with the ID is running.'''
+    if pid is None:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _run_job(club, year, backend):
+    '''Scrapes and loads one club-season without displaying its graphs.'''
+    cache = PageCache.from_env()
+    scraper = PremierLeagueScraper(driver=None, backend=HttpBackend(cache=cache) if backend == 'http' else None, cache=cache)
+    try:
+        scraper.run_crawler(club, year, graphs=False)
+    finally:
+        scraper.close()
+        if cache is not None:
+            cache.close()
+
+
+def _worker(path, min_interval, max_attempts, backend):
+    '''Claims and runs jobs from the queue until none are pending.'''
+    RDS.dispose_engine(close=False)  # Stops a forked worker from reusing the parent's database connections
+    jobs = JobQueue(path, min_interval, max_attempts)
+    while True:
+        job = jobs.claim(os.getpid())
+        if job is None:
+            break
+        club, year = job
+        logging.info(f'Scraping {club} {year}...')
+        try:
+            _run_job(club, year, backend)
+            jobs.finish(job, 'done')
+        except SystemExit:
+            jobs.finish(job, 'skipped', f'{club} were not in the league in {year}.')
+        except Exception as e:
+            logging.exception(f'Could not scrape {club} {year}.')
+            jobs.finish(job, 'failed', repr(e))
+    jobs.close()
+
+
+def run_schedule(jobs, path='scheduler.db', workers=2, jobs_per_minute=None, max_attempts=3, backend=None, poll=1):
+    '''
+    Queues the jobs and runs every pending job in the queue across local worker processes.
+    A worker that crashes has its job put back in the queue and is replaced while jobs are still pending.
+
+    Args:
+        jobs (list): (club, year) pairs to add to the queue.
+        path (str): The SQLite file the queue is kept in.
+        workers (int): The number of worker processes.
+        jobs_per_minute (float): The most jobs started per minute across all workers. No limit if None.
+        max_attempts (int): The number of times a job is started before it is left as failed.
+        backend (str): 'http' to scrape with the HTTP backend, otherwise Chrome.
+        poll (float): Seconds between checks on the worker processes.
+
+    Returns:
+        dict: The number of jobs in each state once the queue has been worked through.
+    '''
+    min_interval = 60 / jobs_per_minute if jobs_per_minute else 0
+    queue = JobQueue(path, min_interval, max_attempts)
+    logging.info(f'{queue.add(jobs)} jobs added to {path}.')
+    recovered = queue.recover()
+    if recovered:
+        logging.warning(f'{recovered} jobs left running by an earlier run put back in the queue.')
+
+    def start():
+        process = multiprocessing.Process(target=_worker, args=(path, min_interval, max_attempts, backend))
+        process.start()
+        return process
+
+    processes = [start() for _ in range(workers)]
+    while processes:
+        time.sleep(poll)
+        for process in [process for process in processes if not process.is_alive()]:
+            processes.remove(process)
+            if process.exitcode != 0:
+                logging.error(f'Worker {process.pid} crashed with exit code {process.exitcode}.')
+                queue.recover()
+                if queue.counts().get('pending'):
+                    processes.append(start())
+    counts = queue.counts()
+    queue.close()
+    logging.info(', '.join(f'{count} {state}' for state, count in sorted(counts.items())))
+    return counts
+
+
+if __name__ == '__main__':
+    # e.g. python scheduler.py 1992/93 2021/22 --workers 4 --jobs-per-minute 6
+    parser = argparse.ArgumentParser(description='Scrapes many club-seasons unattended from a queue of jobs.')
+    parser.add_argument('first', help='the first season, e.g. 1992/93')
+    parser.add_argument('last', help='the last season, e.g. 2021/22')
+    parser.add_argument('--clubs', nargs='+', help='the clubs to scrape, every club if not given')
+    parser.add_argument('--league', action='store_true', help='scrape each season as one job over every club')
+    parser.add_argument('--queue', default=os.environ.get('scheduler_path', 'scheduler.db'), help='the SQLite file of the queue')
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('scheduler_workers', 2)), help='the number of worker processes')
+    parser.add_argument('--jobs-per-minute', type=float, help='the most jobs started per minute')
+    parser.add_argument('--max-attempts', type=int, default=3, help='the number of times a job is started before it is left as failed')
+    parser.add_argument('--retry-failed', action='store_true', help='put failed jobs back in the queue first')
+    args = parser.parse_args()
+
+    clubs = [valid_inputs.LEAGUE] if args.league else args.clubs
+    unknown = set(clubs or []) - set(valid_inputs.CLUBS) - {valid_inputs.LEAGUE}
+    if unknown:
+        parser.error(f'Unknown clubs: {sorted(unknown)}')
+    try:
+        valid_inputs.season(args.first), valid_inputs.season(args.last)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.retry_failed:
+        JobQueue(args.queue).retry_failed()
+    run_schedule(
+        expand(season_range(args.first, args.last), clubs), args.queue, args.workers,
+        args.jobs_per_minute, args.max_attempts, os.environ.get('backend')
+        )
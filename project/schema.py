@@ -0,0 +1,82 @@
+import logging
+import pandas as pd
+
+logging.basicConfig(level = logging.INFO)
+
+DATE_FORMAT = '%a %d %b %Y'  # e.g. 'Sat 14 Aug 2021', as shown on the match page
+
+# The columns of a club-season and the type of each, in the order they are shown
+MATCH_SCHEMA = {
+    'Match id': 'string',
+    'V4 uuid': 'string',
+    'Date': 'date',
+    'Location': 'category',
+    'Home or away': 'category',
+    'Result': 'category',
+    'Goals scored': 'int16',
+    'Goals against': 'int16',
+    'Possession %': 'float64',
+    'Shots on target': 'int16',
+    'Shots': 'int16',
+    'Touches': 'int16',
+    'Passes': 'int16',
+    'Tackles': 'int16',
+    'Clearances': 'int16',
+    'Corners': 'int16',
+    'Offsides': 'int16',
+    'Fouls conceded': 'int16',
+    'Yellow cards': 'int16',
+    'Red cards': 'int16'
+}
+COLUMNS = list(MATCH_SCHEMA)
+NUMERIC = [column for column, dtype in MATCH_SCHEMA.items() if dtype.startswith(('int', 'float'))]
+
+# Called with a label and the deep memory usage of a frame in bytes, before and after it is cleaned
+memory_hooks = [lambda label, size: logging.info(f'{label}: {size / 1024:.1f} KiB')]
+
+
+def report_memory(df, label):
+    '''Passes the deep memory usage of the data frame to every memory hook.'''
+    size = int(df.memory_usage(deep=True).sum())
+    for hook in memory_hooks:
+        hook(label, size)
+
+
+def season_bounds(year):
+    '''
+    Returns the first and last day a match of the season can be played on, taking seasons to run from August to July.
+
+    Args:
+        year (str): The season, e.g. '2021/22' or '1999/00'.
+
+    Returns:
+        tuple: (pd.Timestamp, pd.Timestamp)
+    '''
+    start = int(year[:4])
+    return pd.Timestamp(start, 8, 1), pd.Timestamp(start + 1, 7, 31)
+
+
+def clean_frame(stats_dict_list, year):
+    '''
+    Creates the data frame of a club's season from the match records in one vectorised pass over the schema.
+    Any column missing from the records, such as a stat not recorded in older seasons, is filled with 0.
+
+    Args:
+        stats_dict_list (list): The match records as dictionaries.
+        year (str): The season, used to drop any matches played outside it.
+
+    Returns:
+        pd.DataFrame
+    '''
+    df = pd.DataFrame.from_records(stats_dict_list, columns=COLUMNS)
+    report_memory(df, f'{year} raw frame')
+    df[NUMERIC] = df[NUMERIC].apply(pd.to_numeric, errors='coerce').fillna(0)
+    df['Date'] = pd.to_datetime(df['Date'], format=DATE_FORMAT, errors='coerce')
+    df = df.astype({column: dtype for column, dtype in MATCH_SCHEMA.items() if dtype != 'date'})
+    first_day, last_day = season_bounds(year)
+    in_season = df['Date'].between(first_day, last_day)
+    if (~in_season).any():
+        logging.warning(f'{int((~in_season).sum())} matches dropped for being outside the {year} season or having no date.')
+    df = df[in_season].reset_index(drop=True)
+    report_memory(df, f'{year} cleaned frame')
+    return df
@@ -4,20 +4,51 @@ import sys
 import logging
 import uuid
 import json
-import boto3
+import time
+import queue
+import threading
+from functools import partial
 import RDS
+import export
 import valid_inputs
+from backends import BackendError, HttpBackend, MatchRecord
+from fixtures import FixtureIndex, parse_fixtures
+from storage import S3Writer, s3_key
+from pipeline import StreamingPipeline
+from ledger import ScrapeLedger
 from graphs import CreateGraph
-from selenium import webdriver
-from selenium.common.exceptions import TimeoutException
+from metrics import EXTRACTION, PAGE_LOAD, REFRESHES, RETRIES, start_metrics_server
+from waits import WaitPolicy
+from browser import BrowserFactory
+from page_cache import CacheMiss, PageCache, cache_url, is_final
+from match_page import IncompletePage, check_complete, parse_match_page
+from selenium.common.exceptions import WebDriverException
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.common.action_chains import ActionChains
 
 logging.basicConfig(level = logging.INFO)
 
+# Reads every fixture on the results page in a single round-trip to the browser
+FIXTURES_SCRIPT = '''
+return Array.from(document.querySelectorAll('section[class="fixtures"] li[data-home]'), li => {
+    const fixture = li.querySelector(':scope > div') || {dataset: {}};
+    const day = li.closest('[data-competition-matches-list]');
+    return [
+        li.dataset.home, li.dataset.away, fixture.dataset.href, fixture.dataset.compMatchItem,
+        fixture.dataset.compMatchItemKo, day ? day.dataset.competitionMatchesList : null
+    ];
+});
+'''
+
+# Jumps to the bottom of the results page to trigger the next lazy load and reports how much has loaded
+LOAD_MORE_SCRIPT = '''
+window.scrollTo(0, document.body.scrollHeight);
+const club = arguments[0];
+const selector = club ? `li[data-home="${club}"], li[data-away="${club}"]` : 'li[data-home]';
+return [document.body.scrollHeight, document.querySelectorAll(selector).length];
+'''
+
 
 class PremierLeagueScraper:
     '''
@@ -25,148 +56,375 @@ class PremierLeagueScraper:
 
     Attributes
     ----------
-    driver (class): The webdriver to be used.
-    club (str): The Premier League club to be inspected.
+    driver (class): The webdriver to be used. If None, a headless Chrome is opened the first time it is needed.
+    club (str): The Premier League club to be inspected, or valid_inputs.LEAGUE to scrape every club in the season.
     URL (str): The URL of the 2021/22 results page from the official Premier League website.
+    workers (int): The number of headless browsers scraping match pages at the same time.
+    max_retries (int): The number of attempts made at each match before it is given up on.
+    backend (HttpBackend): Fetches fixtures and match stats without a browser. Chrome is used if None or if the backend fails.
+    load_times (dict): Seconds taken to load the fixture list of each season, including any refreshes.
+    clubs_scraped (set): The names of the clubs a record has been saved for.
+    unlisted_clubs (dict): The name and shortened name of each club scraped that is not in valid_inputs.CLUBS.
+    unloaded (dict): For each club, the ledger entry of each record saved to S3 but not yet loaded into RDS, by Match id.
+    storage (S3Writer): Buffers the match records and writes them to the S3 bucket.
+    pipeline (StreamingPipeline): Streams the match records straight into the database if not None.
+    ledger (ScrapeLedger): Records which matches have been scraped, so they are skipped on the next run.
+    waits (WaitPolicy): The timeout and polling interval of each wait for the browser, and the time spent waiting.
+    browser (BrowserFactory): Opens the headless Chrome when driver is None.
+    worker_id (int): The number of the worker, which picks the browser profile directory. 0 for the main scraper.
+    cache (PageCache): Keeps the raw source of each match's stats page and the fixture listings, so they are not loaded in Chrome again, if not None.
+    fixture_index (FixtureIndex): Every fixture of the season from the last time the results page was read.
     '''
 
-    def __init__(self, driver):
-        self.driver = driver
+    def __init__(self, driver, workers=1, max_retries=3, backend=None, storage=None, ledger=None, waits=None, browser=None, cache=None):
+        self._driver = driver
         self.URL = 'https://www.premierleague.com/results'
+        self.workers = workers
+        self.max_retries = max_retries
+        self.backend = backend
+        self.load_times = {}
+        self.clubs_scraped = set()
+        self.unlisted_clubs = {}
+        self.unloaded = {}
+        self.storage = storage if storage is not None else S3Writer()
+        self.pipeline = None
+        self.ledger = ledger if ledger is not None else ScrapeLedger(os.environ.get('ledger_path', 'scrape_ledger.db'))
+        self.waits = waits if waits is not None else WaitPolicy.from_env()
+        self.browser = browser if browser is not None else BrowserFactory.from_env()
+        self.worker_id = 0
+        self.cache = cache if cache is not None else PageCache.from_env()
+        # What the scraper opened itself rather than was given, and so closes in close()
+        self._owned = [resource for resource, given in ((self.storage, storage), (self.ledger, ledger), (self.browser, browser), (self.cache, cache))
+            if given is None and resource is not None]
+        self.fixture_index = None
+        self._overlays_checked = set()
+
+    @property
+    def driver(self):
+        '''The webdriver, opened on first use so that a backend-only run never starts Chrome.'''
+        if self._driver is None:
+            self._driver = self.browser.create(self.worker_id)
+            self._load_page(self.URL, 'results')
+            self._accept_cookies()
+        return self._driver
+
+    @driver.setter
+    def driver(self, driver):
+        self._driver = driver
+        self._overlays_checked = set()
+
+    def _quit_driver(self):
+        '''Closes the browser if one has been opened.'''
+        if self._driver is not None:
+            self._driver.quit()
+            self._driver = None
+            self._overlays_checked = set()
+
+    def close(self):
+        '''Closes the browser, and the storage, ledger, browser profiles and page cache unless they were given to the scraper.'''
+        self._quit_driver()
+        for resource in self._owned:
+            resource.close()
+        self._owned = []
+
+    def _load_page(self, url, page):
+        '''
+        Opens a page in the browser, recording how long it took to load.
+
+        Args:
+            url (str): The URL of the page.
+            page (str): The kind of page the load time is recorded under, 'results' or 'match'.
+        '''
+        with PAGE_LOAD.labels(page).time():
+            self.driver.get(url)
 
-    def _user_inputs(self):
-        '''Sets user inputs as environment variables.'''
-        self.club = os.environ['club']
-        self.year = os.environ['season']
+    def _wait_until(self, condition, step):
+        '''
+        Waits for a condition with the timeout and polling interval the wait policy sets for the step.
+
+        Args:
+            condition: The expected condition, e.g. EC.element_to_be_clickable((By.XPATH, ...)).
+            step (str): The step of the wait policy, e.g. 'scorebox'.
+
+        Returns:
+            The value returned by the condition, usually the element waited for.
+        '''
+        return self.waits.until(self.driver, condition, step)
+
+    def _dismiss_overlay(self, step, selector):
+        '''
+        Clicks an overlay away if it shows up within the short timeout of its step.
+        Each overlay is only checked for once per browser session.
+
+        Args:
+            step (str): The step of the wait policy, e.g. 'cookies'.
+            selector (str): The CSS selector of the button that dismisses the overlay.
+
+        Returns:
+            bool: True if the overlay was dismissed.
+        '''
+        if step in self._overlays_checked:
+            return False
+        self._overlays_checked.add(step)
+        button = self.waits.probe(self.driver, EC.element_to_be_clickable((By.CSS_SELECTOR, selector)), step)
+        if button is None:
+            return False
+        button.click()
+        return True
+
+    def _user_inputs(self, club=None, year=None):
+        '''
+        Sets the club and season to be scraped, from the environment variables unless they are given.
+
+        Args:
+            club (str): The club, or valid_inputs.LEAGUE. Read from the club environment variable if None.
+            year (str): The season, e.g. '2021/22'. Read from the season environment variable if None.
+
+        Raises:
+            ValueError: If the club or season is unknown.
+        '''
+        self.club = club if club is not None else os.environ['club']
+        self.year = year if year is not None else os.environ['season']
+        valid_inputs.validate(self.club, self.year)
+        self.workers = int(os.environ.get('workers', self.workers))
+        if os.environ.get('pipeline') == 'stream':
+            archive = self.storage if os.environ.get('archive', 'true') == 'true' else None
+            self.pipeline = StreamingPipeline(self.year, archive=archive)
     
     def _accept_cookies(self):
-        '''Wait for window and accepts all cookies. Does nothing if no window.'''
-        try:
-            WebDriverWait(self.driver, 10).until(EC.element_to_be_clickable((By.CSS_SELECTOR,
-                'button[class^="_2hTJ5th4dIYlveipSEMYHH BfdVlAo_cgSVjDUegen0F"]'))).click()
+        '''Accepts all cookies if the window appears. Does nothing if no window, or if it has already been checked for.'''
+        if self._dismiss_overlay('cookies', 'button[class^="_2hTJ5th4dIYlveipSEMYHH BfdVlAo_cgSVjDUegen0F"]'):
             logging.info('Cookies accepted.')
-        except TimeoutException:
-            logging.info('No cookies to be accepted.')
-            pass
 
     def _close_ad(self):
-        '''Closes ad if ad window appears. Does nothing if no ad.'''
-        try:
-            WebDriverWait(self.driver, 10).until(EC.element_to_be_clickable((By.CSS_SELECTOR, 'a[class="closeBtn"]'))).click()
+        '''Closes ad if ad window appears. Does nothing if no ad, or if it has already been checked for.'''
+        if self._dismiss_overlay('ad', 'a[class="closeBtn"]'):
             logging.info('Ad closed.')
-        except TimeoutException:
-            pass
 
     def _select_season(self):
         '''Selects the correct season to be inspected'''
         logging.info('Selecting season...')
         self._accept_cookies()
         self._close_ad()
-        WebDriverWait(self.driver, 10).until(EC.visibility_of_element_located((By.CSS_SELECTOR,
-            '[aria-labelledby="dd-compSeasons"][role="button"]'))).click()
+        self._wait_until(EC.visibility_of_element_located((By.CSS_SELECTOR,
+            '[aria-labelledby="dd-compSeasons"][role="button"]')), 'season_dropdown').click()
         desired_season = self.driver.find_element(By. XPATH,
             f'//*[@id="mainContent"]/div[3]/div[1]/section/div[3]/ul/li[contains(text(),"{self.year}")]')
         actions = ActionChains(self.driver)
         actions.move_to_element(desired_season).perform()
         desired_season.click()
 
-    def _scroll_to_bottom(self):
-        '''Selects the correct season and scrolls down the page slowly to ensure all fixtures loaded.'''
+    def _scroll_to_bottom(self, expected_fixtures=None, settle_rounds=3):
+        '''
+        Scrolls to the bottom of the page in large jumps until all fixtures are loaded.
+        Stops as soon as the expected number of fixtures is present, or once neither the page height nor
+        the number of fixtures has grown for settle_rounds polls in a row. The time limit and the interval
+        between jumps are set by the 'scroll' step of the wait policy.
+
+        Args:
+            expected_fixtures (int): The number of fixtures of the club being inspected. If None, waits for the page to stop growing.
+            settle_rounds (int): The number of polls without growth before the page is considered fully loaded.
+        '''
         logging.info('Scrolling to bottom of the page...')
-        WebDriverWait(self.driver, 30).until(EC.presence_of_element_located((By.XPATH, '//*[@id="mainContent"]/div[3]/div[1]/div[2]/section')))
+        start = time.perf_counter()
+        self._wait_until(EC.presence_of_element_located((By.XPATH, '//*[@id="mainContent"]/div[3]/div[1]/div[2]/section')), 'results_section')
         self._close_ad()
-        for i in range(1, 37000, 5):  # 37000 length of page, scrolls 5 at a time
-                self.driver.execute_script("window.scrollTo(0, {});".format(i))
-    
+        club = self.club if expected_fixtures is not None and self.club != valid_inputs.LEAGUE else None
+        timeout, poll = self.waits.steps['scroll']
+        last_height, last_count, idle_rounds, count = 0, 0, 0, 0
+        while time.perf_counter() - start < timeout:
+            height, count = self.driver.execute_script(LOAD_MORE_SCRIPT, club)
+            if expected_fixtures is not None and count >= expected_fixtures:
+                break
+            if height == last_height and count == last_count:
+                idle_rounds += 1
+                if idle_rounds >= settle_rounds:
+                    break
+            else:
+                idle_rounds = 0
+            last_height, last_count = height, count
+            time.sleep(poll)
+        elapsed = time.perf_counter() - start
+        self.waits.record('scroll', elapsed, timed_out=elapsed >= timeout)
+        self.load_times[self.year] = self.load_times.get(self.year, 0) + elapsed
+        logging.info(f'{count} fixtures loaded in {elapsed:.1f}s.')
+
+    def _harvest_fixtures(self):
+        '''
+        Reads every fixture on the results page with one script call and keeps them in self.fixture_index.
+
+        Returns:
+            list: The raw rows read by FIXTURES_SCRIPT.
+        '''
+        self._wait_until(EC.presence_of_element_located((By.XPATH, '//*[@class="fixtures__matches-list"]')), 'fixture_list')
+        rows = self.driver.execute_script(FIXTURES_SCRIPT)
+        self.fixture_index = FixtureIndex(parse_fixtures(rows))
+        return rows
+
+    def _fixture_listing_url(self, club):
+        '''
+        Returns the page cache key of a fixture listing. The scroll stops once the club's fixtures are loaded,
+        so a club's listing only holds a part of the season and is kept apart from the full listing read in league mode.
+
+        Args:
+            club (str): The club the listing was read for, or valid_inputs.LEAGUE.
+        '''
+        return cache_url(self.URL, {'season': self.year, 'club': club})
+
+    def _cached_fixture_links(self):
+        '''
+        Reads the club's fixture listing from the page cache, or else the full listing of the season, so the results page
+        is not loaded again. A listing is only trusted if it holds every fixture it was read for.
+
+        Returns:
+            list: The links to the club's fixtures, or None if no complete listing is cached.
+
+        Raises:
+            CacheMiss: If no complete listing is cached in offline mode.
+        '''
+        if self.cache is None:
+            return None
+        season = valid_inputs.season(self.year)
+        listings = [(valid_inputs.LEAGUE, season.fixtures)]
+        if self.club != valid_inputs.LEAGUE:
+            listings.insert(0, (self.club, season.club_fixtures))
+        for club, expected in listings:
+            content = self.cache.get(self._fixture_listing_url(club), self.year)
+            if content is None:
+                continue
+            fixture_index = FixtureIndex(parse_fixtures(json.loads(content)))
+            found = len(fixture_index.for_club(club))
+            if found != expected:
+                logging.warning(f'The cached {self.year} fixture listing for {club} has {found} fixtures. There should be {expected}.')
+                continue
+            self.fixture_index = fixture_index
+            return fixture_index.links(self.club)
+        if self.cache.offline:
+            raise CacheMiss(f'No complete {self.year} fixture listing for {self.club} is in the page cache.')
+        return None
+
     def _get_fixture_link_list(self, correct_no_fixtures):
         '''
         Retrieves the href links to each match and stores them in a list.
+        If the list is short, the page is refreshed once and read again.
         
         Returns:
             list: A list of all the URLs to each match the club has played over the course of the season.
         '''
         logging.info('Getting fixture links...')
-        link_list = []
-        while len(link_list) != correct_no_fixtures:
-            link_list = []
-            WebDriverWait(self.driver, 30).until(EC.presence_of_element_located((By.XPATH, '//*[@class="fixtures__matches-list"]')))
-            fixture_list = self.driver.find_element(By.CSS_SELECTOR, 'section[class="fixtures"]')
-            home_games = fixture_list.find_elements(By.CSS_SELECTOR, f'li[data-home="{self.club}"]')
-            away_games = fixture_list.find_elements(By.CSS_SELECTOR, f'li[data-away="{self.club}"]')
-            game_list = home_games + away_games
-            for game in game_list:
-                link_class = game.find_element(By.XPATH, "./div")
-                link = link_class.get_attribute('data-href')
-                link_list.append(link)
+        for refreshes in range(2):
+            rows = self._harvest_fixtures()
+            link_list = self.fixture_index.links(self.club)
             if len(link_list) == correct_no_fixtures:
                 logging.info(f'All {correct_no_fixtures} fixtures in list.')
+                if self.cache is not None:
+                    # The raw rows are kept, so they are parsed again if parse_fixtures changes
+                    self.cache.put(self._fixture_listing_url(self.club), self.year, json.dumps(rows).encode('utf-8'), is_final('fixtures', self.year, {}))
                 return link_list
             elif len(link_list) == 0:
                 logging.error(f'This club was not in the premier league during the {self.year} season.')
-                self.driver.quit()
+                self._quit_driver()
                 sys.exit()
             logging.error(f'{len(link_list)} fixtures in list. There should be {correct_no_fixtures}.')
-            self.driver.refresh()
-            self._close_ad()
-            WebDriverWait(self.driver, 10).until(EC.visibility_of_element_located((By.CSS_SELECTOR, 'div[class="fixtures__matches-list"]')))
-            self._scroll_to_bottom()
-            return link_list
+            if refreshes == 0:
+                REFRESHES.inc()
+                self.driver.refresh()
+                self._overlays_checked.discard('ad')  # The ad can come back with the page
+                self._close_ad()
+                self._wait_until(EC.visibility_of_element_located((By.CSS_SELECTOR, 'div[class="fixtures__matches-list"]')), 'fixture_list')
+                self._scroll_to_bottom(correct_no_fixtures)
+        return link_list
     
-    def _get_match_info(self, link):
+    def _extract_match(self, link):
         '''
-        Extracts the date, name and location of the stadium played at, statistics, result and match ID from the stats page.
+        Extracts the date, stadium, scorebox and stats table from the source of the open stats page.
+
+        Args:
+            link (str): The URL of the fixture being inspected.
 
         Returns:
-            list: Date in datetime format (%a %d %b %Y) as a string, stadium as a string, stats_list as a list.
+            MatchRecord: The raw match information.
         '''
-        WebDriverWait(self.driver, 30).until(EC.visibility_of_element_located((By.CSS_SELECTOR, 'div[class^="matchDate renderMatchDateContainer"]')))
-        date_str = self.driver.find_element(By.CSS_SELECTOR, 'div[class^="matchDate renderMatchDateContainer"]').text
-        stadium = self.driver.find_element(By.CSS_SELECTOR, 'div[class="stadium"]').text
+        return self._match_record(link, parse_match_page(self._read_match_page()))
 
-        stats_table = self.driver.find_element(By.CSS_SELECTOR, 'tbody[class="matchCentreStatsContainer"]')
-        stats_list = stats_table.find_elements(By.TAG_NAME, 'tr')
-        info = [date_str, stadium, stats_list]
+    def _read_match_page(self):
+        '''Returns the source of the open stats page in one call, once the scorebox is shown.'''
+        self._wait_until(EC.visibility_of_element_located((By.CSS_SELECTOR, 'div[class="scoreboxContainer"]')), 'scorebox')
+        return self.driver.page_source
 
-        WebDriverWait(self.driver, 30).until(EC.visibility_of_element_located((By.CSS_SELECTOR, 'div[class="scoreboxContainer"]')))
-        score_container = self.driver.find_element(By.CSS_SELECTOR, 'div[class="scoreboxContainer"]')
-        home_container = score_container.find_element(By.CSS_SELECTOR, 'div[class="team home"]')
-        home_team_short = home_container.find_element(By.CSS_SELECTOR, 'span[class="short"]').get_attribute('textContent')  # get_attribute as element is not visible
-        
-        score = self.driver.find_element(By.XPATH, '//div[@class="score fullTime"]').text # 'home_score - away_score'
-        home_score = int(score[0])
-        away_score = int(score[2])
-        
-        if home_team_short == f'{valid_inputs.valid_clubs()[self.club]}':
-            home_or_away = 'Home'
-        else:
-            home_or_away = 'Away'
-        info.append(home_or_away)
+    def _match_record(self, link, page):
+        '''
+        Builds the match record from what parse_match_page read from the stats page.
+
+        Args:
+            link (str): The URL of the fixture being inspected.
+            page (dict): The date, stadium, home, away, score and stats read from the page.
+
+        Returns:
+            MatchRecord: The raw match information.
+
+        Raises:
+            IncompletePage: If the page was read before it had fully rendered.
+        '''
+        check_complete(page)
+        home_score, away_score = (int(goals) for goals in page['score'].split('-'))  # 'home_score-away_score'
+        return MatchRecord(
+            match_no=link[-5:],
+            date=page['date'],
+            stadium=page['stadium'],
+            home=page['home'],
+            away=page['away'],
+            home_score=home_score,
+            away_score=away_score,
+            stats=page['stats'],
+            home_name=page.get('home_name'),
+            away_name=page.get('away_name')
+            )
+
+    def _club_view(self, record, club_short):
+        '''
+        Presents a match record from the point of view of one of the clubs that played in it.
+
+        Args:
+            record (MatchRecord): The raw match information.
+            club_short (str): The shortened name of the club being inspected.
 
-        if (home_or_away == 'Home' and home_score > away_score) or (home_or_away == 'Away' and away_score > home_score):
-            info.append([home_score, away_score, 'Win'])
-        elif home_score == away_score:
-            info.append([home_score, away_score, 'Draw'])
+        Returns:
+            list: Date as a string, stadium as a string, stats_list as a list, 'Home' or 'Away',
+                [home_score, away_score, result] and the match ID.
+        '''
+        home_or_away = 'Home' if record.home == club_short else 'Away'
+        if (home_or_away == 'Home' and record.home_score > record.away_score) or (home_or_away == 'Away' and record.away_score > record.home_score):
+            result = 'Win'
+        elif record.home_score == record.away_score:
+            result = 'Draw'
         else:
-            info.append([home_score, away_score, 'Loss'])
+            result = 'Loss'
+        match_id = f'{record.match_no}-{club_short}'
+        return [record.date, record.stadium, record.stats, home_or_away, [record.home_score, record.away_score, result], match_id]
 
-        match_id = f'{link[-5:]}-{valid_inputs.valid_clubs()[self.club]}'
-        info.append(match_id)
+    def _get_match_info(self, link):
+        '''
+        Extracts the date, name and location of the stadium played at, statistics, result and match ID from the stats page.
 
-        return info
+        Returns:
+            list: Date in datetime format (%a %d %b %Y) as a string, stadium as a string, stats_list as a list.
+        '''
+        return self._club_view(self._extract_match(link), valid_inputs.CLUBS[self.club])
 
     def _split_stats_list(self, stats_list):
         '''
         Splits the stats list into the a list conatining only the stats of the club being inspects.
         
         Args:
-            stats_list (list): The list of all match statistics of both teams.
+            stats_list (list): The text of each row of the stats table, for both teams.
 
         Returns:
             list: In format [home_stat, away_stat, 'stat name']
         '''
         stats_reconstructed = []
         for stat in stats_list:
-            stat_split = stat.text.split()
+            stat_split = stat.split()
             stat_h = [stat_split[0]]
             stat_a = [stat_split[-1]]
             stat_name = [stat_split[1:-1]]
@@ -210,50 +468,244 @@ class PremierLeagueScraper:
                 stats_dict[stat_name] = stats_list[i][1]       
         return stats_dict
 
-    def save_data_aws(self, match_id, raw_stats):
+    def save_data_aws(self, match_id, raw_stats, on_saved=None):
         '''
-        Saves the dictionary of information in an AWS S3 bucket in the cloud, named after the match ID.
+        Saves the dictionary of information in an AWS S3 bucket in the cloud, under the season and club and named after the match ID.
+        Records are buffered by self.storage and written in concurrent batches, so call self.storage.flush() when done.
+
         Args:
             match_id (int): The unique ID of each match.
+            on_saved (callable): Called once the record has been written to S3.
         '''
-        s3_client = boto3.client(
-            's3',
-            region_name = 'eu-west-2',
-            aws_access_key_id = os.environ['aws_access_key_id'],
-            aws_secret_access_key = os.environ['aws_secret_access_key']          
-            )
-        json_str = json.dumps(raw_stats)
-        s3_client.put_object(Bucket='premier-league-bucket', Key=match_id, Body=(bytes(json_str, encoding='utf-8')))
-        logging.info(f'{match_id} saved to AWS S3 bucket.')
+        self.storage.put(s3_key(self.year, match_id.split('-')[-1], match_id), raw_stats, on_saved)
 
     def _scrape_links(self):
-        '''Gets the list of links of all 38 fixtures of the club being inspected.'''
+        '''Gets the list of links of all 38 fixtures of the club being inspected, or all 380 fixtures of the season in league mode.'''
+        if self.backend is not None:
+            try:
+                link_list = self.backend.fixture_links(self.club, self.year)
+                if len(link_list) == 0:
+                    logging.error(f'This club was not in the premier league during the {self.year} season.')
+                    sys.exit()
+                return link_list
+            except BackendError as e:
+                logging.warning(f'{e} Falling back to Chrome.')
+        link_list = self._cached_fixture_links()
+        if link_list is not None:
+            if len(link_list) == 0:
+                logging.error(f'This club was not in the premier league during the {self.year} season.')
+                sys.exit()
+            return link_list
+        self._load_page(self.URL, 'results')
         self._accept_cookies()
         self._close_ad()
         self._select_season()
-        self._scroll_to_bottom()
-        seasons_with_22_teams = ['1992/93', '1993/94', '1994/95']
-        if self.year in seasons_with_22_teams:
-            correct_no_fixtures = 42
-        else:
-            correct_no_fixtures = 38
+        season = valid_inputs.season(self.year)
+        correct_no_fixtures = season.fixtures if self.club == valid_inputs.LEAGUE else season.club_fixtures
+        self._scroll_to_bottom(correct_no_fixtures)
         return self._get_fixture_link_list(correct_no_fixtures)
           
     def _scrape_stats(self, link):
-        '''Scrapes the statistics from each match and stores in a .json file
+        '''Scrapes the statistics from each match and stores in a .json file.
         
         Args:
             link (str): The URL of the fixture to be inspected.
         '''
-        self.driver.get(link)
-        logging.info(f'Scraping stats from {self._get_match_info(link)[5]}...')
-        WebDriverWait(self.driver, 10).until(EC.element_to_be_clickable((By.XPATH, '//li[@data-tab-index="2"]'))).click()
-        dict = self._create_dictionary(
-            self._get_match_info(link),
-            self._split_stats_list(self._get_match_info(link)[2])
-            )
-        match_id = self._get_match_info(link)[5]
-        self.save_data_aws(match_id, dict)
+        self._store_match(self._fetch_match(link))
+
+    def _store_match(self, record):
+        '''
+        Saves the match record of the club being inspected to the pipeline or S3. It is marked in the ledger only once
+        it is in the database: when the pipeline confirms its upsert, or when its club is loaded from S3 by _load_season.
+        A crash or failed write before then leaves it to be scraped again.
+        In league mode, a record is stored for both the home and the away club from the same page.
+
+        Args:
+            record (MatchRecord): The raw match information.
+        '''
+        if self.club == valid_inputs.LEAGUE:
+            clubs_short = [record.home, record.away]
+        else:
+            clubs_short = [valid_inputs.CLUBS[self.club]]
+        stats_list = self._split_stats_list(record.stats)
+        for club_short in clubs_short:
+            info = self._club_view(record, club_short)
+            logging.info(f'Scraping stats from {info[5]}...')
+            dict = self._create_dictionary(info, stats_list)
+            club = self._club_name(club_short, record)
+            stored = partial(self.ledger.record, self.year, record.match_no, club_short, dict)
+            if self.pipeline is not None:
+                self.pipeline.put(club, dict, on_written=stored)
+            else:
+                self.save_data_aws(info[5], dict, on_saved=partial(self._saved, club, info[5], stored))
+            self.clubs_scraped.add(club)
+
+    def _saved(self, club, match_id, stored):
+        '''Keeps the ledger entry of a record saved to S3 until its club is loaded into RDS.'''
+        self.unloaded.setdefault(club, {})[match_id] = stored
+
+    def _mark_loaded(self, club, match_ids=None):
+        '''
+        Puts the club's records saved to S3 in the ledger.
+
+        Args:
+            club (str): The club whose season has been loaded.
+            match_ids (iterable): Only the records with these Match ids are put in the ledger, e.g. those left once
+                clean_frame has dropped the matches outside the season. Every record is if None.
+        '''
+        match_ids = None if match_ids is None else set(match_ids)
+        for match_id, stored in self.unloaded.pop(club, {}).items():
+            if match_ids is None or match_id in match_ids:
+                stored()
+            else:
+                logging.error(f'{match_id} was not loaded into RDS, so it is left to be scraped again.')
+
+    def _club_name(self, club_short, record):
+        '''
+        Looks up the name of a club from its shortened name. A club not in valid_inputs.CLUBS, e.g. one newly promoted,
+        is stored under the name shown on the match page, or its shortened name if none was read.
+
+        Args:
+            club_short (str): The shortened name of the club.
+            record (MatchRecord): The match the club played in.
+
+        Returns:
+            str
+        '''
+        if club_short in valid_inputs.CLUB_NAMES:
+            return valid_inputs.CLUB_NAMES[club_short]
+        club = (record.home_name if club_short == record.home else record.away_name) or club_short
+        if club not in self.unlisted_clubs:
+            logging.warning(f'{club_short} is not in valid_inputs.CLUBS, so its matches are stored under {club}.')
+            self.unlisted_clubs[club] = club_short
+        return club
+
+    def _fetch_match(self, link):
+        '''
+        Gets the raw match information from the backend, or from the stats tab in Chrome if there is no backend or it fails.
+        The source of the stats page is kept in the page cache and parsed again from there the next time,
+        so a change to parse_match_page applies to cached pages too.
+
+        Args:
+            link (str): The URL of the fixture to be inspected.
+
+        Returns:
+            MatchRecord: The raw match information.
+
+        Raises:
+            CacheMiss: If the match is not cached in offline mode. It is never fetched live.
+        '''
+        if self.backend is not None:
+            try:
+                with EXTRACTION.labels('backend').time():
+                    return self.backend.match_record(link, self.year)
+            except BackendError as e:
+                logging.warning(f'{e} Falling back to Chrome.')
+        stats_url = cache_url(link, {'tab': 'stats'})
+        if self.cache is not None:
+            content = self.cache.get(stats_url, self.year)
+            if content is not None:
+                try:
+                    return self._match_record(link, parse_match_page(content.decode('utf-8')))
+                except IncompletePage as e:
+                    # Parsing the same bytes again would fail again, so the page is loaded afresh instead
+                    logging.warning(f'The cached page of {link} cannot be read: {e}')
+                    if self.cache.offline:
+                        raise CacheMiss(f'The cached page of {link} cannot be read.') from e
+            elif self.cache.offline:
+                raise CacheMiss(f'{link} is not in the page cache.')
+        with EXTRACTION.labels('chrome').time():
+            self._load_page(link, 'match')
+            self._wait_until(EC.element_to_be_clickable((By.XPATH, '//li[@data-tab-index="2"]')), 'stats_tab').click()
+            source = self._read_match_page()
+            record = self._match_record(link, parse_match_page(source))
+        if self.cache is not None:
+            # Only full-time scores are read, so the match is over and the page will not change
+            self.cache.put(stats_url, self.year, source.encode('utf-8'), pinned=True)
+        return record
+
+    def _scrape_stats_with_retry(self, link):
+        '''
+        Scrapes a match, reloading and trying again if the page fails to load, times out or is read part-rendered.
+        Any other error, e.g. a bug, fails the link at once without a retry, so one bad match never stops the season or a worker.
+
+        Args:
+            link (str): The URL of the fixture to be inspected.
+
+        Returns:
+            bool: True if the match was scraped, False if it could not be.
+        '''
+        for attempt in range(1, self.max_retries + 1):
+            if attempt > 1:
+                RETRIES.labels('match').inc()
+            try:
+                self._scrape_stats(link)
+                return True
+            except CacheMiss as e:
+                logging.error(f'{e} Offline, so it is not fetched.')
+                return False
+            except (WebDriverException, BackendError, IncompletePage) as e:
+                logging.warning(f'Attempt {attempt}/{self.max_retries} at {link} failed: {e!r}')
+            except Exception:
+                logging.exception(f'Could not scrape {link}.')
+                return False
+        logging.error(f'Giving up on {link} after {self.max_retries} attempts.')
+        return False
+
+    def _scrape_worker(self, link_queue, failed, worker_id):
+        '''
+        Takes links off the shared queue until it is empty, scraping each one in the worker's own browser.
+        The browser is opened once and reused for every match the worker handles.
+
+        Args:
+            link_queue (queue.Queue): The links still to be scraped.
+            failed (list): Shared list the links that could not be scraped are appended to.
+            worker_id (int): The number of the worker, from 1.
+        '''
+        worker = PremierLeagueScraper(driver=None, max_retries=self.max_retries, backend=self.backend, storage=self.storage,
+            ledger=self.ledger, waits=self.waits, browser=self.browser, cache=self.cache)
+        worker.worker_id = worker_id
+        worker.club = self.club
+        worker.year = self.year
+        worker.clubs_scraped = self.clubs_scraped
+        worker.unlisted_clubs = self.unlisted_clubs
+        worker.unloaded = self.unloaded
+        worker.pipeline = self.pipeline
+        try:
+            while True:
+                try:
+                    link = link_queue.get_nowait()
+                except queue.Empty:
+                    return
+                if not worker._scrape_stats_with_retry(link):
+                    failed.append(link)
+        finally:
+            worker.close()
+
+    def _scrape_stats_parallel(self, links):
+        '''
+        Scrapes the matches using a pool of headless browsers, at most self.workers running at once.
+
+        Args:
+            links (list): The URLs of the fixtures to be inspected.
+
+        Returns:
+            list: The links that could not be scraped.
+        '''
+        logging.info(f'Scraping {len(links)} matches with {self.workers} workers...')
+        link_queue = queue.Queue()
+        for link in links:
+            link_queue.put(link)
+        failed = []
+        threads = [
+            threading.Thread(target=self._scrape_worker, args=(link_queue, failed, worker_id))
+            for worker_id in range(1, min(self.workers, len(links)) + 1)
+            ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return failed
 
     def _display_graphs(self):
         '''Displays the graphs created in the CreateGraph class in the graph.py file.'''
@@ -264,33 +716,94 @@ class PremierLeagueScraper:
             logging.error('ValueError: This is probably because full match data is not available for seasons prior to 2006/07.')
             sys.exit()
 
-    def run_crawler(self):
-        '''Gets the list of 38 links to each fixture, goes through them one by one and extracts all the data required.'''
-        self._user_inputs()
-        if f'{self.club}-{self.year[-5:-3]}{self.year[-2:]}' not in RDS._prevent_rescraping():
-            self.driver.get(self.URL)
-            for link in self._scrape_links():
-                self._scrape_stats(f'https:{link}')
-            RDS.upload_to_sql(self.club, self.year)
-            self._display_graphs()
-            self.driver.quit()
-            logging.info('Program successfully finished.')
+    def _unscraped(self, links):
+        '''
+        Drops the links to matches the ledger shows have already been scraped.
+        In league mode a match is only dropped once it has been scraped for both clubs.
+
+        Args:
+            links (list): The URLs of the fixtures.
+
+        Returns:
+            list: The URLs still to be scraped.
+        '''
+        scraped = self.ledger.scraped(self.year)
+        if self.club == valid_inputs.LEAGUE:
+            return [link for link in links if len(scraped.get(link[-5:], ())) < 2]
+        club_short = valid_inputs.CLUBS[self.club]
+        return [link for link in links if club_short not in scraped.get(link[-5:], ())]
+
+    def _scrape_season(self):
+        '''
+        Gets the links to each fixture and scrapes the ones not already in the ledger, in parallel if more than one worker is set.
+
+        Returns:
+            int: The number of matches that were scraped.
+        '''
+        all_links = [f'https:{link}' for link in self._scrape_links()]
+        links = self._unscraped(all_links)
+        logging.info(f'{len(all_links) - len(links)} of {len(all_links)} fixtures already scraped.')
+        if self.workers > 1:
+            failed = self._scrape_stats_parallel(links)
         else:
+            failed = [link for link in links if not self._scrape_stats_with_retry(link)]
+        if failed:
+            logging.error(f'{len(failed)} matches could not be scraped: {failed}')
+        return len(links) - len(failed)
+
+    def _load_season(self, clubs):
+        '''
+        Loads the scraped season into RDS. In streaming mode the rows are already there, so this only waits for the last batch.
+        Each club's records are only put in the ledger once its load has committed, so a failed load is scraped and loaded again on the next run.
+        The season is also exported to Parquet if the parquet_dir environment variable is set.
+
+        Args:
+            clubs (list): The clubs whose season has been scraped.
+        '''
+        if self.pipeline is not None:
+            self.pipeline.close()
+        if not self.storage.flush():
+            logging.error(f'{len(self.storage.failed)} matches could not be saved to S3: {self.storage.failed}')
+        if self.pipeline is None:
+            for club in clubs:
+                df = RDS.upload_to_sql(club, self.year, self.unlisted_clubs.get(club))
+                self._mark_loaded(club, df['Match id'])
+        if 'parquet_dir' in os.environ:
+            export.export_parquet(os.environ['parquet_dir'], clubs=clubs, seasons=[self.year])
+
+    def run_crawler(self, club=None, year=None, graphs=True):
+        '''
+        Gets the list of 38 links to each fixture and extracts all the data required from the ones not scraped before.
+        A club-season uploaded before the ledger existed is not scraped again.
+
+        Args:
+            club (str): The club to scrape, or valid_inputs.LEAGUE. Read from the club environment variable if None.
+            year (str): The season to scrape, e.g. '2021/22'. Read from the season environment variable if None.
+            graphs (bool): Whether to display the graphs of a single club's season once it is loaded.
+        '''
+        self._user_inputs(club, year)
+        if (self.club != valid_inputs.LEAGUE
+                and RDS.season_exists(self.club, self.year)
+                and not self.ledger.has_season(self.year, valid_inputs.CLUBS[self.club])):
             logging.warning('RDS database already contains data on this club from this season.')
+        elif self._scrape_season() > 0:
+            clubs = sorted(self.clubs_scraped) if self.club == valid_inputs.LEAGUE else [self.club]
+            self._load_season(clubs)
+        else:
+            logging.info('No new matches to scrape.')
+            if self.pipeline is not None:
+                self.pipeline.close()
+        if graphs and self.club != valid_inputs.LEAGUE:
             self._display_graphs()
-            self.driver.quit()
-            logging.info('Program successfully finished.')
+        self._quit_driver()
+        if self.waits.stats:
+            logging.info(f'Time spent waiting for the browser:\n{self.waits.report()}')
+        logging.info('Program successfully finished.')
     
 
 if __name__ == '__main__':
-    options = Options()
-    options.add_argument("--disable-gpu")
-    options.add_argument("--disable-extensions")
-    options.add_argument("--disable-infobars")
-    options.add_argument('--window-size=1920,1080')
-    options.add_argument("--disable-notifications")
-    options.add_argument('--headless')
-    options.add_argument('--no-sandbox')
-    options.add_argument('--disable-dev-shm-usage')
-    premierleague = PremierLeagueScraper(driver=webdriver.Chrome(options=options))
+    start_metrics_server()
+    cache = PageCache.from_env()
+    backend = HttpBackend(cache=cache) if os.environ.get('backend') == 'http' else None
+    premierleague = PremierLeagueScraper(driver=None, backend=backend, cache=cache)
     premierleague.run_crawler()
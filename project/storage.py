@@ -0,0 +1,201 @@
+import os
+import json
+import time
+import atexit
+import logging
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+import boto3
+from botocore.config import Config
+from botocore.exceptions import BotoCoreError, ClientError
+from metrics import RETRIES, S3_PUT
+
+logging.basicConfig(level = logging.INFO)
+
+
+def s3_client(max_pool_connections=10):
+    '''
+    Creates an S3 client. The endpoint can be pointed at a local stand-in such as MinIO with the s3_endpoint_url environment variable.
+
+    Args:
+        max_pool_connections (int): The number of connections kept open for reuse.
+
+    Returns:
+        botocore.client.S3
+    '''
+    return boto3.client(
+        's3',
+        region_name = 'eu-west-2',
+        aws_access_key_id = os.environ.get('aws_access_key_id'),
+        aws_secret_access_key = os.environ.get('aws_secret_access_key'),
+        endpoint_url = os.environ.get('s3_endpoint_url'),
+        config = Config(max_pool_connections=max_pool_connections)
+        )
+
+
+def s3_key(year, club_short, match_id):
+    '''
+    Builds the key a match record is saved under, partitioned by season and club so that
+    one club-season can be listed by prefix, e.g. '2021-22/CHE/66716-CHE'.
+
+    Args:
+        year (str): The season, e.g. '2021/22'.
+        club_short (str): The shortened name of the club.
+        match_id (str): The unique ID of the match.
+
+    Returns:
+        str
+    '''
+    return f'{s3_prefix(year, club_short)}{match_id}'
+
+
+def s3_prefix(year, club_short):
+    '''Returns the prefix all of a club's records from a season are saved under, e.g. '2021-22/CHE/'.'''
+    return f"{year.replace('/', '-')}/{club_short}/"
+
+
+def season_of(date_str):
+    '''
+    Works out which season a match was played in from its date. Seasons are taken to start in August.
+
+    Args:
+        date_str (str): Date in datetime format (%a %d %b %Y).
+
+    Returns:
+        str: The season, e.g. '2021/22'.
+    '''
+    played = datetime.strptime(date_str, '%a %d %b %Y')
+    start = played.year if played.month >= 8 else played.year - 1
+    return f'{start}/{str(start + 1)[-2:]}'
+
+
+def download_records(year, club_short, bucket='premier-league-bucket', workers=16, client=None):
+    '''
+    Lists only the objects under the club-season's prefix and downloads them concurrently.
+
+    Args:
+        year (str): The season, e.g. '2021/22'.
+        club_short (str): The shortened name of the club.
+
+    Returns:
+        list: The match records as dictionaries.
+    '''
+    client = client if client is not None else s3_client(max_pool_connections=workers)
+    keys = []
+    for page in client.get_paginator('list_objects_v2').paginate(Bucket=bucket, Prefix=s3_prefix(year, club_short)):
+        keys += [obj['Key'] for obj in page.get('Contents', [])]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(lambda key: json.loads(client.get_object(Bucket=bucket, Key=key)['Body'].read()), keys))
+
+
+def migrate_legacy_keys(bucket='premier-league-bucket', client=None):
+    '''
+    Moves records saved under the old flat match ID keys to the season/club/match layout.
+    Only needs to be run once; keys already containing a '/' are left alone.
+
+    Returns:
+        int: The number of objects moved.
+    '''
+    client = client if client is not None else s3_client()
+    moved = 0
+    for page in client.get_paginator('list_objects_v2').paginate(Bucket=bucket):
+        for obj in page.get('Contents', []):
+            if '/' in obj['Key']:
+                continue
+            record = json.loads(client.get_object(Bucket=bucket, Key=obj['Key'])['Body'].read())
+            new_key = s3_key(season_of(record['Date']), obj['Key'].split('-')[-1], obj['Key'])
+            client.copy_object(Bucket=bucket, Key=new_key, CopySource={'Bucket': bucket, 'Key': obj['Key']})
+            client.delete_object(Bucket=bucket, Key=obj['Key'])
+            logging.info(f"Moved {obj['Key']} to {new_key}.")
+            moved += 1
+    return moved
+
+
+class S3Writer:
+    '''
+    This class is used to save match records to S3 through one long-lived client. Records are buffered
+    and written concurrently once batch_size of them are waiting, and anything left is written at exit.
+
+    Attributes
+    ----------
+    bucket (str): The name of the S3 bucket.
+    batch_size (int): The number of buffered records that triggers a flush.
+    max_retries (int): The number of attempts made at each object before it is given up on.
+    backoff (float): Seconds waited before the first retry, doubling on each one after.
+    failed (list): The keys of the objects that could not be written.
+    '''
+
+    def __init__(self, bucket='premier-league-bucket', batch_size=20, workers=8, max_retries=5, backoff=0.5, client=None):
+        self.bucket = bucket
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.client = client if client is not None else s3_client(max_pool_connections=workers)
+        self.failed = []
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+        atexit.register(self.close)
+
+    def put(self, key, record, on_saved=None):
+        '''
+        Buffers a record to be saved as JSON under the given key.
+
+        Args:
+            key (str): The key of the object.
+            record (dict): The record to be saved.
+            on_saved (callable): Called with no arguments once the object has been written, and never if it could not be.
+        '''
+        with self._lock:
+            self._buffer.append((key, bytes(json.dumps(record), encoding='utf-8'), on_saved))
+            full = len(self._buffer) >= self.batch_size
+        if full:
+            self.flush()
+
+    def _put_with_retry(self, key, body, on_saved=None):
+        '''Writes a single object, backing off exponentially between attempts, and calls on_saved once it is written.'''
+        for attempt in range(self.max_retries):
+            if attempt:
+                RETRIES.labels('s3_put').inc()
+            try:
+                with S3_PUT.time():
+                    self.client.put_object(Bucket=self.bucket, Key=key, Body=body)
+                logging.info(f'{key} saved to AWS S3 bucket.')
+                if on_saved is not None:
+                    on_saved()
+                return True
+            except (BotoCoreError, ClientError) as e:
+                logging.warning(f'Attempt {attempt + 1}/{self.max_retries} at saving {key} failed: {e}')
+                if attempt + 1 < self.max_retries:
+                    time.sleep(self.backoff * 2 ** attempt)
+        logging.error(f'Giving up on saving {key} after {self.max_retries} attempts.')
+        self.failed.append(key)
+        return False
+
+    def flush(self):
+        '''
+        Writes every buffered record concurrently and waits for them all to finish.
+
+        Returns:
+            bool: True if every record was written.
+        '''
+        with self._lock:
+            batch, self._buffer = self._buffer, []
+        return all(self._executor.map(lambda item: self._put_with_retry(*item), batch))
+
+    def close(self):
+        '''Flushes anything still buffered and stops the worker threads. Safe to call more than once.'''
+        self.flush()
+        self._executor.shutdown(wait=True)
+        atexit.unregister(self.close)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+if __name__ == '__main__':
+    logging.info(f'{migrate_legacy_keys()} objects moved to the season/club/match layout.')
@@ -0,0 +1,116 @@
+import os
+import time
+import tempfile
+import unittest
+from unittest import mock
+import pandas as pd
+from prometheus_client import REGISTRY
+import RDS
+import export
+from schema import clean_frame
+from test_pipeline import match_record
+
+
+class RDSConnectTestCase(unittest.TestCase):
+    def setUp(self):
+        '''Points the engine at a local SQLite database in place of RDS.'''
+        self.directory = tempfile.TemporaryDirectory()
+        url = f"sqlite:///{os.path.join(self.directory.name, 'test.db')}"
+        self.environ = mock.patch.dict(os.environ, {'database_url': url})
+        self.environ.start()
+        RDS.dispose_engine()
+
+    def test_engine_reused(self):
+        '''Tests every call returns the same engine, so its pool is shared.'''
+        self.assertIs(RDS.rds_connect(), RDS.rds_connect())
+        self.assertEqual(str(RDS.rds_connect().url), os.environ['database_url'])
+
+    def test_pool_stats(self):
+        '''Tests checkouts are counted and released.'''
+        before = RDS.pool_stats()['checkouts']
+        with RDS.rds_connect().connect() as connection:
+            connection.execute(RDS.text('SELECT 1'))
+            self.assertEqual(RDS.pool_stats()['checked_out'], 1)
+        self.assertEqual(RDS.pool_stats()['checkouts'], before + 1)
+        self.assertEqual(RDS.pool_stats()['checked_out'], 0)
+
+    def test_checkout_wait(self):
+        '''Tests the time a checkout waits for a connection is measured, and exported with the checked-out gauge.'''
+        engine = RDS.rds_connect()
+        RDS.event.listen(engine, 'connect', lambda *args: time.sleep(0.1))  # A slow database to connect to
+        waits = REGISTRY.get_sample_value('scraper_db_checkout_wait_seconds_count')
+        checked_out = REGISTRY.get_sample_value('scraper_db_connections_checked_out')
+        with engine.connect():
+            self.assertEqual(REGISTRY.get_sample_value('scraper_db_connections_checked_out'), checked_out + 1)
+        self.assertEqual(REGISTRY.get_sample_value('scraper_db_connections_checked_out'), checked_out)
+        self.assertEqual(REGISTRY.get_sample_value('scraper_db_checkout_wait_seconds_count'), waits + 1)
+        self.assertGreaterEqual(RDS.pool_stats()['max_wait_seconds'], 0.1)
+
+    def tearDown(self):
+        RDS.dispose_engine()
+        self.environ.stop()
+        self.directory.cleanup()
+
+
+class MatchStatsTestCase(unittest.TestCase):
+    def setUp(self):
+        '''Uses a local SQLite database in place of RDS.'''
+        self.directory = tempfile.TemporaryDirectory()
+        self.engine = RDS.create_engine(f"sqlite:///{os.path.join(self.directory.name, 'test.db')}")
+
+    def _upload(self, club, year, records):
+        RDS.create_season_view(club, year, self.engine)
+        RDS.upsert_matches(clean_frame(records, year), club, year, self.engine)
+
+    def test_season_view(self):
+        '''Tests each club-season's view shows only its own rows, with the columns of the old tables.'''
+        self._upload('Chelsea', '2021/22', [match_record(66716, 2), match_record(66715, 1)])
+        self._upload('Watford', '2021/22', [match_record(66716, 1)])
+        df = pd.read_sql('SELECT * FROM "Chelsea-2122"', self.engine)
+        self.assertEqual(list(df.columns), RDS.COLUMNS)
+        self.assertEqual(len(df), 2)
+
+    def test_legacy_table_moved(self):
+        '''Tests a table from before match_stats is moved into it and replaced by a view.'''
+        clean_frame([match_record(66716, 2)], '2021/22').to_sql('Chelsea-2122', self.engine, index=False)
+        RDS.create_season_view('Chelsea', '2021/22', self.engine)
+        self.assertNotIn('Chelsea-2122', RDS.inspect(self.engine).get_table_names())
+        self.assertEqual(len(pd.read_sql('SELECT * FROM "Chelsea-2122"', self.engine)), 1)
+
+    def test_second_upload(self):
+        '''Tests uploading a club-season again replaces its view and tops up its rows, without mistaking the view for a legacy table.'''
+        self._upload('Chelsea', '2021/22', [match_record(66716, 2)])
+        self._upload('Chelsea', '2021/22', [match_record(66716, 3), match_record(66715, 1)])
+        df = pd.read_sql('SELECT * FROM "Chelsea-2122"', self.engine)
+        self.assertEqual(len(df), 2)
+        self.assertEqual(sorted(df['Goals scored']), [1, 3])
+        self.assertIn('Chelsea-2122', RDS.inspect(self.engine).get_view_names())
+
+    def test_season_trends(self):
+        '''Tests statistics are averaged per club and season.'''
+        self._upload('Chelsea', '2021/22', [match_record(66716, 2), match_record(66715, 1)])
+        self._upload('Chelsea', '2020/21', [dict(match_record(59266, 4), Date='Sat 12 Sep 2020')])
+        trends = RDS.season_trends(['Goals scored'], clubs=['Chelsea'], engine=self.engine)
+        self.assertEqual(trends['Season'].tolist(), ['2020/21', '2021/22'])
+        self.assertEqual(trends['Goals scored'].tolist(), [4.0, 1.5])
+        self.assertEqual(trends['Games'].tolist(), [1, 2])
+
+    def test_parquet_round_trip(self):
+        '''Tests a season exported to Parquet loads back with the same rows and numeric types.'''
+        self._upload('Chelsea', '2021/22', [match_record(66716, 2), match_record(66715, 1)])
+        self._upload('Watford', '2021/22', [match_record(66716, 1)])
+        root = os.path.join(self.directory.name, 'parquet-data')
+        self.assertEqual(export.export_parquet(root, engine=self.engine), 3)
+        df = export.load_parquet(root, clubs=['Chelsea'], seasons=['2021/22'])
+        self.assertEqual(len(df), 2)
+        self.assertEqual(set(df['Season']), {'2021/22'})
+        self.assertEqual(df['Shots'].dtype, 'int16')
+        self.assertEqual(df['Possession %'].dtype, 'float64')
+
+    def tearDown(self):
+        self.engine.dispose()
+        self.directory.cleanup()
+
+
+if __name__ == '__main__':
+    unittest.main()
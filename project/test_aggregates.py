@@ -0,0 +1,49 @@
+import unittest
+import pandas as pd
+from sqlalchemy import create_engine, event
+from aggregates import SERIES_COLUMNS, season_data, season_summary
+
+
+class SeasonSummaryTestCase(unittest.TestCase):
+    def setUp(self):
+        '''Creates a small season table in an in-memory SQLite database.'''
+        self.engine = create_engine('sqlite://')
+        pd.DataFrame({
+            'Location': ['Stamford Bridge, London'] * 3 + ['Anfield, Liverpool', 'Emirates Stadium, London'],
+            'Result': ['Win', 'Draw', 'Win', 'Loss', 'Win'],
+            'Possession %': [60.0, 45.0, 55.0, 52.0, 40.0],
+            'Goals scored': [2, 1, 3, 0, 1], 'Goals against': [0, 1, 1, 2, 0],
+            'Shots': [20, 10, 15, 8, 6], 'Shots on target': [8, 4, 6, 2, 3], 'Passes': [600, 500, 550, 450, 400],
+            'Fouls conceded': [10, 12, 8, 14, 9], 'Offsides': [1, 2, 0, 3, 1],
+            'Date': ['2021-08-14', '2021-09-11', '2021-08-21', '2021-08-28', '2021-09-18'],
+            'Yellow cards': [1, 2, 0, 3, 1], 'Red cards': [0, 0, 0, 1, 0]
+            }).to_sql('Chelsea-2122', self.engine, index=False)
+
+    def test_season_summary(self):
+        '''Tests the aggregates computed in the database match those worked out by hand.'''
+        summary = season_summary('Chelsea-2122', self.engine)
+        self.assertEqual(summary.home_stadium, 'Stamford Bridge, London')
+        self.assertEqual(summary.results, [3, 1, 1])
+        self.assertEqual(summary.possession_results, [2, 0, 1])
+        self.assertEqual((summary.home['games'], summary.home['wins']), (3, 2))
+        self.assertEqual((summary.away['games'], summary.away['wins']), (2, 1))
+        self.assertAlmostEqual(summary.home['Goals scored'], 2.0)
+        self.assertAlmostEqual(summary.away['Passes'], 425.0)
+
+    def test_season_data(self):
+        '''Tests the figure's aggregates and match-by-match columns come back from a single query.'''
+        queries = []
+        event.listen(self.engine, 'before_cursor_execute', lambda *args: queries.append(args[2]))
+        summary, df = season_data('Chelsea-2122', self.engine)
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(summary, season_summary('Chelsea-2122', self.engine))
+        self.assertEqual(list(df.columns), SERIES_COLUMNS)
+        self.assertEqual(df['Date'].tolist(), ['2021-08-14', '2021-08-21', '2021-08-28', '2021-09-11', '2021-09-18'])
+        self.assertEqual(df['Goals scored'].tolist(), [2, 3, 0, 1, 1])
+
+    def tearDown(self):
+        self.engine.dispose()
+
+
+if __name__ == '__main__':
+    unittest.main()
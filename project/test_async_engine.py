@@ -0,0 +1,195 @@
+import os
+import time
+import asyncio
+import tempfile
+import threading
+import unittest
+from functools import partial
+from unittest import mock
+from http.server import ThreadingHTTPServer
+import async_engine
+from async_engine import AsyncEngine, AsyncHttpBackend, TokenBucket, scrape_async
+from backends import BackendError
+from ledger import ScrapeLedger
+from page_cache import PageCache
+from scraper import PremierLeagueScraper
+import pandas as pd
+import RDS
+from test_backends import PAGES, RecordedPageHandler
+
+
+class SlowPageHandler(RecordedPageHandler):
+    '''Serves the recorded pages slowly, keeping count of the most requests open at once.'''
+    lock = threading.Lock()
+    open_requests = 0
+    most_open = 0
+
+    def do_GET(self):
+        cls = type(self)
+        with cls.lock:
+            cls.open_requests += 1
+            cls.most_open = max(cls.most_open, cls.open_requests)
+        time.sleep(0.05)
+        try:
+            super().do_GET()
+        finally:
+            with cls.lock:
+                cls.open_requests -= 1
+
+
+class MemoryStorage:
+    '''Keeps the records in a dictionary in place of the S3 bucket.'''
+
+    def __init__(self):
+        self.records = {}
+        self.failed = []
+
+    def put(self, key, record, on_saved=None):
+        self.records[key] = record
+        if on_saved is not None:
+            on_saved()
+
+    def flush(self):
+        return True
+
+    def close(self):
+        pass
+
+
+class FailingStorage(MemoryStorage):
+    '''Loses every record, as when every S3 write fails.'''
+
+    def put(self, key, record, on_saved=None):
+        self.failed.append(key)
+
+
+class AsyncEngineTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        '''Starts a local server replaying the recorded pages.'''
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), partial(SlowPageHandler, directory=PAGES))
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.api_url = f'http://127.0.0.1:{cls.server.server_port}/football'
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def _run(self, coroutine_function, **options):
+        '''Runs a coroutine function with a backend pointed at the local server.'''
+        async def main():
+            async with AsyncHttpBackend(api_url=self.api_url, backoff=0, **options) as backend:
+                return await coroutine_function(backend)
+        return asyncio.run(main())
+
+    def test_token_bucket(self):
+        '''Tests that once the burst is used up, tokens are handed out no faster than the rate.'''
+        async def take(bucket, n):
+            start = time.perf_counter()
+            await asyncio.gather(*(bucket.acquire() for _ in range(n)))
+            return time.perf_counter() - start
+        self.assertGreaterEqual(asyncio.run(take(TokenBucket(20, capacity=2), 8)), 0.29)
+
+    def test_fixture_links_and_match_record(self):
+        '''Tests the async backend reads the same pages as the HTTP backend.'''
+        async def fetch(backend):
+            return await backend.fixture_links('Chelsea', '2021/22'), await backend.match_record('https://www.premierleague.com/match/66716')
+        links, record = self._run(fetch, requests_per_second=100)
+        self.assertEqual(links, ['//www.premierleague.com/match/66350', '//www.premierleague.com/match/66716'])
+        self.assertEqual((record.home, record.away, record.home_score, record.away_score), ('CHE', 'WAT', 2, 1))
+
+    def test_missing_page(self):
+        '''Tests a page that is not there raises BackendError.'''
+        with self.assertRaises(BackendError):
+            self._run(lambda backend: backend.match_record('https://www.premierleague.com/match/12345'), requests_per_second=100)
+
+    def test_malformed_list(self):
+        '''Tests a list page with no content or page count raises BackendError rather than failing the whole job.'''
+        async def fetch(backend):
+            with mock.patch.object(backend, '_get', return_value={'content': []}):
+                return await backend.fixture_links('Chelsea', '2021/22')
+        with self.assertRaises(BackendError):
+            self._run(fetch, requests_per_second=100)
+
+    def test_per_host_cap(self):
+        '''Tests no more than per_host requests are open to the server at once.'''
+        SlowPageHandler.most_open = 0
+        async def fetch(backend):
+            await asyncio.gather(*(backend.match_record('https://www.premierleague.com/match/66716') for _ in range(8)))
+        self._run(fetch, requests_per_second=100, per_host=2)
+        self.assertEqual(SlowPageHandler.most_open, 2)
+
+    def test_scrape_season(self):
+        '''Tests the matches that can be fetched are stored and put in the ledger, and are not scraped again.'''
+        storage = MemoryStorage()
+        ledger = ScrapeLedger(':memory:')
+        async def scrape(backend):
+            engine = AsyncEngine(backend, storage=storage, ledger=ledger, load=False)
+            first = await engine.run([('Chelsea', '2021/22'), ('Wigan', '2021/22')])
+            second = await engine.run([('Chelsea', '2021/22')])
+            engine.close()
+            return first, second
+        first, second = self._run(scrape, requests_per_second=100)
+        self.assertEqual(first, {('Chelsea', '2021/22'): 1, ('Wigan', '2021/22'): None})  # 66350 is not recorded
+        self.assertEqual(list(storage.records), ['2021-22/CHE/66716-CHE'])
+        self.assertEqual(second, {('Chelsea', '2021/22'): 0})
+
+    def test_failed_write_not_in_ledger(self):
+        '''Tests a match whose record could not be saved is left out of the ledger, so the next run scrapes it again.'''
+        ledger = ScrapeLedger(':memory:')
+        async def scrape(backend):
+            engine = AsyncEngine(backend, storage=FailingStorage(), ledger=ledger, load=False)
+            first = await engine.run([('Chelsea', '2021/22')])
+            second = await engine.run([('Chelsea', '2021/22')])
+            return first, second
+        first, second = self._run(scrape, requests_per_second=100)
+        self.assertEqual(ledger.scraped('2021/22'), {})
+        self.assertEqual(second, first)
+        ledger.close()
+
+    def test_scraper_shares_cache_and_closes(self):
+        '''Tests the scraper built for a season uses the engine's page cache, opens no cache of its own and is closed afterwards.'''
+        ledger = ScrapeLedger(':memory:')
+        with tempfile.TemporaryDirectory() as directory, \
+                mock.patch.dict(os.environ, {'page_cache_dir': os.path.join(directory, 'other')}), \
+                mock.patch.object(PremierLeagueScraper, 'close', autospec=True, side_effect=PremierLeagueScraper.close) as close:
+            cache = PageCache(os.path.join(directory, 'cache'))
+            async def scrape(backend):
+                return await AsyncEngine(backend, storage=MemoryStorage(), ledger=ledger, load=False).run([('Chelsea', '2021/22')])
+            self.assertEqual(self._run(scrape, requests_per_second=100, cache=cache), {('Chelsea', '2021/22'): 1})
+            scraper = close.call_args.args[0]
+            self.assertIs(scraper.cache, cache)
+            self.assertFalse(os.path.exists(os.path.join(directory, 'other')))
+            cache.close()
+        ledger.close()
+
+    def test_scrape_async_validates_jobs(self):
+        '''Tests an unknown club or season stops scrape_async before the backend is opened or any job is run.'''
+        for job in [('Chelsea', '2021/22'), ('Chelsee', '2021/22')], [('Chelsea', '2021-22')]:
+            with mock.patch.object(async_engine, 'AsyncHttpBackend') as backend:
+                with self.assertRaises(ValueError):
+                    asyncio.run(scrape_async(job))
+                backend.assert_not_called()
+
+    def test_stream_sink(self):
+        '''Tests streamed records reach the database and the S3 archive, and are only then put in the ledger.'''
+        storage = MemoryStorage()
+        ledger = ScrapeLedger(':memory:')
+        with tempfile.TemporaryDirectory() as directory, \
+                mock.patch.dict(os.environ, {'database_url': f"sqlite:///{os.path.join(directory, 'test.db')}"}):
+            RDS.dispose_engine()
+            async def scrape(backend):
+                engine = AsyncEngine(backend, storage=storage, ledger=ledger, stream=True)
+                return await engine.run([('Chelsea', '2021/22')])
+            self.assertEqual(self._run(scrape, requests_per_second=100), {('Chelsea', '2021/22'): 1})
+            df = pd.read_sql('SELECT * FROM "Chelsea-2122"', RDS.rds_connect())
+            RDS.dispose_engine()
+        self.assertEqual(df['Match id'].tolist(), ['66716-CHE'])
+        self.assertEqual(list(storage.records), ['2021-22/CHE/66716-CHE'])
+        self.assertEqual(ledger.scraped('2021/22'), {'66716': {'CHE'}})
+        ledger.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from backends import BackendError, HttpBackend
+from page_cache import CacheMiss, PageCache
+
+PAGES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'test_pages')
+
+
+class RecordedPageHandler(SimpleHTTPRequestHandler):
+    '''Serves the recorded API responses in test_pages, ignoring the query string.'''
+
+    def translate_path(self, path):
+        return super().translate_path(path.split('?')[0] + '.json')
+
+    def log_message(self, format, *args):
+        pass
+
+
+class HttpBackendTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        '''Starts a local server replaying the recorded pages.'''
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), partial(RecordedPageHandler, directory=PAGES))
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    def setUp(self):
+        self.backend = HttpBackend(api_url=f'http://127.0.0.1:{self.server.server_port}/football')
+
+    def test_fixture_links(self):
+        '''Tests the links are in the same format as the data-href attributes on the results page.'''
+        links = self.backend.fixture_links('Chelsea', '2021/22')
+        self.assertEqual(links, ['//www.premierleague.com/match/66350', '//www.premierleague.com/match/66716'])
+
+    def test_fixture_links_club_not_in_season(self):
+        '''Tests that a club not in the league that season has no fixtures.'''
+        self.assertEqual(self.backend.fixture_links('Wigan', '2021/22'), [])
+
+    def test_match_record(self):
+        '''Tests the match record matches what is shown on the match stats page.'''
+        record = self.backend.match_record('https://www.premierleague.com/match/66716')
+        self.assertEqual(record.match_no, '66716')
+        self.assertEqual(record.date, 'Sun 22 May 2022')
+        self.assertEqual(record.stadium, 'Stamford Bridge, London')
+        self.assertEqual((record.home, record.away, record.home_score, record.away_score), ('CHE', 'WAT', 2, 1))
+        self.assertEqual(record.stats[0], '73.3 Possession % 26.7')
+        self.assertEqual(len(record.stats), 11)
+
+    def test_missing_page(self):
+        '''Tests that a page that cannot be fetched raises BackendError so the scraper falls back to Chrome.'''
+        with self.assertRaises(BackendError):
+            self.backend.match_record('https://www.premierleague.com/match/12345')
+
+    def test_malformed_list(self):
+        '''Tests a list page with no content or page count raises BackendError so the scraper falls back to Chrome.'''
+        for payload in [{'content': []}, {'pageInfo': {'numPages': 1}}, []]:
+            with mock.patch.object(self.backend, '_get', return_value=payload), self.assertRaises(BackendError):
+                self.backend.fixture_links('Chelsea', '2021/22')
+
+    def test_offline_replay(self):
+        '''Tests pages fetched once are replayed from the page cache with no server, and a page never fetched is an error.'''
+        with tempfile.TemporaryDirectory() as directory:
+            self.backend.cache = PageCache(directory)
+            fetched = self.backend.match_record('https://www.premierleague.com/match/66716', '2021/22')
+            self.backend.cache.close()
+            offline = HttpBackend(api_url=self.backend.api_url, cache=PageCache(directory, offline=True))
+            with mock.patch.object(offline.session, 'get') as get:
+                self.assertEqual(offline.match_record('https://www.premierleague.com/match/66716', '2021/22'), fetched)
+                with self.assertRaises(CacheMiss):
+                    offline.match_record('https://www.premierleague.com/match/66350', '2021/22')
+            get.assert_not_called()
+            offline.cache.close()
+            offline.session.close()
+
+    def tearDown(self):
+        self.backend.session.close()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+
+if __name__ == '__main__':
+    unittest.main()
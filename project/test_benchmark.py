@@ -0,0 +1,78 @@
+import os
+import json
+import tempfile
+import unittest
+import requests
+from benchmark import BROWSER_STAGES, HERE, STAGES, _serve, compare, missing_stages, synthesise_pages
+
+
+class SynthesisedPagesTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        synthesise_pages(cls.directory.name, 'Chelsea', '2021/22')
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.directory.cleanup()
+
+    def test_season_of_fixtures(self):
+        '''Tests a full 20-team season is on the results page, with a match page for each of the club's 38 matches.'''
+        with open(os.path.join(self.directory.name, 'results.html')) as f:
+            results = f.read()
+        self.assertEqual(results.count('data-home='), 380)
+        self.assertEqual(results.count('data-home="Chelsea"') + results.count('data-away="Chelsea"'), 38)
+        self.assertEqual(len(os.listdir(os.path.join(self.directory.name, 'match'))), 38)
+
+    def test_committed_pages(self):
+        '''Tests the committed benchmark pages are the ones synthesised, so every checkout times the same pages.'''
+        for page in ['results.html', 'match/66000.html']:
+            with open(os.path.join(HERE, 'benchmark_pages', page)) as committed, open(os.path.join(self.directory.name, page)) as synthesised:
+                self.assertEqual(committed.read(), synthesised.read())
+        self.assertEqual(len(os.listdir(os.path.join(HERE, 'benchmark_pages', 'match'))), 38)
+
+    def test_pages_served(self):
+        '''Tests the results and match pages are served at the same paths as on premierleague.com.'''
+        with _serve(self.directory.name) as base:
+            self.assertIn('fixtures__matches-list', requests.get(f'{base}/results').text)
+            self.assertIn('matchCentreStatsContainer', requests.get(f'{base}/match/66000').text)
+            self.assertEqual(requests.get(f'{base}/match/1').status_code, 404)
+
+
+class CompareTestCase(unittest.TestCase):
+    def test_committed_baseline(self):
+        '''Tests the committed baseline holds the calibration and every stage that runs without Chrome.'''
+        with open(os.path.join(HERE, 'benchmark_baseline.json')) as f:
+            baseline = json.load(f)
+        self.assertIn('calibration', baseline)
+        self.assertLessEqual(set(STAGES) - set(BROWSER_STAGES), set(baseline))
+        self.assertLessEqual(set(baseline), set(STAGES) | {'calibration'})
+
+    def test_regressions(self):
+        '''Tests only stages slower than the baseline by more than the tolerance are reported.'''
+        baseline = {'season_select': 1.0, 'link_harvest': 2.0, 'sql_load': 0.5}
+        timings = {'season_select': 1.1, 'link_harvest': 3.0, 'sql_load': 0.2, 'graph_render': 9.0}
+        self.assertEqual(compare(timings, baseline, tolerance=0.2), [('link_harvest', 2.0, 3.0)])
+
+    def test_stage_tolerances(self):
+        '''Tests each stage is held to its own tolerance unless one is given for all of them.'''
+        baseline = {'scroll_load': 1.0, 'sql_load': 1.0}
+        timings = {'scroll_load': 1.4, 'sql_load': 1.4}
+        self.assertEqual(compare(timings, baseline), [('sql_load', 1.0, 1.4)])
+
+    def test_calibrated(self):
+        '''Tests the baseline is scaled by the calibration, so a slower machine is not reported as a regression.'''
+        baseline = {'calibration': 0.5, 'sql_load': 0.2, 'graph_render': 1.0}
+        timings = {'calibration': 1.0, 'sql_load': 0.38, 'graph_render': 3.0}
+        self.assertEqual(compare(timings, baseline), [('graph_render', 2.0, 3.0)])
+
+    def test_missing_stages(self):
+        '''Tests every stage timed without a baseline entry is reported, so it cannot go unchecked.'''
+        baseline = {'calibration': 0.5, 'sql_load': 0.2}
+        timings = {'calibration': 0.5, 'season_select': 1.0, 'sql_load': 0.2}
+        self.assertEqual(missing_stages(timings, baseline), ['season_select'])
+        self.assertEqual(missing_stages(timings, {}), ['calibration', 'season_select', 'sql_load'])
+
+
+if __name__ == '__main__':
+    unittest.main()
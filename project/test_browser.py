@@ -0,0 +1,54 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+from browser import BrowserFactory
+
+
+class BrowserFactoryTestCase(unittest.TestCase):
+    def test_lean_options(self):
+        '''Tests images are turned off and pages count as loaded once the DOM is ready.'''
+        options = BrowserFactory().options()
+        self.assertIn('--headless', options.arguments)
+        self.assertIn('--blink-settings=imagesEnabled=false', options.arguments)
+        self.assertEqual(options.experimental_options['prefs']['profile.managed_default_content_settings.images'], 2)
+        self.assertEqual(options.to_capabilities()['pageLoadStrategy'], 'eager')
+
+    def test_full_options(self):
+        '''Tests nothing is blocked when resource blocking is turned off.'''
+        options = BrowserFactory(block_resources=False, page_load_strategy='normal').options()
+        self.assertNotIn('--blink-settings=imagesEnabled=false', options.arguments)
+        self.assertNotIn('prefs', options.experimental_options)
+        self.assertEqual(options.to_capabilities()['pageLoadStrategy'], 'normal')
+
+    def test_profile_per_worker(self):
+        '''Tests each worker gets its own profile directory under the shared one.'''
+        with tempfile.TemporaryDirectory() as profile_dir:
+            factory = BrowserFactory(profile_dir=profile_dir)
+            self.assertIn(f"--user-data-dir={os.path.join(profile_dir, 'worker-2')}", factory.options(2).arguments)
+            self.assertTrue(os.path.isdir(os.path.join(profile_dir, 'worker-2')))
+            self.assertFalse(any(argument.startswith('--user-data-dir') for argument in BrowserFactory().options(2).arguments))
+            factory.close()
+
+    def test_profile_locked_per_process(self):
+        '''Tests a profile directory held by another factory, as in another scheduler process, is not opened again until it is released.'''
+        with tempfile.TemporaryDirectory() as profile_dir:
+            first, second = BrowserFactory(profile_dir=profile_dir), BrowserFactory(profile_dir=profile_dir)
+            self.assertIn(f"--user-data-dir={os.path.join(profile_dir, 'worker-0')}", first.options().arguments)
+            self.assertIn(f"--user-data-dir={os.path.join(profile_dir, 'worker-0')}", first.options().arguments)
+            self.assertIn(f"--user-data-dir={os.path.join(profile_dir, 'worker-0-1')}", second.options().arguments)
+            first.close()
+            third = BrowserFactory(profile_dir=profile_dir)
+            self.assertIn(f"--user-data-dir={os.path.join(profile_dir, 'worker-0')}", third.options().arguments)
+            second.close()
+            third.close()
+
+    def test_from_env(self):
+        '''Tests the factory can be set up with environment variables.'''
+        with mock.patch.dict(os.environ, {'block_resources': 'false', 'page_load_strategy': 'none', 'chrome_profile_dir': '/tmp/profiles'}):
+            factory = BrowserFactory.from_env()
+        self.assertEqual((factory.block_resources, factory.page_load_strategy, factory.profile_dir), (False, 'none', '/tmp/profiles'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,39 @@
+import unittest
+from datetime import date
+from fixtures import Fixture, FixtureIndex, parse_fixtures
+from valid_inputs import LEAGUE
+
+ROWS = [
+    ['Chelsea', 'Watford', '//www.premierleague.com/match/66716', '66716', '1653231600000', 'Sunday 22 May 2022'],
+    ['Arsenal', 'Everton', '//www.premierleague.com/match/66710', None, None, 'Sunday 22 May 2022'],
+    ['Chelsea', 'Crystal Palace', '//www.premierleague.com/match/66350', '66350', None, None],
+    ['Leeds United', 'Chelsea', None, None, None, 'Saturday 11 December 2021'],
+]
+
+
+class FixtureIndexTestCase(unittest.TestCase):
+    def setUp(self):
+        self.index = FixtureIndex(parse_fixtures(ROWS))
+
+    def test_parse_fixtures(self):
+        '''Tests the match number and kickoff are read from the row, the link or the day heading, and rows without a link are skipped.'''
+        self.assertEqual(self.index.fixtures, [
+            Fixture('Chelsea', 'Watford', '//www.premierleague.com/match/66716', '66716', date(2022, 5, 22)),
+            Fixture('Arsenal', 'Everton', '//www.premierleague.com/match/66710', '66710', date(2022, 5, 22)),
+            Fixture('Chelsea', 'Crystal Palace', '//www.premierleague.com/match/66350', '66350', None),
+        ])
+
+    def test_lookups(self):
+        '''Tests fixtures are found by club, day and match number.'''
+        self.assertEqual(self.index.links('Chelsea'), ['//www.premierleague.com/match/66716', '//www.premierleague.com/match/66350'])
+        self.assertEqual(len(self.index.links(LEAGUE)), 3)
+        self.assertEqual(self.index.links('Wigan'), [])
+        self.assertEqual([fixture.match_no for fixture in self.index.on(date(2022, 5, 22))], ['66716', '66710'])
+        self.assertEqual(len(self.index.between(date(2022, 5, 1), date(2022, 5, 31))), 2)
+        self.assertEqual(self.index.get(66350).away, 'Crystal Palace')
+        self.assertIsNone(self.index.get(1))
+        self.assertEqual(self.index.clubs(), ['Arsenal', 'Chelsea', 'Crystal Palace', 'Everton', 'Watford'])
+
+
+if __name__ == '__main__':
+    unittest.main()
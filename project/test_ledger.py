@@ -0,0 +1,30 @@
+import unittest
+from ledger import ScrapeLedger
+
+
+class ScrapeLedgerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.ledger = ScrapeLedger(':memory:')
+        self.record = {'Match id': '66716-CHE', 'V4 uuid': 'a', 'Goals scored': 2}
+
+    def test_scraped(self):
+        '''Tests the ledger returns which clubs each match has been scraped for.'''
+        self.ledger.record('2021/22', '66716', 'CHE', self.record)
+        self.ledger.record('2021/22', '66716', 'WAT', self.record)
+        self.ledger.record('2020/21', '59266', 'CHE', self.record)
+        self.assertEqual(self.ledger.scraped('2021/22'), {'66716': {'CHE', 'WAT'}})
+        self.assertTrue(self.ledger.has_season('2021/22', 'CHE'))
+        self.assertFalse(self.ledger.has_season('2021/22', 'ARS'))
+
+    def test_record_detects_changes(self):
+        '''Tests a rescraped match only counts as changed if more than its V4 uuid differs.'''
+        self.assertTrue(self.ledger.record('2021/22', '66716', 'CHE', self.record))
+        self.assertFalse(self.ledger.record('2021/22', '66716', 'CHE', dict(self.record, **{'V4 uuid': 'b'})))
+        self.assertTrue(self.ledger.record('2021/22', '66716', 'CHE', dict(self.record, **{'Goals scored': 3})))
+
+    def tearDown(self):
+        self.ledger.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
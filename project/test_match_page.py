@@ -0,0 +1,43 @@
+import unittest
+from match_page import IncompletePage, check_complete, parse_match_page
+
+PAGE = '''<html><head><script>var stats = "<div class='stadium'>Not this</div>";</script></head><body>
+<div class="matchDate renderMatchDateContainer" data-kickoff="1653231600000">Sun 22 May 2022</div>
+<div class="stadium">Stamford Bridge, London</div>
+<div class="scoreboxContainer">
+  <div class="team home"><a><span class="long">Chelsea</span><span class="short">CHE</span></a></div>
+  <div class="score fullTime">2<span>-</span>1</div>
+  <div class="team away"><span class="short">WAT</span></div>
+</div>
+<table><tbody class="matchCentreStatsContainer">
+  <tr><td><p>73.3</p></td><td><p>Possession %</p></td><td><p>26.7</p></td></tr>
+  <tr><td><p>8</p></td><td><p>Shots on target</p></td><td><p>3</p></td></tr>
+</tbody></table>
+<img src="badge.png"><br>
+</body></html>'''
+
+
+class ParseMatchPageTestCase(unittest.TestCase):
+    def test_parse_match_page(self):
+        '''Tests the scorebox, date, stadium and stats rows are read from the page source, ignoring scripts.'''
+        self.assertEqual(parse_match_page(PAGE), {
+            'date': 'Sun 22 May 2022', 'stadium': 'Stamford Bridge, London', 'home': 'CHE', 'away': 'WAT', 'score': '2-1',
+            'home_name': 'Chelsea', 'away_name': None, 'stats': ['73.3 Possession % 26.7', '8 Shots on target 3']
+            })
+
+    def test_check_complete(self):
+        '''Tests a fully rendered page passes, and a page missing its score or with a part-rendered stats row does not.'''
+        check_complete(parse_match_page(PAGE))
+        with self.assertRaises(IncompletePage):
+            check_complete(parse_match_page(PAGE.replace('2<span>-</span>1', '')))
+        with self.assertRaises(IncompletePage):
+            check_complete(parse_match_page(PAGE.replace('<td><p>3</p></td>', '').replace('<td><p>8</p></td>', '')))
+
+    def test_missing_fields(self):
+        '''Tests anything not on the page is None, and unclosed elements are still read.'''
+        page = parse_match_page('<div class="stadium">Anfield')
+        self.assertEqual((page['stadium'], page['date'], page['stats']), ('Anfield', None, []))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+import os
+import json
+import random
+import tempfile
+import unittest
+from unittest import mock
+from datetime import date
+from benchmark import _match_html
+from ledger import ScrapeLedger
+from match_page import parse_match_page
+from page_cache import CacheMiss, PageCache, cache_url, is_final
+from scraper import PremierLeagueScraper
+from test_async_engine import MemoryStorage
+from test_fixtures import ROWS
+from valid_inputs import LEAGUE
+
+
+class PageCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache = PageCache(self.directory.name, max_bytes=12)
+
+    def tearDown(self):
+        self.cache.close()
+        self.directory.cleanup()
+
+    def _objects(self):
+        return [name for _, _, names in os.walk(os.path.join(self.directory.name, 'objects')) for name in names]
+
+    def test_content_addressed(self):
+        '''Tests pages are keyed by season and URL, and the same content is only stored once.'''
+        self.cache.put('http://api/a', '2021/22', b'{}')
+        self.cache.put('http://api/b', '2021/22', b'{}')
+        self.assertEqual(self.cache.get('http://api/a', '2021/22'), b'{}')
+        self.assertIsNone(self.cache.get('http://api/a', '2020/21'))
+        self.assertEqual(len(self._objects()), 1)
+
+    def test_least_recently_used_evicted(self):
+        '''Tests the least recently used unpinned page is evicted once the cache is too big, and pinned pages never are.'''
+        self.cache.put('http://api/pinned', None, b'p' * 20, pinned=True)
+        self.cache.put('http://api/a', None, b'a' * 6)
+        self.cache.put('http://api/b', None, b'b' * 6)
+        self.cache.get('http://api/a')
+        self.cache.put('http://api/c', None, b'c' * 6)
+        self.assertIsNone(self.cache.get('http://api/b'))
+        self.assertEqual(self.cache.get('http://api/a'), b'a' * 6)
+        self.assertEqual(self.cache.get('http://api/pinned'), b'p' * 20)
+        self.assertEqual(self.cache.size(), 12)
+        self.assertEqual(len(self._objects()), 3)
+
+    def test_expiry(self):
+        '''Tests unpinned pages expire after the ttl, except in offline mode, and pinned pages never do.'''
+        self.cache.ttl = -1
+        self.cache.put('http://api/fixtures', '2022/23', b'[]')
+        self.cache.put('http://api/stats/match/66716', '2021/22', b'{}', pinned=True)
+        self.assertIsNone(self.cache.get('http://api/fixtures', '2022/23'))
+        self.assertEqual(self.cache.get('http://api/stats/match/66716', '2021/22'), b'{}')
+        self.cache.offline = True
+        self.assertEqual(self.cache.get('http://api/fixtures', '2022/23'), b'[]')
+
+    def test_cache_url(self):
+        '''Tests the same request gives the same key whatever order its parameters are in.'''
+        self.assertEqual(cache_url('http://api/teams', {'comps': 1, 'compSeasons': 418}), cache_url('http://api/teams', {'compSeasons': 418, 'comps': 1}))
+        self.assertEqual(cache_url('http://api/teams', {}), 'http://api/teams')
+
+    def test_is_final(self):
+        '''Tests finished matches and lists of seasons that are over are pinned, and nothing else is.'''
+        self.assertTrue(is_final('stats/match/66716', '2021/22', {'entity': {'status': 'C'}}))
+        self.assertFalse(is_final('stats/match/66716', '2021/22', {'entity': {'status': 'L'}}))
+        self.assertTrue(is_final('fixtures', '2021/22', {}))
+        self.assertFalse(is_final('fixtures', '2099/00', {}))
+        self.assertFalse(is_final('competitions/1/compseasons', None, {}))
+
+
+class OfflineScraperTestCase(unittest.TestCase):
+    def setUp(self):
+        '''Creates a scraper with no browser, reading from an offline page cache.'''
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache = PageCache(self.directory.name, offline=True)
+        self.scraper = PremierLeagueScraper(driver=None, storage=MemoryStorage(), ledger=ScrapeLedger(':memory:'), cache=self.cache)
+        self.scraper.club, self.scraper.year = 'Chelsea', '2021/22'
+
+    def tearDown(self):
+        self.scraper.ledger.close()
+        self.cache.close()
+        self.directory.cleanup()
+
+    def _put_listing(self, club, rows):
+        self.cache.put(self.scraper._fixture_listing_url(club), '2021/22', json.dumps(rows).encode('utf-8'))
+
+    def test_fixture_listing_replayed(self):
+        '''Tests the fixture listing is read from the cache without loading the results page, and a miss is an error.'''
+        with self.assertRaises(CacheMiss):
+            self.scraper._scrape_links()
+        rows = [['Chelsea', 'Watford', f'//www.premierleague.com/match/{match_no}', str(match_no), None, None] for match_no in range(66700, 66738)]
+        self._put_listing('Chelsea', rows)
+        self.assertEqual(self.scraper._scrape_links(), [row[2] for row in rows])
+        self.assertIsNone(self.scraper._driver)
+
+    def test_partial_listing_not_trusted(self):
+        '''Tests a listing missing some of the club's fixtures, e.g. one read for another club, is not used.'''
+        self._put_listing('Watford', ROWS)
+        self._put_listing(LEAGUE, ROWS)
+        with self.assertRaises(CacheMiss):
+            self.scraper._scrape_links()
+        self.cache.offline = False
+        self.assertIsNone(self.scraper._cached_fixture_links())
+
+    def test_match_page_parsed_again(self):
+        '''Tests the raw stats page is read from the cache and parsed again, and a miss is an error that is not retried.'''
+        link = 'https://www.premierleague.com/match/66716'
+        source = _match_html(66716, date(2022, 5, 22), 'CHE', 'WAT', random.Random(0))
+        self.cache.put(cache_url(link, {'tab': 'stats'}), '2021/22', source.encode('utf-8'), pinned=True)
+        record = self.scraper._fetch_match(link)
+        self.assertEqual((record.match_no, record.date, record.home, record.away), ('66716', 'Sun 22 May 2022', 'CHE', 'WAT'))
+        self.assertEqual(len(record.stats), 11)
+        with self.assertRaises(CacheMiss):
+            self.scraper._fetch_match('https://www.premierleague.com/match/66350')
+        self.assertFalse(self.scraper._scrape_stats_with_retry('https://www.premierleague.com/match/66350'))
+        self.assertIsNone(self.scraper._driver)
+
+    def test_unreadable_page_not_retried(self):
+        '''Tests a cached page that cannot be read is not parsed again and again, and offline is a miss.'''
+        link = 'https://www.premierleague.com/match/66716'
+        self.cache.put(cache_url(link, {'tab': 'stats'}), '2021/22', b'<div class="stadium">Anfield</div>', pinned=True)
+        with mock.patch('scraper.parse_match_page', wraps=parse_match_page) as parse:
+            self.assertFalse(self.scraper._scrape_stats_with_retry(link))
+        self.assertEqual(parse.call_count, 1)
+        self.assertIsNone(self.scraper._driver)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+import pandas as pd
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+import RDS
+from pipeline import PipelineError, StreamingPipeline
+
+
+def match_record(match_no, goals_scored):
+    '''Returns a record in the format created by PremierLeagueScraper._create_dictionary.'''
+    return {
+        'Match id': f'{match_no}-CHE', 'V4 uuid': 'test', 'Date': 'Sun 22 May 2022', 'Location': 'Stamford Bridge, London',
+        'Home or away': 'Home', 'Result': 'Win', 'Goals scored': goals_scored, 'Goals against': 1, 'Possession %': '73.3',
+        'Shots on target': '8', 'Shots': '21', 'Touches': '867', 'Passes': '705', 'Tackles': '14', 'Clearances': '10',
+        'Corners': '9', 'Offsides': '1', 'Fouls conceded': '8', 'Yellow cards': '1'
+        }
+
+
+class StreamingPipelineTestCase(unittest.TestCase):
+    def setUp(self):
+        '''Streams into a local SQLite database in place of RDS.'''
+        self.directory = tempfile.TemporaryDirectory()
+        self.engine = create_engine(f"sqlite:///{os.path.join(self.directory.name, 'test.db')}")
+        self.pipeline = StreamingPipeline('2021/22', engine=self.engine, batch_size=2, flush_interval=0.1)
+
+    def test_rows_written_in_batches(self):
+        '''Tests every record reaches the club's table, including a part-filled last batch.'''
+        for match_no in range(66714, 66717):
+            self.pipeline.put('Chelsea', match_record(match_no, 2))
+        self.pipeline.close()
+        df = pd.read_sql('SELECT * FROM "Chelsea-2122"', self.engine)
+        self.assertEqual(df.shape, (3, 20))
+        self.assertEqual(df['Red cards'].tolist(), [0, 0, 0])
+
+    def test_upsert_on_match_id(self):
+        '''Tests a match scraped twice is updated rather than duplicated.'''
+        self.pipeline.put('Chelsea', match_record(66716, 2))
+        self.pipeline.put('Chelsea', match_record(66715, 0))
+        self.pipeline.put('Chelsea', match_record(66716, 3))
+        self.pipeline.close()
+        df = pd.read_sql('SELECT * FROM "Chelsea-2122" ORDER BY "Match id"', self.engine)
+        self.assertEqual(df['Goals scored'].tolist(), [0, 3])
+
+    def test_second_run(self):
+        '''Tests a second streaming run of the same season tops up the rows already there.'''
+        self.pipeline.put('Chelsea', match_record(66716, 2))
+        self.pipeline.close()
+        pipeline = StreamingPipeline('2021/22', engine=self.engine, batch_size=2, flush_interval=0.1)
+        pipeline.put('Chelsea', match_record(66715, 0))
+        pipeline.close()
+        self.assertEqual(len(pd.read_sql('SELECT * FROM "Chelsea-2122"', self.engine)), 2)
+
+    def test_failed_batch_raised(self):
+        '''Tests records that could not be written are kept with their club and Match id, and raised on close.'''
+        error = OperationalError('INSERT', {}, Exception('database is locked'))
+        with mock.patch.object(RDS, 'upsert_matches', side_effect=[error, None]):
+            self.pipeline.put('Chelsea', match_record(66716, 2))
+            self.pipeline.put('Watford', match_record(66716, 1))
+            with self.assertRaises(PipelineError) as raised:
+                self.pipeline.close()
+        self.assertEqual(raised.exception.failed, [('Chelsea', '66716-CHE')])
+
+    def test_on_written_only_after_upsert(self):
+        '''Tests on_written is called for the records that were upserted, and not for those that failed.'''
+        written = []
+        error = OperationalError('INSERT', {}, Exception('database is locked'))
+        with mock.patch.object(RDS, 'upsert_matches', side_effect=[error, None]):
+            self.pipeline.put('Chelsea', match_record(66716, 2), on_written=lambda: written.append('Chelsea'))
+            self.pipeline.put('Watford', match_record(66716, 1), on_written=lambda: written.append('Watford'))
+            with self.assertRaises(PipelineError):
+                self.pipeline.close()
+        self.assertEqual(written, ['Watford'])
+
+    def test_dropped_record_failed(self):
+        '''Tests a record clean_frame drops for being outside the season is kept as failed, and on_written is not called for it.'''
+        written = []
+        self.pipeline.put('Chelsea', match_record(66716, 2), on_written=lambda: written.append('66716'))
+        self.pipeline.put('Chelsea', dict(match_record(66715, 0), Date='Sat 14 Aug 2021'), on_written=lambda: written.append('66715'))
+        self.pipeline.put('Chelsea', dict(match_record(66714, 1), Date='Sun 14 Aug 2022'), on_written=lambda: written.append('66714'))
+        with self.assertRaises(PipelineError) as raised:
+            self.pipeline.close()
+        self.assertEqual(sorted(written), ['66715', '66716'])
+        self.assertEqual(raised.exception.failed, [('Chelsea', '66714-CHE')])
+        self.assertEqual(len(pd.read_sql('SELECT * FROM "Chelsea-2122"', self.engine)), 2)
+
+    def test_unexpected_error_raised(self):
+        '''Tests an unexpected error stops the writer and is raised on close, with every record after it kept as failed.'''
+        with mock.patch.object(RDS, 'upsert_matches', side_effect=RuntimeError('bug')):
+            for match_no in range(66713, 66717):
+                self.pipeline.put('Chelsea', match_record(match_no, 2))
+            with self.assertRaises(PipelineError) as raised:
+                self.pipeline.close()
+        self.assertEqual(len(raised.exception.failed), 4)
+        self.assertIsInstance(raised.exception.__cause__, RuntimeError)
+
+    def tearDown(self):
+        self.engine.dispose()
+        self.directory.cleanup()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+import render
+import RDS
+from graphs import FigureTemplate
+from schema import clean_frame
+from test_pipeline import match_record
+
+CHELSEA = ('Chelsea', '2021/22')
+
+
+class RenderBatchTestCase(unittest.TestCase):
+    def setUp(self):
+        '''Renders from a local SQLite database into a temporary working directory.'''
+        self.directory = tempfile.TemporaryDirectory()
+        self.cwd = os.getcwd()
+        os.chdir(self.directory.name)
+        self.environ = mock.patch.dict(os.environ, {'database_url': f"sqlite:///{os.path.join(self.directory.name, 'test.db')}"})
+        self.environ.start()
+        RDS.dispose_engine()
+        self._upload('Chelsea', [match_record(66716, 2), dict(match_record(66715, 0), Date='Sun 15 May 2022')])
+        self._upload('Watford', [match_record(66716, 1)])
+
+    def tearDown(self):
+        RDS.dispose_engine()
+        self.environ.stop()
+        os.chdir(self.cwd)
+        self.directory.cleanup()
+
+    def _upload(self, club, records):
+        RDS.create_season_view(club, '2021/22', RDS.rds_connect())
+        RDS.upsert_matches(clean_frame(records, '2021/22'), club, '2021/22', RDS.rds_connect())
+
+    def _digest(self):
+        with open('graphical-data/CHE-22.png.sha256') as f:
+            return f.read()
+
+    def test_render_then_skip_then_rerender(self):
+        '''Tests a figure is rendered once, skipped while its data is unchanged, and rendered again once the data changes.'''
+        self.assertEqual(render.render_batch([CHELSEA, CHELSEA], processes=2), {CHELSEA: 'rendered'})
+        self.assertTrue(os.path.exists('graphical-data/CHE-22.png'))
+        digest = self._digest()
+        self.assertEqual(render.render_batch([CHELSEA], processes=1), {CHELSEA: 'unchanged'})
+        self._upload('Chelsea', [dict(match_record(66714, 4), Date='Sun 8 May 2022')])
+        self.assertEqual(render.render_batch([CHELSEA], processes=1), {CHELSEA: 'rendered'})
+        self.assertNotEqual(self._digest(), digest)
+
+    def test_failure_reported(self):
+        '''Tests a club-season that cannot be drawn is reported as failed without stopping the rest of the batch.'''
+        statuses = render.render_batch([CHELSEA, ('Wigan', '2021/22')], processes=2)
+        self.assertEqual(statuses, {CHELSEA: 'rendered', ('Wigan', '2021/22'): 'failed'})
+
+    def test_template_reused(self):
+        '''Tests a worker lays out the figure once and draws every chart it renders on the same template.'''
+        os.makedirs('graphical-data')
+        with mock.patch.object(render, '_template', None), mock.patch.object(render, 'FigureTemplate', wraps=FigureTemplate) as template:
+            self.assertEqual(render._render(CHELSEA), 'rendered')
+            first = render._template
+            self.assertEqual(render._render(('Watford', '2021/22')), 'rendered')
+            self.assertIs(render._template, first)
+        self.assertEqual(template.call_count, 1)
+        self.assertTrue(os.path.exists('graphical-data/WAT-22.png'))
+
+
+if __name__ == '__main__':
+    unittest.main()
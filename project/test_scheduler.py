@@ -0,0 +1,92 @@
+import os
+import sys
+import time
+import tempfile
+import unittest
+from unittest import mock
+import scheduler
+from scheduler import JobQueue, expand, run_schedule, season_range
+
+
+def fake_job(club, year, backend):
+    '''Stands in for a scrape: Wigan were not in the league, and Crash takes its worker process down.'''
+    if club == 'Wigan':
+        sys.exit()
+    if club == 'Crash':
+        os._exit(1)
+
+
+class SpecTestCase(unittest.TestCase):
+    def test_season_range(self):
+        '''Tests seasons either side of the millennium are written the same way as on the website.'''
+        self.assertEqual(season_range('1998/99', '2000/01'), ['1998/99', '1999/00', '2000/01'])
+
+    def test_expand(self):
+        '''Tests a spec is expanded season by season without duplicates, and to every club by default.'''
+        self.assertEqual(
+            expand(['2020/21', '2021/22'], ['Chelsea', 'Arsenal', 'Chelsea']),
+            [('Chelsea', '2020/21'), ('Arsenal', '2020/21'), ('Chelsea', '2021/22'), ('Arsenal', '2021/22')]
+            )
+        self.assertIn(('Wigan', '2021/22'), expand(['2021/22']))
+
+
+class JobQueueTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'scheduler.db')
+        self.queue = JobQueue(self.path, max_attempts=2)
+
+    def tearDown(self):
+        self.queue.close()
+        self.directory.cleanup()
+
+    def test_add_ignores_duplicates(self):
+        '''Tests a job already in the queue is not added again, even once it is done.'''
+        self.assertEqual(self.queue.add([('Chelsea', '2021/22'), ('Arsenal', '2021/22')]), 2)
+        self.queue.finish(self.queue.claim(1), 'done')
+        self.assertEqual(self.queue.add([('Chelsea', '2021/22'), ('Wigan', '2021/22')]), 1)
+        self.assertEqual(self.queue.counts(), {'done': 1, 'pending': 2})
+
+    def test_failed_job_retried_until_out_of_attempts(self):
+        '''Tests a failed job goes back in the queue until max_attempts is reached.'''
+        self.queue.add([('Chelsea', '2021/22')])
+        self.queue.finish(self.queue.claim(1), 'failed', 'TimeoutException')
+        self.assertEqual(self.queue.counts(), {'pending': 1})
+        self.queue.finish(self.queue.claim(1), 'failed', 'TimeoutException')
+        self.assertEqual(self.queue.counts(), {'failed': 1})
+        self.assertIsNone(self.queue.claim(1))
+        self.queue.retry_failed()
+        self.assertEqual(self.queue.claim(1), ('Chelsea', '2021/22'))
+
+    def test_recover_dead_workers(self):
+        '''Tests only the jobs of processes that are no longer running are put back in the queue.'''
+        self.queue.add([('Chelsea', '2021/22'), ('Arsenal', '2021/22')])
+        self.queue.claim(os.getpid())
+        self.queue.claim(2 ** 22 + 1)  # Above the largest process ID on Linux, so never running
+        self.assertEqual(self.queue.recover(), 1)
+        self.assertEqual(self.queue.counts(), {'running': 1, 'pending': 1})
+
+    def test_rate_limit(self):
+        '''Tests jobs are started no closer together than min_interval, even from another connection to the queue.'''
+        self.queue.add([('Chelsea', '2021/22'), ('Arsenal', '2021/22')])
+        other = JobQueue(self.path, min_interval=0.3)
+        start = time.perf_counter()
+        self.queue.claim(1)
+        other.claim(2)
+        self.assertGreaterEqual(time.perf_counter() - start, 0.3)
+        other.close()
+
+
+class RunScheduleTestCase(unittest.TestCase):
+    def test_run_schedule(self):
+        '''Tests every job is worked through, with a club not in the league skipped and a crashing job given up on.'''
+        with tempfile.TemporaryDirectory() as directory, mock.patch.object(scheduler, '_run_job', fake_job):
+            counts = run_schedule(
+                expand(['2021/22'], ['Chelsea', 'Arsenal', 'Wigan', 'Crash']),
+                os.path.join(directory, 'scheduler.db'), workers=2, max_attempts=2, poll=0.1
+                )
+        self.assertEqual(counts, {'done': 2, 'skipped': 1, 'failed': 1})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+import unittest
+import pandas as pd
+import schema
+from test_pipeline import match_record
+
+
+class CleanFrameTestCase(unittest.TestCase):
+    def test_types_follow_schema(self):
+        '''Tests every column is present and has the type given in the schema.'''
+        df = schema.clean_frame([match_record(66716, 2)], '2021/22')
+        self.assertEqual(list(df.columns), schema.COLUMNS)
+        self.assertEqual(df['Shots'].dtype, 'int16')
+        self.assertEqual(df['Location'].dtype, 'category')
+        self.assertEqual(df['Date'].iloc[0], pd.Timestamp(2022, 5, 22))
+
+    def test_missing_stat_filled(self):
+        '''Tests a stat missing from an older season is filled with 0 rather than raising a KeyError.'''
+        record = match_record(1234, 1)
+        del record['Touches']
+        df = schema.clean_frame([record], '2021/22')
+        self.assertEqual(df['Touches'].tolist(), [0])
+
+    def test_matches_outside_season_dropped(self):
+        '''Tests only matches within the season are kept, including across a change of century.'''
+        records = [dict(match_record(1, 1), Date='Sat 14 Aug 1999'), dict(match_record(2, 1), Date='Sun 14 May 2000'),
+                   dict(match_record(3, 1), Date='Sat 12 Aug 2000')]
+        df = schema.clean_frame(records, '1999/00')
+        self.assertEqual(df['Match id'].tolist(), ['1-CHE', '2-CHE'])
+
+    def test_memory_hooks(self):
+        '''Tests the memory hooks are called before and after cleaning.'''
+        sizes = []
+        schema.memory_hooks.append(lambda label, size: sizes.append(size))
+        try:
+            schema.clean_frame([match_record(66716, 2)], '2021/22')
+        finally:
+            schema.memory_hooks.pop()
+        self.assertEqual(len(sizes), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
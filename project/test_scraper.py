@@ -1,9 +1,15 @@
 import unittest
+from unittest import mock
 from numpy import place
-from selenium import webdriver
+import pandas as pd
+from browser import BrowserFactory
+import valid_inputs
+from backends import MatchRecord
+from ledger import ScrapeLedger
+from match_page import IncompletePage
 from scraper import PremierLeagueScraper
+from test_async_engine import MemoryStorage
 from RDS import upload_to_sql
-from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
@@ -11,16 +17,7 @@ from selenium.webdriver.support import expected_conditions as EC
 class PremierLeagueScraperTestCase(unittest.TestCase):
     def setUp(self):
         '''Opens the match results page in headless mode.'''
-        self.options = Options()
-        self.options.add_argument("--disable-gpu")
-        self.options.add_argument("--disable-extensions")
-        self.options.add_argument("--disable-infobars")
-        self.options.add_argument('--window-size=1920,1080')
-        self.options.add_argument("--disable-notifications")
-        self.options.add_argument('--headless')
-        self.options.add_argument('--no-sandbox')
-        self.options.add_argument('--disable-dev-shm-usage')
-        self.pl = PremierLeagueScraper(driver=webdriver.Chrome(options=self.options))
+        self.pl = PremierLeagueScraper(driver=BrowserFactory().create())
         self.pl.club = 'Chelsea'  # Test
         self.pl.year = '2021/22'
 
@@ -55,6 +52,8 @@ class PremierLeagueScraperTestCase(unittest.TestCase):
         self.pl._scroll_to_bottom()
         link_list = self.pl._get_fixture_link_list(38)
         self.assertEqual(len(link_list), 38)
+        self.assertEqual(len(self.pl.fixture_index), 380)
+        self.assertEqual(self.pl.fixture_index.links('Chelsea'), link_list)
 
     def test_split_stats_list(self):
         '''Tests the number of statistics remains the same after splitting and reconstructing.'''
@@ -97,5 +96,77 @@ class PremierLeagueScraperTestCase(unittest.TestCase):
         del self.pl
 
 
+class ScrapeFailureTestCase(unittest.TestCase):
+    def setUp(self):
+        '''Creates a scraper that never opens a browser.'''
+        self.pl = PremierLeagueScraper(driver=None, max_retries=2, storage=MemoryStorage(), ledger=ScrapeLedger(':memory:'))
+        self.pl.club, self.pl.year = 'Chelsea', '2021/22'
+        self.links = [f'https://www.premierleague.com/match/{match_no}' for match_no in range(66710, 66716)]
+
+    @staticmethod
+    def _scrape_stats(link):
+        '''Fails on a part-rendered page for 66712, and on bugs for 66713 and 66714.'''
+        if link.endswith('66712'):
+            raise IncompletePage('The stats page has no score.')
+        if link.endswith('66713'):
+            raise TypeError('bug')
+        if link.endswith('66714'):
+            raise RuntimeError('bug')
+
+    def test_serial_failures_kept(self):
+        '''Tests only a part-rendered page is retried, a bug fails at once, and any failing link is kept without stopping the others.'''
+        with mock.patch.object(PremierLeagueScraper, '_scrape_stats', side_effect=self._scrape_stats) as scrape:
+            failed = [link for link in self.links if not self.pl._scrape_stats_with_retry(link)]
+        self.assertEqual(failed, self.links[2:5])
+        self.assertEqual(scrape.call_count, 7)
+
+    def test_parallel_failures_kept(self):
+        '''Tests a failing link does not stop its worker, so every link is tried and the failures are returned.'''
+        self.pl.workers = 2
+        with mock.patch.object(PremierLeagueScraper, '_scrape_stats', side_effect=self._scrape_stats) as scrape:
+            failed = self.pl._scrape_stats_parallel(self.links)
+        self.assertEqual(sorted(failed), self.links[2:5])
+        self.assertEqual(scrape.call_count, 7)
+
+    def tearDown(self):
+        self.pl.ledger.close()
+
+
+class UnlistedClubTestCase(unittest.TestCase):
+    def test_unlisted_club_stored(self):
+        '''Tests a club missing from valid_inputs.CLUBS is stored under the name on the page rather than stopping a league run.'''
+        pl = PremierLeagueScraper(driver=None, storage=MemoryStorage(), ledger=ScrapeLedger(':memory:'))
+        pl.club, pl.year = valid_inputs.LEAGUE, '2021/22'
+        record = MatchRecord('66716', 'Sun 22 May 2022', 'Stamford Bridge, London', 'CHE', 'XYZ', 2, 1,
+            ['8 Shots on target 3'], 'Chelsea', 'Exampleton')
+        pl._store_match(record)
+        self.assertEqual(sorted(pl.storage.records), ['2021-22/CHE/66716-CHE', '2021-22/XYZ/66716-XYZ'])
+        self.assertEqual(pl.clubs_scraped, {'Chelsea', 'Exampleton'})
+        self.assertEqual(pl.unlisted_clubs, {'Exampleton': 'XYZ'})
+        self.assertEqual(pl.ledger.scraped('2021/22'), {})  # Not until each club is loaded into RDS
+        self.assertEqual({club: list(records) for club, records in pl.unloaded.items()},
+            {'Chelsea': ['66716-CHE'], 'Exampleton': ['66716-XYZ']})
+        pl.ledger.close()
+
+
+class FailedLoadTestCase(unittest.TestCase):
+    def test_failed_load_scraped_again(self):
+        '''Tests a season whose load into RDS fails is left out of the ledger, so the next run scrapes and loads it again.'''
+        pl = PremierLeagueScraper(driver=None, storage=MemoryStorage(), ledger=ScrapeLedger(':memory:'))
+        record = MatchRecord('66716', 'Sun 22 May 2022', 'Stamford Bridge, London', 'CHE', 'WAT', 2, 1, ['8 Shots on target 3'])
+        loaded = pd.DataFrame({'Match id': ['66716-CHE']})
+        with mock.patch.object(PremierLeagueScraper, '_scrape_links', return_value=['//www.premierleague.com/match/66716']), \
+                mock.patch.object(PremierLeagueScraper, '_fetch_match', return_value=record), \
+                mock.patch('RDS.season_exists', return_value=False), \
+                mock.patch('RDS.upload_to_sql', side_effect=[RuntimeError('database down'), loaded]) as upload:
+            with self.assertRaises(RuntimeError):
+                pl.run_crawler('Chelsea', '2021/22', graphs=False)
+            self.assertEqual(pl.ledger.scraped('2021/22'), {})
+            pl.run_crawler('Chelsea', '2021/22', graphs=False)
+        self.assertEqual(upload.call_count, 2)
+        self.assertEqual(pl.ledger.scraped('2021/22'), {'66716': {'CHE'}})
+        pl.ledger.close()
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,87 @@
+import os
+import json
+import unittest
+from unittest import mock
+from botocore.exceptions import ClientError
+from moto import mock_s3
+from prometheus_client import REGISTRY
+from storage import S3Writer, download_records, migrate_legacy_keys, s3_client, s3_key, season_of
+
+
+@mock_s3
+class S3WriterTestCase(unittest.TestCase):
+    def setUp(self):
+        '''Creates the bucket in a local S3 stand-in.'''
+        os.environ.setdefault('aws_access_key_id', 'testing')
+        os.environ.setdefault('aws_secret_access_key', 'testing')
+        self.client = s3_client()
+        self.client.create_bucket(Bucket='premier-league-bucket', CreateBucketConfiguration={'LocationConstraint': 'eu-west-2'})
+        self.writer = S3Writer(batch_size=5, backoff=0, client=self.client)
+
+    def _keys(self):
+        return sorted(obj['Key'] for obj in self.client.list_objects_v2(Bucket='premier-league-bucket').get('Contents', []))
+
+    def test_buffers_until_batch_size(self):
+        '''Tests that nothing is written until the batch is full, then the whole batch is.'''
+        for i in range(4):
+            self.writer.put(f'6671{i}-CHE', {'Match id': f'6671{i}-CHE'})
+        self.assertEqual(self._keys(), [])
+        self.writer.put('66714-CHE', {'Match id': '66714-CHE'})
+        self.assertEqual(len(self._keys()), 5)
+
+    def test_close_flushes(self):
+        '''Tests that closing the writer saves anything still buffered.'''
+        self.writer.put('66716-CHE', {'Goals scored': 2})
+        self.writer.close()
+        body = self.client.get_object(Bucket='premier-league-bucket', Key='66716-CHE')['Body'].read()
+        self.assertEqual(json.loads(body), {'Goals scored': 2})
+
+    def test_retries_failed_puts(self):
+        '''Tests that a failed put is retried and the record still saved.'''
+        error = ClientError({'Error': {'Code': 'SlowDown', 'Message': 'Slow down'}}, 'PutObject')
+        retries = REGISTRY.get_sample_value('scraper_retries_total', {'operation': 's3_put'}) or 0
+        with mock.patch.object(self.client, 'put_object', side_effect=[error, error, {}]) as patched:
+            self.assertTrue(self.writer._put_with_retry('66716-CHE', b'{}'))
+        self.assertEqual(patched.call_count, 3)
+        self.assertEqual(REGISTRY.get_sample_value('scraper_retries_total', {'operation': 's3_put'}), retries + 2)
+
+    def test_on_saved_only_after_write(self):
+        '''Tests on_saved is called once an object is written, and never for one that could not be.'''
+        saved = []
+        error = ClientError({'Error': {'Code': 'InternalError', 'Message': 'Internal error'}}, 'PutObject')
+        self.writer.put('66716-CHE', {}, on_saved=lambda: saved.append('66716-CHE'))
+        self.assertEqual(saved, [])
+        self.writer.flush()
+        self.assertEqual(saved, ['66716-CHE'])
+        with mock.patch.object(self.client, 'put_object', side_effect=error):
+            self.writer.put('66715-CHE', {}, on_saved=lambda: saved.append('66715-CHE'))
+            self.assertFalse(self.writer.flush())
+        self.assertEqual(saved, ['66716-CHE'])
+        self.assertEqual(self.writer.failed, ['66715-CHE'])
+
+    def test_download_records_lists_by_prefix(self):
+        '''Tests only the requested club-season's records are downloaded.'''
+        self.writer.put(s3_key('2021/22', 'CHE', '66716-CHE'), {'Match id': '66716-CHE'})
+        self.writer.put(s3_key('2021/22', 'WAT', '66716-WAT'), {'Match id': '66716-WAT'})
+        self.writer.put(s3_key('2020/21', 'CHE', '59266-CHE'), {'Match id': '59266-CHE'})
+        self.writer.flush()
+        self.assertEqual(download_records('2021/22', 'CHE', client=self.client), [{'Match id': '66716-CHE'}])
+
+    def test_migrate_legacy_keys(self):
+        '''Tests flat match ID keys are moved under their season and club.'''
+        self.client.put_object(Bucket='premier-league-bucket', Key='66716-CHE', Body=b'{"Date": "Sun 22 May 2022"}')
+        self.assertEqual(migrate_legacy_keys(client=self.client), 1)
+        self.assertEqual(self._keys(), ['2021-22/CHE/66716-CHE'])
+
+    def test_season_of(self):
+        '''Tests matches are assigned to the season starting in the August before them.'''
+        self.assertEqual(season_of('Sat 14 Aug 2021'), '2021/22')
+        self.assertEqual(season_of('Sun 22 May 2022'), '2021/22')
+        self.assertEqual(season_of('Sun 26 Jul 2020'), '2019/20')
+
+    def tearDown(self):
+        self.writer.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,39 @@
+import unittest
+import valid_inputs
+from valid_inputs import CLUB_NAMES, CLUBS, LEAGUE, Season, season, validate
+
+
+class ValidInputsTestCase(unittest.TestCase):
+    def test_registry(self):
+        '''Tests every club has its own 3 letters, the reverse lookup matches, and the registry is built once and read-only.'''
+        self.assertEqual(CLUBS['Huddersfield'], 'HUD')
+        self.assertEqual(CLUBS['Hull'], 'HUL')
+        self.assertNotIn('HuddersfieldHull', CLUBS)
+        self.assertEqual(CLUB_NAMES['LUT'], 'Luton')
+        self.assertEqual(len(CLUBS), 51)
+        self.assertEqual({CLUB_NAMES[short] for short in CLUBS.values()}, set(CLUBS))
+        self.assertIs(valid_inputs.valid_clubs(), valid_inputs.valid_clubs())
+        with self.assertRaises(TypeError):
+            CLUBS['Wrexham'] = 'WRE'
+
+    def test_season(self):
+        '''Tests the number of clubs and fixtures in a season, and that only real seasons are accepted.'''
+        self.assertEqual(season('1993/94'), Season('1993/94', 22))
+        self.assertEqual((season('1993/94').fixtures, season('1993/94').club_fixtures), (462, 42))
+        self.assertEqual((season('1999/00').fixtures, season('1999/00').club_fixtures), (380, 38))
+        for year in ['1991/92', '2021/23', '2021-22', '2099/00', None]:
+            with self.assertRaises(ValueError):
+                season(year)
+
+    def test_validate(self):
+        '''Tests unknown clubs and seasons are rejected before scraping.'''
+        validate('Chelsea', '2021/22')
+        validate(LEAGUE, '1992/93')
+        with self.assertRaises(ValueError):
+            validate('HuddersfieldHull', '2021/22')
+        with self.assertRaises(ValueError):
+            validate('Chelsea', '21/22')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,41 @@
+import os
+import unittest
+from unittest import mock
+from selenium.common.exceptions import TimeoutException
+from waits import DEFAULT_STEPS, Step, WaitPolicy
+
+
+class WaitPolicyTestCase(unittest.TestCase):
+    def setUp(self):
+        self.policy = WaitPolicy({'scorebox': [0.2, 0.05], 'ad': [0, 0.05]})
+
+    def test_steps_overridden(self):
+        '''Tests that only the steps given are changed from the defaults.'''
+        self.assertEqual(self.policy.steps['scorebox'], Step(0.2, 0.05))
+        self.assertEqual(self.policy.steps['stats_tab'], DEFAULT_STEPS['stats_tab'])
+
+    def test_from_env(self):
+        '''Tests steps can be set with the wait_policy environment variable.'''
+        with mock.patch.dict(os.environ, {'wait_policy': '{"cookies": [0.5, 0.1]}'}):
+            self.assertEqual(WaitPolicy.from_env().steps['cookies'], Step(0.5, 0.1))
+
+    def test_until_records_waits(self):
+        '''Tests that a met condition returns its value and a timeout is raised, with both recorded.'''
+        self.assertEqual(self.policy.until(None, lambda driver: 'element', 'scorebox'), 'element')
+        with self.assertRaises(TimeoutException):
+            self.policy.until(None, lambda driver: False, 'scorebox')
+        stats = self.policy.stats['scorebox']
+        self.assertEqual((stats['waits'], stats['timeouts']), (2, 1))
+        self.assertGreaterEqual(stats['longest'], 0.2)
+        self.assertIn('scorebox: 2 waits, 1 timed out', self.policy.report())
+
+    def test_probe_does_not_block(self):
+        '''Tests that a probe with no timeout checks once and returns None rather than raising.'''
+        condition = mock.Mock(return_value=False)
+        self.assertIsNone(self.policy.probe(None, condition, 'ad'))
+        self.assertEqual(condition.call_count, 1)
+        self.assertLess(self.policy.stats['ad']['seconds'], 0.05)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,64 +1,164 @@
+import re
+from datetime import date
+from types import MappingProxyType
+from typing import NamedTuple
+
+# The value of the club input that scrapes every club in the season at once
+LEAGUE = 'All'
+
+# The first season of the Premier League
+FIRST_SEASON = 1992
+
+# The seasons played by more than 20 clubs
+SEASON_TEAMS = MappingProxyType({'1992/93': 22, '1993/94': 22, '1994/95': 22})
+
+# The name of each club and its 3 unique letters, built once per process and read-only
+CLUBS = MappingProxyType({
+    'Arsenal': 'ARS',
+    'Aston Villa': 'AVL',
+    'Barnsley': 'BAR',
+    'Birmingham': 'BIR',
+    'Blackburn': 'BLB',
+    'Blackpool': 'BLP',
+    'Bolton': 'BOL',
+    'Bournemouth': 'BOU',
+    'Bradford': 'BRA',
+    'Brentford': 'BRE',
+    'Brighton': 'BHA',
+    'Burnley': 'BUR',
+    'Cardiff': 'CAR',
+    'Charlton': 'CHA',
+    'Chelsea': 'CHE',
+    'Coventry': 'COV',
+    'Crystal Palace': 'CRY',
+    'Derby': 'DER',
+    'Everton': 'EVE',
+    'Fulham': 'FUL',
+    'Huddersfield': 'HUD',
+    'Hull': 'HUL',
+    'Ipswich': 'IPS',
+    'Leeds': 'LEE',
+    'Leicester': 'LEI',
+    'Liverpool': 'LIV',
+    'Luton': 'LUT',
+    'Man City': 'MCI',
+    'Man Utd': 'MUN',
+    'Middlesbrough': 'MID',
+    'Newcastle': 'NEW',
+    'Norwich': 'NOR',
+    'Nott\'m Forest': 'NFO',
+    'Oldham': 'OLD',
+    'Portsmouth': 'POR',
+    'QPR': 'QPR',
+    'Reading': 'RDG',
+    'Sheffield Utd': 'SHU',
+    'Sheffield Wed': 'SHW',
+    'Southampton': 'SOU',
+    'Stoke': 'STK',
+    'Sunderland': 'SUN',
+    'Swansea': 'SWA',
+    'Swindon': 'SWI',
+    'Spurs': 'TOT',
+    'Watford': 'WAT',
+    'West Brom': 'WBA',
+    'West Ham': 'WHU',
+    'Wigan': 'WIG',
+    'Wimbledon': 'WIM',
+    'Wolves': 'WOL'
+})
+
+# Each club's 3 letters back to its name
+CLUB_NAMES = MappingProxyType({short: club for club, short in CLUBS.items()})
+
+
+class Season(NamedTuple):
+    '''
+    The size of a Premier League season.
+
+    Attributes
+    ----------
+    label (str): The season, e.g. '2021/22'.
+    teams (int): The number of clubs in the league that season.
+    '''
+    label: str
+    teams: int
+
+    @property
+    def fixtures(self):
+        '''The number of matches in the season.'''
+        return self.teams * (self.teams - 1)
+
+    @property
+    def club_fixtures(self):
+        '''The number of matches each club plays in the season.'''
+        return 2 * (self.teams - 1)
+
+
+def _check_registry():
+    '''Checks every club has 3 unique capital letters and none is named LEAGUE. Run once, on import.'''
+    for club, short in CLUBS.items():
+        if not re.fullmatch('[A-Z]{3}', short):
+            raise ValueError(f'{club} is shortened to {short!r}, which is not 3 capital letters.')
+    if len(CLUB_NAMES) != len(CLUBS):
+        raise ValueError('Two clubs are shortened to the same letters.')
+    if LEAGUE in CLUBS:
+        raise ValueError(f'{LEAGUE!r} is used for the whole league, so cannot be a club.')
+
+
+_check_registry()
+
+
 def valid_clubs():
     '''
-    Abbreviates the club name to 3 unique letters.
+    Abbreviates each club name to 3 unique letters.
+
+    Returns:
+        Mapping: Club name as the key and shortened name as the value.
+    '''
+    return CLUBS
+
+
+def club_names():
+    '''
+    Maps each shortened name back to the name of the club.
+
+    Returns:
+        Mapping: Shortened name as the key and club name as the value.
+    '''
+    return CLUB_NAMES
+
+
+def season(year):
+    '''
+    Looks up the size of a season.
 
     Args:
-        Club (str): The name of the club to be shortened.
+        year (str): The season, e.g. '2021/22'.
 
     Returns:
-        str: Shortened name.
+        Season
+
+    Raises:
+        ValueError: If the year is not a Premier League season.
     '''
-    return {
-        'Arsenal': 'ARS',
-        'Aston Villa': 'AVL',
-        'Barnsley': 'BAR',
-        'Birmingham': 'BIR',
-        'Blackburn': 'BLB',
-        'Blackpool': 'BLP',
-        'Bolton': 'BOL',
-        'Bournemouth': 'BOU',
-        'Bradford': 'BRA',
-        'Brentford': 'BRE',
-        'Brighton': 'BHA',
-        'Burnley': 'BUR',
-        'Burnley': 'BUR',
-        'Cardiff': 'CAR',
-        'Charlton': 'CHA',
-        'Chelsea': 'CHE',
-        'Coventry': 'COV',
-        'Crystal Palace': 'CRY',
-        'Derby': 'DER',
-        'Everton': 'EVE',
-        'Fulham': 'FUL',
-        'Huddersfield'
-        'Hull': 'HUL',
-        'Ipswich': 'IPS',
-        'Leeds': 'LEE',
-        'Leicester': 'LEI',
-        'Liverpool': 'LIV',
-        'Man City': 'MCI',
-        'Man Utd': 'MUN',
-        'Middlesbrough': 'MID',
-        'Newcastle': 'NEW',
-        'Norwich': 'NOR',
-        'Nott\'m Forest': 'NFO',
-        'Oldham': 'OLD',
-        'Portsmouth': 'POR',
-        'QPR': 'QPR',
-        'Reading': 'RDG',
-        'Sheffield Utd': 'SHU',
-        'Sheffield Wed': 'SHW',
-        'Southampton': 'SOU',
-        'Stoke': 'STK',
-        'Sunderland': 'SUN',
-        'Swansea': 'SWA',
-        'Swindon': 'SWI',
-        'Spurs': 'TOT',
-        'Watford': 'WAT',
-        'West Brom': 'WBA',
-        'West Ham': 'WHU',
-        'Wigan': 'WIG',
-        'Wimbledon': 'WIM',
-        'Wolves': 'WOL'
-    }
+    match = re.fullmatch(r'(\d{4})/(\d{2})', year or '')
+    if (match is None or int(match[2]) != (int(match[1]) + 1) % 100
+            or not FIRST_SEASON <= int(match[1]) <= date.today().year):
+        raise ValueError(f'{year!r} is not a Premier League season, e.g. 2021/22.')
+    return Season(year, SEASON_TEAMS.get(year, 20))
 
+
+def validate(club, year):
+    '''
+    Checks the club and season inputs before any scraping starts.
+
+    Args:
+        club (str): The club, or LEAGUE.
+        year (str): The season, e.g. '2021/22'.
+
+    Raises:
+        ValueError: If the club or season is unknown.
+    '''
+    if club != LEAGUE and club not in CLUBS:
+        raise ValueError(f'{club!r} is not a club. Use one of {sorted(CLUBS)} or {LEAGUE!r}.')
+    season(year)
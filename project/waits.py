@@ -0,0 +1,128 @@
+import os
+import json
+import time
+import logging
+import threading
+from typing import NamedTuple
+from selenium.common.exceptions import NoSuchElementException, TimeoutException
+from selenium.webdriver.support.ui import WebDriverWait
+from metrics import TIMEOUTS, WAIT_TIME
+
+logging.basicConfig(level = logging.INFO)
+
+
+class Step(NamedTuple):
+    '''How long to wait at one step of the scrape, and how often to check in the meantime.'''
+    timeout: float
+    poll: float
+
+
+# Overlays only get a short probe, as most of the time there is nothing to dismiss
+DEFAULT_STEPS = {
+    'cookies': Step(2, 0.1),
+    'ad': Step(1, 0.1),
+    'season_dropdown': Step(10, 0.1),
+    'results_section': Step(30, 0.25),
+    'scroll': Step(60, 0.5),
+    'fixture_list': Step(30, 0.25),
+    'stats_tab': Step(10, 0.1),
+    'scorebox': Step(30, 0.1)
+}
+
+
+class WaitPolicy:
+    '''
+    This class is used to wait for the browser with a timeout and polling interval set per step of the scrape,
+    keeping statistics of the time spent at each step. One policy can be shared by several scrapers running in threads.
+
+    Attributes
+    ----------
+    steps (dict): The Step of each step name.
+    stats (dict): For each step name, the number of waits, the number that timed out, and the total and longest seconds waited.
+    '''
+
+    def __init__(self, steps=None):
+        self.steps = dict(DEFAULT_STEPS)
+        self.steps.update({name: Step(*step) for name, step in (steps or {}).items()})
+        self.stats = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        '''
+        Creates the policy with any steps overridden by the wait_policy environment variable,
+        a JSON object of [timeout, poll] by step name, e.g. '{"scorebox": [60, 0.5], "cookies": [0, 0.1]}'.
+        '''
+        return cls(json.loads(os.environ.get('wait_policy', '{}')))
+
+    def record(self, name, seconds, timed_out=False):
+        '''Adds a wait to the statistics of the step and to the Prometheus metrics.'''
+        WAIT_TIME.labels(name).observe(seconds)
+        if timed_out:
+            TIMEOUTS.labels(name).inc()
+        with self._lock:
+            stats = self.stats.setdefault(name, {'waits': 0, 'timeouts': 0, 'seconds': 0.0, 'longest': 0.0})
+            stats['waits'] += 1
+            stats['timeouts'] += timed_out
+            stats['seconds'] += seconds
+            stats['longest'] = max(stats['longest'], seconds)
+
+    @staticmethod
+    def _check_once(driver, condition):
+        '''Checks a condition a single time, as WebDriverWait still sleeps for one polling interval when the timeout is 0.'''
+        try:
+            result = condition(driver)
+        except NoSuchElementException:
+            result = False
+        if not result:
+            raise TimeoutException()
+        return result
+
+    def until(self, driver, condition, name):
+        '''
+        Waits for a condition using the timeout and polling interval of the step. A step with a timeout of 0 checks just once.
+
+        Args:
+            driver (class): The webdriver.
+            condition: The expected condition, e.g. EC.element_to_be_clickable((By.XPATH, ...)).
+            name (str): The step, e.g. 'scorebox'.
+
+        Returns:
+            The value returned by the condition, usually the element waited for.
+
+        Raises:
+            TimeoutException: If the condition is not met within the step's timeout.
+        '''
+        step = self.steps[name]
+        start = time.perf_counter()
+        try:
+            if step.timeout > 0:
+                result = WebDriverWait(driver, step.timeout, poll_frequency=step.poll).until(condition)
+            else:
+                result = self._check_once(driver, condition)
+        except TimeoutException:
+            self.record(name, time.perf_counter() - start, True)
+            raise
+        self.record(name, time.perf_counter() - start, False)
+        return result
+
+    def probe(self, driver, condition, name):
+        '''
+        Checks for something that is usually not there, such as an overlay, giving up after the step's short timeout.
+
+        Returns:
+            The value returned by the condition, or None if it was not met.
+        '''
+        try:
+            return self.until(driver, condition, name)
+        except TimeoutException:
+            return None
+
+    def report(self):
+        '''Returns a line per step of the number of waits and timeouts, and the total, mean and longest seconds waited.'''
+        with self._lock:
+            return '\n'.join(
+                f"{name}: {stats['waits']} waits, {stats['timeouts']} timed out, {stats['seconds']:.1f}s in total, "
+                f"{stats['seconds'] / stats['waits']:.2f}s mean, {stats['longest']:.2f}s longest"
+                for name, stats in sorted(self.stats.items(), key=lambda item: -item[1]['seconds'])
+                )